@@ -0,0 +1,172 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connections
+from django.db.models import F, Func, IntegerField
+
+from .models import Room, RoomType, Reservation
+from .rollups import COUNTED_STATUSES
+
+GRANULARITIES = ('day', 'week', 'month')
+EPOCH = date(1970, 1, 1)
+
+
+class EpochDays(Func):
+    # Число дней от 1970-01-01 до даты
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)",
+                           **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="(%(expressions)s - DATE '1970-01-01')", **extra_context)
+
+
+class StayArrays:
+    # Бронирования периода в виде массивов: индекс комнаты, смещения заезда и выезда
+    # относительно начала периода (в днях, без обрезки) и стоимость проживания
+
+    def __init__(self, rooms, room_types, rows, arrivals, departures, prices):
+        self.rooms = rooms
+        self.room_types = room_types
+        self.rows = rows
+        self.arrivals = arrivals
+        self.departures = departures
+        self.prices = prices
+
+
+def load_stays(start_date, end_date):
+    # Комнаты упорядочены по типу, чтобы строки одного типа шли подряд
+    rooms = list(Room.objects.order_by('type_id', 'id').values_list('id', 'type_id'))
+    room_types = dict(RoomType.objects.filter(id__in={type_id for _, type_id in rooms}).values_list('id', 'name'))
+    row_of_room = {room_id: row for row, (room_id, _) in enumerate(rooms)}
+
+    # Даты переводятся в номера дней на стороне БД, а строки читаются курсором напрямую -
+    # без построчных преобразований ORM
+    queryset = Reservation.objects.filter(
+        status__in=COUNTED_STATUSES,
+        arrival_date__lte=end_date,
+        departure_date__gt=start_date,
+    ).annotate(
+        stay_room=F('room_id'),
+        stay_arrival=EpochDays('arrival_date'),
+        stay_departure=EpochDays('departure_date'),
+        stay_price=F('price_at_booking'),
+    ).values_list('stay_room', 'stay_arrival', 'stay_departure', 'stay_price')
+    # SQL собирается и выполняется в той базе, которую для запроса выбрал роутер (реплика или первичная)
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        # Порядок колонок в SQL определяет ORM, поэтому берём их по именам
+        columns = [column[0] for column in cursor.description]
+        stays = cursor.fetchall()
+    columns = dict(zip(columns, zip(*stays))) if stays else {}
+    room_ids, arrivals, departures, prices = (
+        columns.get(name, ()) for name in ('stay_room', 'stay_arrival', 'stay_departure', 'stay_price')
+    )
+
+    origin = (start_date - EPOCH).days
+    return StayArrays(
+        rooms=rooms,
+        room_types=room_types,
+        rows=np.fromiter((row_of_room[room_id] for room_id in room_ids), dtype=np.int64, count=len(room_ids)),
+        arrivals=np.array(arrivals, dtype=np.int64) - origin,
+        departures=np.array(departures, dtype=np.int64) - origin,
+        prices=np.array(prices, dtype=np.float64),
+    )
+
+
+def _period_starts(start_date, days, granularity):
+    dates = np.datetime64(start_date, 'D') + np.arange(days)
+    if granularity == 'month':
+        return dates.astype('datetime64[M]').astype('datetime64[D]')
+    if granularity == 'week':
+        # 1970-01-01 - четверг: (дни + 3) % 7 даёт номер дня недели с понедельника
+        return dates - (dates.astype(np.int64) + 3) % 7
+    return dates
+
+
+def compute_occupancy(stays, start_date, end_date, granularity='month'):
+    days = (end_date - start_date).days + 1
+    rooms_count = len(stays.rooms)
+
+    # Занятость комнаты x день: разностный массив по обрезанным к периоду интервалам и накопленная сумма
+    lo = np.clip(stays.arrivals, 0, days)
+    hi = np.clip(stays.departures, 0, days)
+    delta = np.zeros((rooms_count, days + 1), dtype=np.int32)
+    np.add.at(delta, (stays.rows, lo), 1)
+    np.add.at(delta, (stays.rows, hi), -1)
+    occupied = (np.cumsum(delta, axis=1)[:, :days] > 0).astype(np.int32)
+
+    # Стоимость проживания делится по ночам поровну; выручка дня собирается тем же приёмом по строкам комнат
+    nights = np.maximum(stays.departures - stays.arrivals, 1)
+    rate = stays.prices / nights
+    revenue_delta = np.zeros((rooms_count, days + 1), dtype=np.float64)
+    np.add.at(revenue_delta, (stays.rows, lo), rate)
+    np.add.at(revenue_delta, (stays.rows, hi), -rate)
+    revenue = np.cumsum(revenue_delta, axis=1)[:, :days]
+
+    # Сворачиваем строки комнат в типы номеров (строки одного типа идут подряд)
+    type_ids = np.array([type_id for _, type_id in stays.rooms], dtype=np.int64)
+    type_starts = np.flatnonzero(np.r_[True, type_ids[1:] != type_ids[:-1]]) if rooms_count else type_ids
+    room_counts = np.diff(np.r_[type_starts, rooms_count])
+
+    # Сворачиваем дни в периоды (дни одного периода тоже идут подряд)
+    period_starts = _period_starts(start_date, days, granularity)
+    period_bounds = np.flatnonzero(np.r_[True, period_starts[1:] != period_starts[:-1]])
+    period_days = np.diff(np.r_[period_bounds, days])
+
+    if rooms_count:
+        occupied_nights = np.add.reduceat(np.add.reduceat(occupied, type_starts, axis=0), period_bounds, axis=1)
+        period_revenue = np.add.reduceat(np.add.reduceat(revenue, type_starts, axis=0), period_bounds, axis=1)
+    else:
+        occupied_nights = np.zeros((0, len(period_bounds)))
+        period_revenue = np.zeros((0, len(period_bounds)))
+    available_nights = np.outer(room_counts, period_days)
+
+    periods = []
+    for column, bound in enumerate(period_bounds):
+        period_start = start_date + timedelta(days=int(bound))
+        period_end = period_start + timedelta(days=int(period_days[column]) - 1)
+        room_types = [
+            _metrics(
+                int(available_nights[row, column]), int(occupied_nights[row, column]), float(period_revenue[row, column]),
+                room_type_id=int(type_ids[type_start]),
+                room_type_name=stays.room_types.get(int(type_ids[type_start])),
+            )
+            for row, type_start in enumerate(type_starts)
+        ]
+        periods.append({
+            'period_start': period_start,
+            'period_end': period_end,
+            'total': _metrics(
+                int(available_nights[:, column].sum()),
+                int(occupied_nights[:, column].sum()),
+                float(period_revenue[:, column].sum()),
+            ),
+            'room_types': room_types,
+        })
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'granularity': granularity,
+        'periods': periods,
+    }
+
+
+def _metrics(available_nights, occupied_nights, revenue, **extra):
+    return {
+        **extra,
+        'available_room_nights': available_nights,
+        'occupied_room_nights': occupied_nights,
+        'revenue': round(revenue, 2),
+        'occupancy_rate': round(occupied_nights / available_nights, 4) if available_nights else None,
+        'adr': round(revenue / occupied_nights, 2) if occupied_nights else None,
+        'revpar': round(revenue / available_nights, 2) if available_nights else None,
+    }
+
+
+def occupancy_analytics(start_date, end_date, granularity='month'):
+    return compute_occupancy(load_stays(start_date, end_date), start_date, end_date, granularity)
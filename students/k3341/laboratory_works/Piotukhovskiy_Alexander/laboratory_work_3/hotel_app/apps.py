@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_database_objects(sender, using, **kwargs):
+    from .db_objects import restore_database_objects
+    restore_database_objects(using)
 
 
 class HotelAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotel_app'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        # Триггеры и поиск клиентов могли пропасть при пересоздании таблицы миграцией - восстанавливаем их
+        post_migrate.connect(restore_database_objects, sender=self)
@@ -0,0 +1,145 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .routers import PRIMARY, routing_scope
+
+TOKEN_CACHE_KEY = 'hotel:auth-token:{}'
+# Метка отзыва токена: меняется при каждом сбросе, запись в общем кэше действительна, только пока метка та же
+TOKEN_REVOCATION_KEY = 'hotel:auth-token-revoked:{}'
+
+# Токен -> (срок действия, пользователь, токен) в памяти процесса; порядок - от давно использованных к недавним
+_tokens = OrderedDict()
+_lock = threading.Lock()
+# Число сбросов в процессе: проверка, начатая до сброса, не кладёт результат в LRU
+_generation = 0
+
+
+def _digest(key):
+    # Сам токен - секрет, в ключах кэша хранится только его хэш
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    alias = getattr(settings, 'HOTEL_AUTH_TOKEN_SHARED_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _shared_timeout():
+    return getattr(settings, 'HOTEL_AUTH_TOKEN_SHARED_CACHE_TIMEOUT', 5 * 60)
+
+
+def _copy(user, token):
+    # Каждый запрос получает свои экземпляры: кэш прав (_perm_cache) и другие атрибуты,
+    # выставленные во время запроса, не попадают в закэшированную запись
+    user = copy.copy(user)
+    token = copy.copy(token)
+    token.user = user
+    return user, token
+
+
+def _get_local(digest):
+    with _lock:
+        entry = _tokens.get(digest)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _tokens[digest]
+            return None
+        _tokens.move_to_end(digest)
+        return entry[1], entry[2]
+
+
+def _set_local(digest, user, token, generation):
+    expires_at = time.monotonic() + getattr(settings, 'HOTEL_AUTH_TOKEN_CACHE_TTL', 60)
+    with _lock:
+        if generation != _generation:
+            return
+        _tokens[digest] = (expires_at, user, token)
+        _tokens.move_to_end(digest)
+        while len(_tokens) > getattr(settings, 'HOTEL_AUTH_TOKEN_CACHE_SIZE', 10000):
+            _tokens.popitem(last=False)
+
+
+def _get_shared(shared, digest):
+    # Запись и метка отзыва читаются одним запросом; marker - метка, с которой нужно сохранить новую запись
+    entry_key, marker_key = TOKEN_CACHE_KEY.format(digest), TOKEN_REVOCATION_KEY.format(digest)
+    values = shared.get_many([entry_key, marker_key])
+    marker = values.get(marker_key)
+    entry = values.get(entry_key)
+    if entry is not None and entry[0] == marker:
+        return entry[1], entry[2], marker
+    return None, None, marker
+
+
+def _revoke(digests):
+    global _generation
+    with _lock:
+        _generation += 1
+        for digest in digests:
+            _tokens.pop(digest, None)
+    shared = _shared_cache()
+    if shared is not None and digests:
+        # Новая метка делает недействительной и запись, которую параллельный запрос сохранит уже после сброса
+        # по результату проверки, начатой до него. Метка живёт дольше любой такой записи
+        shared.set_many({TOKEN_REVOCATION_KEY.format(digest): uuid.uuid4().hex for digest in digests},
+                        timeout=2 * _shared_timeout())
+        shared.delete_many([TOKEN_CACHE_KEY.format(digest) for digest in digests])
+
+
+def invalidate_tokens(keys):
+    digests = [_digest(key) for key in keys]
+    _revoke(digests)
+    if connection.in_atomic_block:
+        # Пока транзакция не зафиксирована, другие запросы ещё видят старый токен и могут снова его закэшировать
+        transaction.on_commit(lambda: _revoke(digests))
+
+
+def invalidate_user_tokens(user_ids):
+    invalidate_tokens(Token.objects.using(PRIMARY).filter(user_id__in=user_ids).values_list('key', flat=True))
+
+
+def reset_token_cache():
+    with _lock:
+        _tokens.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication без запроса к Token и User на каждый вызов API: проверенный токен хранится в LRU процесса
+    # (HOTEL_AUTH_TOKEN_CACHE_TTL секунд, не больше HOTEL_AUTH_TOKEN_CACHE_SIZE токенов) и, если задан
+    # HOTEL_AUTH_TOKEN_SHARED_CACHE, в общем кэше Django. Удаление токена (выход через djoser), изменение
+    # пользователя (в том числе деактивация) и его групп и прямых прав сбрасывают записи сигналами: общий кэш -
+    # сразу во всех процессах, LRU - в текущем процессе, в остальных - по истечении TTL. Сами права проверяются
+    # по копии пользователя и загружаются заново в каждом запросе. Неверные токены не кэшируются
+
+    def authenticate_credentials(self, key):
+        digest = _digest(key)
+        cached = _get_local(digest)
+        if cached is not None:
+            return _copy(*cached)
+
+        generation = _generation
+        shared = _shared_cache()
+        marker = None
+        if shared is not None:
+            user, token, marker = _get_shared(shared, digest)
+            if user is not None:
+                _set_local(digest, user, token, generation)
+                return _copy(user, token)
+
+        # Проверка при промахе - в первичной базе: реплика может ещё не знать об удалении токена
+        with routing_scope(pinned=True):
+            user, token = super().authenticate_credentials(key)
+        _set_local(digest, user, token, generation)
+        if shared is not None:
+            shared.set(TOKEN_CACHE_KEY.format(digest), (marker, user, token), timeout=_shared_timeout())
+        return _copy(user, token)
@@ -0,0 +1,205 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Room, RoomType, Reservation
+from .routers import PRIMARY
+from .versions import get_version, bump_version, shared_cache_configured
+
+ACTIVE_STATUSES = ['BOOKED', 'CONFIRMED', 'CHECKED_IN']
+AMENITY_FIELDS = [field.name for field in RoomType._meta.get_fields() if field.name.startswith('has_')]
+INDEX_PAST_DAYS = 30
+INDEX_FUTURE_DAYS = 2 * 365
+VERSION_NAME = 'availability'
+
+
+class AvailabilityIndex:
+    # Матрица занятости комнаты x дни на горизонте [origin, origin + days):
+    # occupancy[row, day] - число активных бронирований комнаты в этот день
+
+    def __init__(self, origin, days, version):
+        self.origin = origin
+        self.days = days
+        self.version = version
+        self.rows = {}
+        self.room_ids = np.zeros(0, dtype=np.int64)
+        self.room_type_ids = np.zeros(0, dtype=np.int64)
+        self.capacity = np.zeros(0, dtype=np.int64)
+        self.amenities = {}
+        self.occupancy = np.zeros((0, days), dtype=np.int16)
+        self.stays = {}
+
+    @property
+    def end(self):
+        return self.origin + timedelta(days=self.days)
+
+    def load(self):
+        # Индекс помечается текущей версией и живёт до следующего изменения - строим его по первичной БД,
+        # чтобы не закрепить в нём состояние отстающей реплики
+        rooms = list(
+            Room.objects.using(PRIMARY).order_by('id').values_list(
+                'id', 'type_id', 'type__capacity', *(f'type__{field}' for field in AMENITY_FIELDS)
+            )
+        )
+        self.rows = {room[0]: row for row, room in enumerate(rooms)}
+        self.room_ids = np.array([room[0] for room in rooms], dtype=np.int64)
+        self.room_type_ids = np.array([room[1] for room in rooms], dtype=np.int64)
+        self.capacity = np.array([room[2] for room in rooms], dtype=np.int64)
+        self.amenities = {
+            field: np.array([room[3 + i] for room in rooms], dtype=bool)
+            for i, field in enumerate(AMENITY_FIELDS)
+        }
+
+        reservations = Reservation.objects.using(PRIMARY).filter(
+            status__in=ACTIVE_STATUSES,
+            arrival_date__lt=self.end,
+            departure_date__gt=self.origin,
+        ).values_list('id', 'room_id', 'arrival_date', 'departure_date')
+
+        rows, starts, ends = [], [], []
+        for reservation_id, room_id, arrival_date, departure_date in reservations.iterator(chunk_size=5000):
+            row, lo, hi = self._span(room_id, arrival_date, departure_date)
+            self.stays[reservation_id] = (row, lo, hi)
+            rows.append(row)
+            starts.append(lo)
+            ends.append(hi)
+
+        # Разностный массив: +1 в день заезда, -1 в день выезда, затем накопленная сумма по дням
+        delta = np.zeros((len(rooms), self.days + 1), dtype=np.int32)
+        np.add.at(delta, (rows, starts), 1)
+        np.add.at(delta, (rows, ends), -1)
+        self.occupancy = np.cumsum(delta, axis=1)[:, :self.days].astype(np.int16)
+
+    def _span(self, room_id, arrival_date, departure_date):
+        lo = min(max((arrival_date - self.origin).days, 0), self.days)
+        hi = min(max((departure_date - self.origin).days, 0), self.days)
+        return self.rows[room_id], lo, hi
+
+    def add(self, reservation_id, room_id, arrival_date, departure_date):
+        row, lo, hi = self._span(room_id, arrival_date, departure_date)
+        self.occupancy[row, lo:hi] += 1
+        self.stays[reservation_id] = (row, lo, hi)
+
+    def remove(self, reservation_id):
+        stay = self.stays.pop(reservation_id, None)
+        if stay is not None:
+            row, lo, hi = stay
+            self.occupancy[row, lo:hi] -= 1
+
+    def find(self, arrival_date, departure_date, capacity=None, amenities=()):
+        lo = (arrival_date - self.origin).days
+        hi = (departure_date - self.origin).days
+
+        mask = ~self.occupancy[:, lo:hi].any(axis=1)
+        if capacity:
+            mask &= self.capacity >= capacity
+        for amenity in amenities:
+            mask &= self.amenities[amenity]
+
+        return self.room_ids[mask].tolist()
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def index_horizon(today=None):
+    # Окно индекса фиксировано относительно текущей даты и не расширяется под запросы
+    today = today or date.today()
+    return today - timedelta(days=INDEX_PAST_DAYS), today + timedelta(days=INDEX_FUTURE_DAYS)
+
+
+def _build_index(origin, end, version):
+    index = AvailabilityIndex(origin, (end - origin).days, version)
+    index.load()
+    return index
+
+
+def find_available_rooms(arrival_date, departure_date, capacity=None, amenities=()):
+    global _index
+    origin, end = index_horizon()
+    if not shared_cache_configured() or not (origin <= arrival_date and departure_date <= end):
+        # Без общего кэша версия индекса видна только своему процессу, и бронирование из другого процесса
+        # осталось бы незамеченным; даты вне окна индекса (прямые вызовы, смена суток между проверкой
+        # и поиском) тоже ищутся обычным запросом
+        return list(available_rooms_queryset(arrival_date, departure_date, capacity, amenities).values_list('id', flat=True))
+
+    version = get_version(VERSION_NAME)
+    with _lock:
+        if _index is None or _index.version != version or _index.origin != origin:
+            _index = _build_index(origin, end, version)
+
+        return _index.find(arrival_date, departure_date, capacity, amenities)
+
+
+def available_rooms_queryset(arrival_date, departure_date, capacity=None, amenities=()):
+    # Эквивалентный запрос через ORM - для сравнения производительности и проверки индекса
+    overlapping = Reservation.objects.filter(
+        room=OuterRef('pk'),
+        status__in=ACTIVE_STATUSES,
+        arrival_date__lt=departure_date,
+        departure_date__gt=arrival_date,
+    )
+    queryset = Room.objects.filter(~Exists(overlapping))
+    if capacity:
+        queryset = queryset.filter(type__capacity__gte=capacity)
+    for amenity in amenities:
+        queryset = queryset.filter(**{f'type__{amenity}': True})
+    return queryset.order_by('id')
+
+
+def reservation_changed(reservation, deleted=False):
+    # Индекс обновляется только после фиксации транзакции: откаченное бронирование не должно занимать комнату
+    stay = (reservation.id, reservation.room_id, reservation.arrival_date, reservation.departure_date,
+            reservation.status)
+    transaction.on_commit(lambda: _apply_reservation(*stay, deleted=deleted))
+
+
+def _apply_reservation(reservation_id, room_id, arrival_date, departure_date, status, deleted=False):
+    global _index
+    version = bump_version(VERSION_NAME)
+
+    with _lock:
+        if _index is None:
+            return
+
+        if (_index.version != version - 1
+                or room_id not in _index.rows
+                or not isinstance(arrival_date, date)
+                or not isinstance(departure_date, date)):
+            _index = None
+            return
+
+        _index.remove(reservation_id)
+        if not deleted and status in ACTIVE_STATUSES:
+            _index.add(reservation_id, room_id, arrival_date, departure_date)
+        _index.version = version
+
+
+def room_changed(room, created=False, deleted=False):
+    # Смена статуса комнаты на индекс не влияет - перестраиваем его только при изменении состава комнат или их типов
+    initial_type_id = getattr(room, 'initial_type_id', None)
+    if created or deleted or initial_type_id is None or room.type_id != initial_type_id:
+        invalidate_availability_index()
+    room.initial_type_id = room.type_id
+
+
+def invalidate_availability_index():
+    transaction.on_commit(_drop_index)
+
+
+def _drop_index():
+    global _index
+    bump_version(VERSION_NAME)
+
+    with _lock:
+        _index = None
+
+
+def reset_availability_index():
+    global _index
+    with _lock:
+        _index = None
@@ -0,0 +1,31 @@
+import os
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class FileCache(FileBasedCache):
+    # Файловый кэш, общий для всех процессов одной машины - кэш по умолчанию для HOTEL_SHARED_CACHE.
+    # В FileBasedCache add и incr - это чтение и запись без блокировки, и два процесса могут увеличить версию
+    # до одного и того же значения; здесь они выполняются под блокировкой файла
+    lock_filename = 'hotel.lock'
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_filename), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            return super().incr(key, delta, version)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core import checks
+
+from .db_objects import missing_database_objects
+
+# Бэкенды, данные которых не видны другим процессам
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'HOTEL_SHARED_CACHE', None)
+    if not alias:
+        return []
+    if alias not in settings.CACHES:
+        return [checks.Error(
+            f"HOTEL_SHARED_CACHE ссылается на неизвестный кэш '{alias}'.",
+            hint='Добавьте кэш с этим псевдонимом в CACHES.',
+            id='hotel_app.E001',
+        )]
+    if settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [checks.Warning(
+            f"Кэш '{alias}' из HOTEL_SHARED_CACHE не общий для процессов.",
+            hint='Используйте Redis или Memcached, иначе процессы не увидят изменения друг друга.',
+            id='hotel_app.W001',
+        )]
+    return []
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache_deploy(app_configs, **kwargs):
+    if getattr(settings, 'HOTEL_SHARED_CACHE', None):
+        return []
+    return [checks.Warning(
+        'HOTEL_SHARED_CACHE не задан: кэш ответов, ETag и индексы в памяти процесса выключены, а состояние '
+        'фоновых задач хранится в памяти одного процесса.',
+        hint='Задайте псевдоним общего кэша: файлового для одной машины, Redis или Memcached - для нескольких.',
+        id='hotel_app.W002',
+    )]
+
+
+@checks.register(checks.Tags.database)
+def check_database_objects(app_configs, databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        for group, names in missing_database_objects(alias).items():
+            errors.append(checks.Error(
+                f"В базе '{alias}' нет объектов {group}: {', '.join(names)}.",
+                hint='Выполните python manage.py migrate: после миграций недостающие объекты создаются заново.',
+                id='hotel_app.E002',
+            ))
+    return errors
@@ -0,0 +1,116 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Room, RoomType, Reservation, Client, Employee, CleaningSchedule
+from .routers import require_fresh
+from .versions import get_stamps, shared_cache_configured, touch_stamp
+
+COLLECTIONS = {
+    Room: 'room',
+    RoomType: 'room_type',
+    Reservation: 'reservation',
+    Client: 'client',
+    Employee: 'employee',
+    CleaningSchedule: 'cleaning_schedule',
+}
+
+# Коллекции, от которых зависит представление комнаты: тип, текущий гость и последний уборщик
+ROOM_COLLECTIONS = ('room', 'room_type', 'reservation', 'client', 'cleaning_schedule', 'employee')
+
+
+def _stamp_name(collection):
+    return f'collection:{collection}'
+
+
+def collection_stamp_names(collections):
+    return [_stamp_name(collection) for collection in collections]
+
+
+def collections_modified_at(collections):
+    return max(modified for _, modified in get_stamps(collection_stamp_names(collections)))
+
+
+def collection_changed(collection):
+    # Метка обновляется после фиксации: иначе параллельный запрос успеет получить новую метку,
+    # прочитать ещё старые данные и закрепить их под ней в ETag или кэше ответов
+    name = _stamp_name(collection)
+    transaction.on_commit(lambda: touch_stamp(name))
+
+
+def model_changed(model):
+    collection = COLLECTIONS.get(model)
+    if collection is not None:
+        collection_changed(collection)
+
+
+def collection_state(request, collections):
+    stamps = get_stamps(collection_stamp_names(collections))
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = '|'.join([request.get_full_path(), getattr(renderer, 'format', '')] + [token for token, _ in stamps])
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest()), max(modified for _, modified in stamps)
+
+
+def content_etag(request, data):
+    renderer = getattr(request, 'accepted_renderer', None)
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True, ensure_ascii=False)
+    key = '|'.join([request.get_full_path(), getattr(renderer, 'format', ''), content])
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def conditional_get(*collections):
+    # ETag складывается из адреса запроса и меток коллекций, поэтому ответ 304 отдаётся
+    # до обращения к БД и сериализатору; метки обновляются сигналами при любых изменениях
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            if not shared_cache_configured():
+                # Метки в кэше процесса не видят изменений из других процессов - ETag считается по самим данным,
+                # и 304 экономит только передачу ответа
+                response = handler(view, request, *args, **kwargs)
+                if response.status_code == 200:
+                    etag = content_etag(request, response.data)
+                    conditional_response = get_conditional_response(request, etag=etag)
+                    if conditional_response is not None:
+                        conditional_response['ETag'] = etag
+                        return conditional_response
+                    response['ETag'] = etag
+                return response
+
+            etag, modified_at = collection_state(request, collections)
+            last_modified = int(modified_at)
+            conditional_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if conditional_response is not None:
+                conditional_response['ETag'] = etag
+                conditional_response['Last-Modified'] = http_date(last_modified)
+                return conditional_response
+
+            # Ответ получит ETag текущих меток - читать из реплики можно, только если она уже содержит эти изменения
+            require_fresh(modified_at)
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def version_etag(instance):
+    return quote_etag(str(instance.version))
+
+
+def if_match_satisfied(request, instance):
+    # Без заголовка If-Match запись не ограничивается; иначе версия объекта должна совпасть с одной из меток
+    header = request.META.get('HTTP_IF_MATCH')
+    if header is None:
+        return True
+    etags = parse_etags(header)
+    return '*' in etags or version_etag(instance) in etags
@@ -0,0 +1,72 @@
+from importlib import import_module
+
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+# Объекты БД, которых нет в моделях: их создают RunPython-миграции. На SQLite многие операции миграций
+# (AlterField, RemoveField, AddConstraint) пересоздают таблицу копированием, и триггеры на старой таблице
+# удаляются вместе с ней без ошибки - защита от пересечения бронирований и обновление поиска клиентов
+# перестали бы работать незаметно. Поэтому после migrate недостающие объекты создаются заново,
+# а проверка `manage.py check --database default` сообщает об их отсутствии.
+# Группа объектов: (миграция, функции создания и удаления, имена объектов по СУБД)
+DATABASE_OBJECTS = {
+    'reservation_room_no_overlap': (
+        '0007_optimistic_versions', 'create_overlap_guard', 'drop_overlap_guard', {
+            'sqlite': ['reservation_room_no_overlap_insert', 'reservation_room_no_overlap_update'],
+            'postgresql': ['reservation_room_no_overlap'],
+        },
+    ),
+    'client_search': (
+        '0008_client_search', 'create_search_index', 'drop_search_index', {
+            'sqlite': [
+                'hotel_app_client_search', 'hotel_app_client_search_insert', 'hotel_app_client_search_delete',
+                'hotel_app_client_search_update',
+            ],
+            'postgresql': ['client_search_trgm_idx'],
+        },
+    ),
+}
+
+EXISTING_OBJECTS_SQL = {
+    'sqlite': "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')",
+    'postgresql': (
+        'SELECT conname FROM pg_constraint UNION ALL '
+        'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()'
+    ),
+}
+
+
+def missing_database_objects(using='default'):
+    # {группа: [недостающие объекты]} - только для групп, миграции которых применены
+    connection = connections[using]
+    sql = EXISTING_OBJECTS_SQL.get(connection.vendor)
+    if sql is None:
+        return {}
+
+    applied = MigrationRecorder(connection).applied_migrations()
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        existing = {row[0] for row in cursor.fetchall()}
+
+    missing = {}
+    for group, (migration, _, _, names) in DATABASE_OBJECTS.items():
+        if ('hotel_app', migration) not in applied:
+            continue
+        absent = [name for name in names.get(connection.vendor, []) if name not in existing]
+        if absent:
+            missing[group] = absent
+    return missing
+
+
+def restore_database_objects(using='default'):
+    # Группа пересоздаётся целиком функциями своей миграции, поэтому определения объектов не расходятся
+    # с миграциями; полнотекстовый индекс при этом перестраивается по текущим строкам клиентов
+    missing = missing_database_objects(using)
+    connection = connections[using]
+    for group in missing:
+        migration, create, drop, _ = DATABASE_OBJECTS[group]
+        module = import_module(f'hotel_app.migrations.{migration}')
+        with connection.schema_editor() as schema_editor:
+            getattr(module, drop)(None, schema_editor)
+            getattr(module, create)(None, schema_editor)
+    return sorted(missing)
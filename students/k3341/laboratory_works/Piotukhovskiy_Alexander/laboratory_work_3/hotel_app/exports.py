@@ -0,0 +1,122 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .models import Client, Reservation
+
+CHUNK_SIZE = 2000
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+CSV_CONTENT_TYPE = 'text/csv'
+
+# Плоские строки выгрузки: имя колонки -> путь поля для values_list
+EXPORTS = {
+    'reservations': {
+        'queryset': lambda: Reservation.objects.all(),
+        'updated_field': 'last_updated_date',
+        'columns': {
+            'id': 'id',
+            'room_id': 'room_id',
+            'room_number': 'room__number',
+            'client_id': 'client_id',
+            'admin_id': 'admin_id',
+            'booking_date': 'booking_date',
+            'arrival_date': 'arrival_date',
+            'departure_date': 'departure_date',
+            'status': 'status',
+            'payment_status': 'payment_status',
+            'price_at_booking': 'price_at_booking',
+            'final_price': 'final_price',
+            'updated_by_id': 'updated_by_id',
+            'last_updated_date': 'last_updated_date',
+        },
+    },
+    'clients': {
+        'queryset': lambda: Client.objects.all(),
+        'updated_field': 'last_updated_date',
+        'columns': {
+            'id': 'id',
+            'passport_number': 'passport_number',
+            'first_name': 'first_name',
+            'last_name': 'last_name',
+            'middle_name': 'middle_name',
+            'city_from': 'city_from',
+            'last_updated_date': 'last_updated_date',
+        },
+    },
+}
+
+
+class Echo:
+    # Псевдо-буфер для csv.writer: возвращает строку вместо записи в файл
+
+    def write(self, value):
+        return value
+
+
+class ExportRenderer(BaseRenderer):
+    # Нужен для согласования формата по Accept; сам поток формирует export_response,
+    # а через render проходят только ответы с ошибками
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode(self.charset)
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = NDJSON_CONTENT_TYPE
+    format = 'ndjson'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = CSV_CONTENT_TYPE
+    format = 'csv'
+
+
+def export_rows(name, updated_since=None):
+    export = EXPORTS[name]
+    queryset = export['queryset']()
+    if updated_since is not None:
+        queryset = queryset.filter(**{f"{export['updated_field']}__gte": updated_since})
+    rows = queryset.order_by('id').values_list(*export['columns'].values())
+    return rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def encode_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(columns, row))) + '\n')
+        if len(lines) >= CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def encode_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def export_response(name, export_format, updated_since=None):
+    # Строки читаются из БД порциями по CHUNK_SIZE и сразу отдаются клиенту - память не зависит от размера таблицы
+    columns = list(EXPORTS[name]['columns'])
+    rows = export_rows(name, updated_since)
+
+    if export_format == CSVRenderer.format:
+        response = StreamingHttpResponse(encode_csv(columns, rows), content_type=f'{CSV_CONTENT_TYPE}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+    else:
+        response = StreamingHttpResponse(encode_ndjson(columns, rows), content_type=f'{NDJSON_CONTENT_TYPE}; charset=utf-8')
+    return response
@@ -0,0 +1,139 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .conditional import collection_changed
+from .models import CleaningSchedule, EmploymentContract, Room
+
+# Этаж определяется по номеру комнаты: 101-199 - первый этаж, 1201 - двенадцатый
+FLOOR_SIZE = 100
+DEFAULT_CAPACITY = 20
+
+
+def room_floor(number):
+    return number // FLOOR_SIZE
+
+
+def assign_rooms(rooms, cleaners, capacity, loads=None, excluded=()):
+    # rooms - пары (id, номер комнаты), cleaners - id контрактов уборщиков, loads - уже назначенные на день уборки,
+    # excluded - пары (id контракта, id комнаты), которые назначать нельзя.
+    # Комнаты этажа идут подряд и раздаются кусками наименее загруженному уборщику (куча по загрузке), поэтому
+    # у каждого обычно один-два соседних этажа. Сначала загрузка ограничивается средней по всем уборщикам,
+    # оставшееся (если у кого-то уже много уборок) добирается до capacity.
+    # Возвращает назначения {id контракта: [комнаты]} и список нераспределённых комнат
+    loads = {cleaner: (loads or {}).get(cleaner, 0) for cleaner in cleaners}
+    assignments = defaultdict(list)
+    floors = defaultdict(list)
+    for room in sorted(rooms, key=lambda room: room[1]):
+        floors[room_floor(room[1])].append(room)
+    if not cleaners:
+        return assignments, [room for floor in sorted(floors) for room in floors[floor]]
+
+    balanced = math.ceil((len(rooms) + sum(loads.values())) / len(cleaners))
+    for limit in sorted({min(balanced, capacity), capacity}):
+        heap = [(load, order, cleaner) for order, (cleaner, load) in enumerate(loads.items()) if load < limit]
+        heapq.heapify(heap)
+        leftovers = defaultdict(list)
+        for floor in sorted(floors):
+            queue = floors[floor]
+            position = 0
+            while position < len(queue) and heap:
+                load, order, cleaner = heapq.heappop(heap)
+                taken = queue[position:position + limit - load]
+                assignments[cleaner].extend(taken)
+                position += len(taken)
+                loads[cleaner] = load + len(taken)
+                if loads[cleaner] < limit:
+                    heapq.heappush(heap, (loads[cleaner], order, cleaner))
+            if position < len(queue):
+                leftovers[floor] = queue[position:]
+        floors = leftovers
+
+    unassigned = [room for floor in sorted(floors) for room in floors[floor]]
+    if excluded:
+        # Запрещённые комнаты переходят к наименее загруженному из остальных уборщиков
+        # или, если свободных нет, остаются нераспределёнными
+        moved = []
+        for cleaner in list(assignments):
+            kept = [room for room in assignments[cleaner] if (cleaner, room[0]) not in excluded]
+            moved.extend(room for room in assignments[cleaner] if (cleaner, room[0]) in excluded)
+            loads[cleaner] -= len(assignments[cleaner]) - len(kept)
+            if kept:
+                assignments[cleaner] = kept
+            else:
+                del assignments[cleaner]
+        for room in moved:
+            candidates = [(load, order, cleaner) for order, (cleaner, load) in enumerate(loads.items())
+                          if load < capacity and (cleaner, room[0]) not in excluded]
+            if not candidates:
+                unassigned.append(room)
+                continue
+            _, _, cleaner = min(candidates)
+            assignments[cleaner].append(room)
+            loads[cleaner] += 1
+        unassigned.sort(key=lambda room: room[1])
+
+    return assignments, unassigned
+
+
+def schedule_housekeeping(cleaning_date, capacity=DEFAULT_CAPACITY, position_id=None, commit=True):
+    # Распределяет на день комнаты со статусом «Требуется уборка» между сотрудниками с активным контрактом
+    # (при position_id - только этой должности). Комнаты, уборка которых на этот день уже запланирована
+    # и не завершена, пропускаются; уже назначенные уборки учитываются в загрузке сотрудников. Комната не
+    # назначается сотруднику, который уже убрал её в этот день: такая запись нарушила бы уникальность
+    # (сотрудник, комната, дата)
+    with transaction.atomic():
+        planned = CleaningSchedule.objects.filter(cleaning_date=cleaning_date).exclude(status='COMPLETED')
+        rooms = list(
+            Room.objects.filter(status='REQUIRES_CLEANING')
+            .exclude(id__in=planned.values('room_id'))
+            .values_list('id', 'number')
+        )
+
+        contracts = EmploymentContract.objects.filter(is_active=True)
+        if position_id is not None:
+            contracts = contracts.filter(position_id=position_id)
+        employees = dict(contracts.order_by('id').values_list('id', 'employee_id'))
+        loads = dict(
+            planned.filter(cleaner__in=contracts).values('cleaner_id').annotate(count=Count('id'))
+            .values_list('cleaner_id', 'count')
+        )
+
+        completed = set(
+            CleaningSchedule.objects.filter(cleaning_date=cleaning_date, status='COMPLETED', cleaner__in=contracts)
+            .values_list('cleaner_id', 'room_id')
+        )
+
+        assignments, unassigned = assign_rooms(rooms, list(employees), capacity, loads, excluded=completed)
+        if commit:
+            # Без ignore_conflicts: если расписание на этот день изменили параллельно, запрос завершится ошибкой,
+            # а не вернёт назначения, которые не были записаны
+            CleaningSchedule.objects.bulk_create(
+                [
+                    CleaningSchedule(cleaner_id=cleaner, room_id=room_id, cleaning_date=cleaning_date)
+                    for cleaner, assigned in assignments.items()
+                    for room_id, _ in assigned
+                ]
+            )
+
+    if commit and assignments:
+        # bulk_create не отправляет post_save - метку коллекции обновляем вручную
+        collection_changed('cleaning_schedule')
+
+    return {
+        'cleaning_date': cleaning_date,
+        'rooms': len(rooms),
+        'cleaners': len(employees),
+        'assigned': sum(len(assigned) for assigned in assignments.values()),
+        'assignments': [
+            {
+                'employee_id': employees[cleaner],
+                'room_numbers': [number for _, number in assigned],
+            }
+            for cleaner, assigned in sorted(assignments.items())
+        ],
+        'unassigned_room_numbers': [number for _, number in unassigned],
+    }
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import availability, jobs, rollups
+from .availability import ACTIVE_STATUSES
+from .conditional import collection_changed
+from .models import Client, Reservation, Room
+from .pricing import quote_prices
+
+CLIENT_FIELDS = ('first_name', 'last_name', 'middle_name', 'city_from')
+DEFAULT_STATUS = Reservation._meta.get_field('status').get_default()
+DEFAULT_PAYMENT_STATUS = Reservation._meta.get_field('payment_status').get_default()
+
+
+class BulkImportError(Exception):
+    # errors - список ошибок по элементам пакета в том же порядке, пустой словарь у корректных элементов
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _occupies_room(item):
+    return item.get('status', DEFAULT_STATUS) in ACTIVE_STATUSES
+
+
+def find_conflicts(items):
+    # Пересечения активных бронирований пакета с уже существующими и между собой.
+    # Существующие бронирования всех комнат пакета читаются одним запросом за общее окно дат
+    errors = [{} for _ in items]
+    positions = [position for position, item in enumerate(items) if _occupies_room(item)]
+    if not positions:
+        return errors
+
+    room_ids = {items[position]['room'].id for position in positions}
+    existing = Reservation.objects.filter(
+        room_id__in=room_ids,
+        status__in=ACTIVE_STATUSES,
+        arrival_date__lt=max(items[position]['departure_date'] for position in positions),
+        departure_date__gt=min(items[position]['arrival_date'] for position in positions),
+    ).values_list('id', 'room_id', 'arrival_date', 'departure_date')
+
+    # Интервалы по комнатам: (заезд, выезд, номер элемента пакета или None, id существующего бронирования)
+    stays = defaultdict(list)
+    for reservation_id, room_id, arrival_date, departure_date in existing:
+        stays[room_id].append((arrival_date, departure_date, None, reservation_id))
+    for position in positions:
+        item = items[position]
+        stays[item['room'].id].append((item['arrival_date'], item['departure_date'], position, None))
+
+    for intervals in stays.values():
+        intervals.sort(key=lambda interval: (interval[0], interval[1]))
+        for i, (arrival_date, departure_date, position, reservation_id) in enumerate(intervals):
+            # Интервалы отсортированы по заезду: пересекаются только следующие, заехавшие до нашего выезда
+            for other_arrival, other_departure, other_position, other_reservation_id in intervals[i + 1:]:
+                if other_arrival >= departure_date:
+                    break
+                if position is not None:
+                    errors[position].setdefault('room_number', _conflict_message(
+                        other_position, other_reservation_id, other_arrival, other_departure
+                    ))
+                if other_position is not None:
+                    errors[other_position].setdefault('room_number', _conflict_message(
+                        position, reservation_id, arrival_date, departure_date
+                    ))
+
+    return errors
+
+
+def _conflict_message(position, reservation_id, arrival_date, departure_date):
+    if position is not None:
+        return f"Комната уже бронируется элементом {position} пакета на период с {arrival_date} по {departure_date}."
+    return f"Комната занята бронированием {reservation_id} на период с {arrival_date} по {departure_date}."
+
+
+def _upsert_clients(items):
+    # Один INSERT ... ON CONFLICT (passport_number) DO UPDATE на пакет; при повторе паспорта в пакете
+    # используются данные последнего элемента
+    now = timezone.now()
+    clients = {}
+    for item in items:
+        clients[item['passport_number']] = Client(
+            passport_number=item['passport_number'],
+            last_updated_date=now,
+            **{field: item.get(field) for field in CLIENT_FIELDS},
+        )
+
+    Client.objects.bulk_create(
+        clients.values(),
+        update_conflicts=True,
+        unique_fields=['passport_number'],
+        update_fields=[*CLIENT_FIELDS, 'last_updated_date'],
+    )
+    return clients
+
+
+def import_reservations(items, admin):
+    with transaction.atomic():
+        # Комнаты пакета проверены сериализатором до транзакции - перечитываем их под блокировкой:
+        # статус и версия ниже берутся из заблокированных строк, параллельное изменение комнаты
+        # дождётся конца импорта и не будет перезаписано
+        rooms = Room.objects.select_for_update().in_bulk({item['room'].id for item in items})
+        errors = find_conflicts(items)
+        if any(errors):
+            raise BulkImportError(errors)
+
+        clients = _upsert_clients(items)
+        prices = quote_prices(
+            (item['room'].type_id, item['arrival_date'], item['departure_date']) for item in items
+        )
+
+        booking_date = date.today()
+        reservations = Reservation.objects.bulk_create([
+            Reservation(
+                client=clients[item['passport_number']],
+                room=item['room'],
+                admin=admin,
+                booking_date=booking_date,
+                arrival_date=item['arrival_date'],
+                departure_date=item['departure_date'],
+                status=item.get('status') or DEFAULT_STATUS,
+                payment_status=item.get('payment_status') or DEFAULT_PAYMENT_STATUS,
+                price_at_booking=price,
+                final_price=price,
+            )
+            for item, price in zip(items, prices)
+        ])
+
+        # Комнаты, в которые гости заселяются сразу, становятся занятыми
+        occupied = {}
+        for reservation in reservations:
+            room = rooms[reservation.room_id]
+            if reservation.status == 'CHECKED_IN' and room.status != 'OCCUPIED':
+                room.status = 'OCCUPIED'
+                room.version += 1
+                occupied[room.id] = room
+        Room.objects.bulk_update(occupied.values(), ['status', 'version'])
+
+        # bulk_create и bulk_update не отправляют сигналы - обновляем производные данные сами
+        totals = defaultdict(lambda: [0, 0, 0])
+        for reservation in reservations:
+            state = rollups.reservation_state(reservation)
+            rollups.add_contribution(totals, state)
+            reservation.initial_rollup_state = state
+        rollups.apply_totals(totals)
+
+    availability.invalidate_availability_index()
+    jobs.invalidate_reservations(reservations)
+    for collection in ('reservation', 'client', 'room'):
+        collection_changed(collection)
+
+    return reservations
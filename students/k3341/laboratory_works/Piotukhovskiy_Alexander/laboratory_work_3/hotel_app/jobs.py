@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .conditional import collections_modified_at
+from .reports import build_report
+from .rollups import reservation_state
+from .routers import require_fresh, routing_scope
+from .versions import get_versions, bump_version, shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Задачи и их результаты хранятся в общем кэше (HOTEL_SHARED_CACHE): без него задача, поставленная одним процессом,
+# видна только ему, и GET /jobs/<id>, попавший в другой процесс, вернёт 404
+JOB_CACHE_KEY = 'hotel:report-job:{}'
+RESULT_CACHE_KEY = 'hotel:report-result:{}:{}:{}:{}'
+JOB_TIMEOUT = 24 * 60 * 60
+# Входит в ключ любого отчёта, поэтому её увеличение сбрасывает все закэшированные результаты
+ROOMS_VERSION_NAME = 'reports:rooms'
+# Коллекции, изменения которых меняют отчёт (дневная сводка обновляется вместе с бронированиями)
+REPORT_COLLECTIONS = ('reservation', 'room')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'HOTEL_REPORT_JOB_WORKERS', 2),
+                thread_name_prefix='report-job',
+            )
+        return _executor
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return parse_date(value)
+    return value
+
+
+def _month_version_name(year, month):
+    return f'reports:month:{year:04d}-{month:02d}'
+
+
+def _months(start_date, end_date):
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _result_cache_key(report_type, start_date, end_date):
+    # Ключ включает версии всех месяцев периода: изменение бронирования в любом из них делает результат устаревшим
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    names = [ROOMS_VERSION_NAME] + [_month_version_name(year, month) for year, month in _months(start_date, end_date)]
+    data_version = hashlib.sha1('.'.join(map(str, get_versions(names))).encode()).hexdigest()
+    return RESULT_CACHE_KEY.format(report_type, start_date, end_date, data_version)
+
+
+def get_job(job_id):
+    return shared_cache().get(JOB_CACHE_KEY.format(job_id))
+
+
+def _save_job(job):
+    shared_cache().set(JOB_CACHE_KEY.format(job['id']), job, timeout=JOB_TIMEOUT)
+
+
+def _run_job(job, result_key, fresh_since):
+    job = dict(job, status='RUNNING', started_at=timezone.now())
+    _save_job(job)
+    # Результат кэшируется под текущими версиями данных - реплика должна уже содержать эти изменения
+    require_fresh(fresh_since)
+
+    try:
+        result = build_report(job['start_date'], job['end_date'])
+    except Exception as error:
+        logger.exception('Report job %s failed', job['id'])
+        _save_job(dict(job, status='FAILED', error=str(error), finished_at=timezone.now()))
+    else:
+        shared_cache().set(result_key, result, timeout=JOB_TIMEOUT)
+        _save_job(dict(job, status='DONE', result=result, finished_at=timezone.now()))
+
+
+def _run_job_in_worker(job, result_key, fresh_since):
+    try:
+        with routing_scope():
+            _run_job(job, result_key, fresh_since)
+    finally:
+        # У каждого потока пула своё подключение к БД - закрываем его после задачи
+        connections.close_all()
+
+
+def enqueue_report(report_type, params, start_date, end_date):
+    job = {
+        'id': uuid.uuid4().hex,
+        'report_type': report_type,
+        'params': params,
+        'start_date': start_date,
+        'end_date': end_date,
+        'status': 'PENDING',
+        'created_at': timezone.now(),
+    }
+
+    result_key = _result_cache_key(report_type, start_date, end_date)
+    result = shared_cache().get(result_key)
+    if result is not None:
+        job.update(status='DONE', result=result, cached=True, finished_at=job['created_at'])
+        _save_job(job)
+        return job
+
+    _save_job(job)
+    fresh_since = collections_modified_at(REPORT_COLLECTIONS)
+    if getattr(settings, 'HOTEL_REPORT_JOBS_EAGER', False):
+        _run_job(job, result_key, fresh_since)
+    else:
+        _get_executor().submit(_run_job_in_worker, job, result_key, fresh_since)
+    return get_job(job['id']) or job
+
+
+def _reservation_months(reservation, deleted=False):
+    # Месяцы, которые затрагивает бронирование до и после изменения
+    states = [getattr(reservation, 'initial_rollup_state', None)]
+    if not deleted:
+        states.append(reservation_state(reservation))
+
+    months = set()
+    for state in states:
+        if state is None:
+            continue
+        arrival_date, departure_date = _as_date(state[1]), _as_date(state[2])
+        if isinstance(arrival_date, date) and isinstance(departure_date, date):
+            months.update(_months(arrival_date, max(arrival_date, departure_date)))
+    return months
+
+
+def _bump_on_commit(names):
+    # Версии увеличиваются после фиксации: иначе задача, запущенная до коммита, посчитает отчёт по старым данным
+    # и сохранит его под уже новыми версиями
+    names = sorted(names)
+    transaction.on_commit(lambda: [bump_version(name) for name in names])
+
+
+def invalidate_reservation(reservation, deleted=False):
+    # Сбрасывает закэшированные отчёты за месяцы, которые затрагивает бронирование до и после изменения
+    _bump_on_commit(_month_version_name(year, month) for year, month in _reservation_months(reservation, deleted))
+
+
+def invalidate_reservations(reservations):
+    # То же для пакета бронирований, записанного в обход сигналов: версия каждого месяца увеличивается один раз
+    months = set()
+    for reservation in reservations:
+        months |= _reservation_months(reservation)
+    _bump_on_commit(_month_version_name(year, month) for year, month in months)
+
+
+def invalidate_period(start_date, end_date):
+    # Для данных, загруженных в обход сигналов целиком (генератор, восстановление из копии)
+    _bump_on_commit(_month_version_name(year, month) for year, month in _months(start_date, end_date))
+
+
+def invalidate_rooms():
+    # Любое изменение номера (в том числе смена номера комнаты) меняет все отчёты
+    _bump_on_commit([ROOMS_VERSION_NAME])
+
+
+def invalidate_all():
+    # После пересчёта сводки (backfill_rollup) устаревшим может оказаться любой отчёт
+    invalidate_rooms()
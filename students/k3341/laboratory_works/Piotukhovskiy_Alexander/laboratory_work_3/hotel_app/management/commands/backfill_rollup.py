@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from hotel_app import jobs
+from hotel_app.rollups import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневную сводку по номерам (RoomDailyRollup) по истории бронирований'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='Начало периода (YYYY-MM-DD), по умолчанию - вся история')
+        parser.add_argument('--end-date', help='Конец периода включительно (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start_date = self.parse(options['start_date'], '--start-date')
+        end_date = self.parse(options['end_date'], '--end-date')
+        if start_date and end_date and end_date < start_date:
+            raise CommandError('Дата окончания не может быть раньше даты начала.')
+
+        rows = rebuild_rollup(start_date, end_date, batch_size=options['batch_size'])
+        jobs.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f'Сводка пересчитана, строк: {rows}'))
+
+    def parse(self, value, option):
+        if value is None:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Некорректная дата в {option}: {value}')
+        return parsed
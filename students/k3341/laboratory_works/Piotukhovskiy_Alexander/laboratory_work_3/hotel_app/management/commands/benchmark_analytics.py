@@ -0,0 +1,81 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hotel_app.analytics import load_stays, compute_occupancy
+from hotel_app.models import RoomType, Room, Client, Reservation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет расчёт загрузки, ADR и RevPAR на синтетических данных за несколько лет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1000)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--occupancy', type=float, default=0.7)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Синтетические данные создаются внутри транзакции и откатываются после замеров
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        start_date = date(2020, 1, 1)
+        end_date = date(2020 + options['years'], 1, 1) - timedelta(days=1)
+        days = (end_date - start_date).days + 1
+
+        room_types = [RoomType.objects.create(name=f'benchmark-analytics-{i}', capacity=i + 1) for i in range(4)]
+        rooms = Room.objects.bulk_create(
+            Room(number=900000 + i, type=rng.choice(room_types), phone=str(i)) for i in range(options['rooms'])
+        )
+        admin = User.objects.create(username='benchmark-analytics')
+        clients = Client.objects.bulk_create(
+            Client(passport_number=f'B{i:09d}', first_name='Иван', last_name='Иванов', city_from='Москва')
+            for i in range(1000)
+        )
+
+        # Для каждой комнаты - цепочка проживаний с промежутками, дающая заданную загрузку
+        reservations = []
+        for room in rooms:
+            day = rng.randint(0, 5)
+            while day < days:
+                nights = rng.randint(1, 7)
+                arrival_date = start_date + timedelta(days=day)
+                reservations.append(Reservation(
+                    room=room,
+                    client=rng.choice(clients),
+                    admin=admin,
+                    arrival_date=arrival_date,
+                    departure_date=arrival_date + timedelta(days=nights),
+                    status='CHECKED_OUT',
+                    price_at_booking=nights * rng.randint(2000, 6000),
+                    final_price=0,
+                ))
+                day += nights + int(nights * (1 - options['occupancy']) / options['occupancy']) + rng.randint(0, 1)
+        Reservation.objects.bulk_create(reservations, batch_size=5000)
+
+        self.stdout.write(f"Комнат: {options['rooms']}, дней: {days}, бронирований: {len(reservations)}")
+
+        started = time.perf_counter()
+        stays = load_stays(start_date, end_date)
+        self.stdout.write(f'Загрузка бронирований: {(time.perf_counter() - started) * 1000:.1f} мс')
+
+        for granularity in ('day', 'week', 'month'):
+            started = time.perf_counter()
+            result = compute_occupancy(stays, start_date, end_date, granularity)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Расчёт ({granularity}, периодов: {len(result['periods'])}): {elapsed * 1000:.1f} мс")
@@ -0,0 +1,113 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hotel_app.availability import AMENITY_FIELDS, find_available_rooms, available_rooms_queryset, \
+    reset_availability_index
+from hotel_app.models import RoomType, Room, Client, Reservation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск свободных комнат по индексу занятости с эквивалентным запросом через ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=600)
+        parser.add_argument('--reservations', type=int, default=50000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Синтетические данные создаются внутри транзакции и откатываются после замеров
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+
+        room_types = [
+            RoomType.objects.create(
+                name=f'benchmark-{capacity}-{i}',
+                capacity=capacity,
+                **{field: rng.random() < 0.5 for field in AMENITY_FIELDS}
+            )
+            for i, capacity in enumerate([1, 2, 2, 3, 4])
+        ]
+        rooms = Room.objects.bulk_create(
+            Room(number=900000 + i, type=rng.choice(room_types), phone=str(i)) for i in range(options['rooms'])
+        )
+        admin = User.objects.create(username='benchmark-availability')
+        clients = Client.objects.bulk_create(
+            Client(passport_number=f'B{i:09d}', first_name='Иван', last_name='Иванов', city_from='Москва')
+            for i in range(1000)
+        )
+
+        # Активные бронирования одной комнаты не пересекаются - пересекающиеся варианты пропускаются
+        occupied = {room.id: bytearray(745) for room in rooms}
+        reservations = []
+        for _ in range(options['reservations']):
+            room = rng.choice(rooms)
+            start = rng.randint(0, 730)
+            nights = rng.randint(1, 14)
+            status = rng.choice(['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CANCELLED'])
+            if status != 'CANCELLED':
+                if any(occupied[room.id][start:start + nights]):
+                    continue
+                occupied[room.id][start:start + nights] = b'\x01' * nights
+            arrival_date = today + timedelta(days=start - 30)
+            departure_date = arrival_date + timedelta(days=nights)
+            reservations.append(Reservation(
+                room=room,
+                client=rng.choice(clients),
+                admin=admin,
+                arrival_date=arrival_date,
+                departure_date=departure_date,
+                status=status,
+                price_at_booking=0,
+                final_price=0,
+            ))
+        Reservation.objects.bulk_create(reservations, batch_size=5000)
+
+        searches = []
+        for _ in range(options['queries']):
+            arrival_date = today + timedelta(days=rng.randint(0, 690))
+            searches.append((
+                arrival_date,
+                arrival_date + timedelta(days=rng.randint(1, 10)),
+                rng.randint(1, 4),
+                rng.sample(AMENITY_FIELDS, rng.randint(0, 2)),
+            ))
+
+        reset_availability_index()
+        started = time.perf_counter()
+        find_available_rooms(*searches[0])
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index_results = [find_available_rooms(*search) for search in searches]
+        index_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        orm_results = [list(available_rooms_queryset(*search).values_list('id', flat=True)) for search in searches]
+        orm_time = time.perf_counter() - started
+
+        if index_results != orm_results:
+            self.stderr.write(self.style.ERROR('Результаты индекса и ORM-запроса расходятся'))
+
+        self.stdout.write(f"Комнат: {options['rooms']}, бронирований: {len(reservations)}, "
+                          f"запросов: {options['queries']}")
+        self.stdout.write(f'Построение индекса: {build_time * 1000:.1f} мс')
+        self.stdout.write(f'Индекс: {index_time / len(searches) * 1000:.3f} мс на запрос')
+        self.stdout.write(f'ORM: {orm_time / len(searches) * 1000:.3f} мс на запрос')
@@ -0,0 +1,73 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.models import RoomType, Room, RoomPriceHistory, Reservation
+from hotel_app.views import BulkReservationView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет импорт пакета бронирований через POST /hotel/reservations/bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=300)
+        parser.add_argument('--items', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Синтетические данные создаются внутри транзакции и откатываются после замеров
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        start_date = date.today() + timedelta(days=30)
+
+        room_type = RoomType.objects.create(name='benchmark-bulk-import', capacity=2)
+        RoomPriceHistory.objects.create(room_type=room_type, start_date=start_date, price=3000)
+        rooms = Room.objects.bulk_create(
+            Room(number=900000 + i, type=room_type, phone=str(i)) for i in range(options['rooms'])
+        )
+        user = User.objects.create(username='benchmark-bulk-import')
+
+        # Цепочки проживаний без пересечений по каждой комнате
+        next_day = {room.number: rng.randint(0, 3) for room in rooms}
+        items = []
+        for i in range(options['items']):
+            number = rng.choice(rooms).number
+            nights = rng.randint(1, 7)
+            arrival_date = start_date + timedelta(days=next_day[number])
+            next_day[number] += nights + rng.randint(0, 2)
+            items.append({
+                'passport_number': f'B{rng.randint(0, options["items"]):09d}',
+                'first_name': 'Иван',
+                'last_name': 'Иванов',
+                'city_from': rng.choice(['Москва', 'Казань', 'Самара']),
+                'room_number': number,
+                'arrival_date': str(arrival_date),
+                'departure_date': str(arrival_date + timedelta(days=nights)),
+                'payment_status': rng.choice(['PAID', 'UNPAID']),
+            })
+
+        request = APIRequestFactory().post('/hotel/reservations/bulk', {'items': items}, format='json')
+        force_authenticate(request, user=user)
+        started = time.perf_counter()
+        response = BulkReservationView.as_view()(request)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Комнат: {options['rooms']}, элементов: {options['items']}, статус ответа: {response.status_code}, "
+                          f"создано: {Reservation.objects.filter(room__type=room_type).count()}")
+        self.stdout.write(f'Импорт пакета: {elapsed * 1000:.1f} мс')
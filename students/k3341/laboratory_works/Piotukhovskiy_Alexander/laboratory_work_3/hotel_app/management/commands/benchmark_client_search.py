@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hotel_app.models import Client
+from hotel_app.search import search_clients
+
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+              'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов',
+              'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв']
+FIRST_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артём', 'Илья', 'Кирилл', 'Михаил']
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Самара', 'Омск', 'Тверь', 'Пермь', 'Уфа', 'Сочи', 'Иваново']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время поиска клиентов (/hotel/clients/search) на большой синтетической таблице'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Синтетические данные создаются внутри транзакции и откатываются после замеров
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+
+        # К фамилиям добавляется числовой суффикс, чтобы получить много различных слов в индексе.
+        # Паспорт - случайная серия и уникальный номер
+        started = time.perf_counter()
+        passports = []
+        batch = []
+        for i in range(options['clients']):
+            passports.append(f'{rng.randint(1000, 9999)}{i:06d}')
+            batch.append(Client(
+                passport_number=passports[-1],
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=f'{rng.choice(LAST_NAMES)}{"" if rng.random() < 0.5 else rng.randint(1, 5000)}',
+                city_from=rng.choice(CITIES),
+            ))
+            if len(batch) == 10000:
+                Client.objects.bulk_create(batch)
+                batch = []
+        Client.objects.bulk_create(batch)
+        self.stdout.write(f"Клиентов: {options['clients']}, загрузка: {time.perf_counter() - started:.1f} с")
+
+        queries = []
+        for _ in range(options['queries']):
+            kind = rng.random()
+            if kind < 0.4:
+                surname = rng.choice(LAST_NAMES)
+                queries.append(surname[:rng.randint(2, len(surname))])
+            elif kind < 0.6:
+                queries.append(rng.choice(passports)[:rng.randint(4, 10)])
+            elif kind < 0.8:
+                queries.append(f'{rng.choice(LAST_NAMES)[:4]} {rng.choice(CITIES)[:3]}')
+            else:
+                queries.append(f'{rng.choice(LAST_NAMES)}{rng.randint(1, 5000)}')
+
+        measured = []
+        for query in queries:
+            started = time.perf_counter()
+            search_clients(query)
+            measured.append(((time.perf_counter() - started) * 1000, query))
+        measured.sort()
+        timings = [timing for timing, _ in measured]
+
+        def percentile(value):
+            return timings[min(int(len(timings) * value), len(timings) - 1)]
+
+        self.stdout.write(f'Запросов: {len(timings)}, p50: {percentile(0.5):.2f} мс, p95: {percentile(0.95):.2f} мс, '
+                          f'p99: {percentile(0.99):.2f} мс, максимум: {timings[-1]:.2f} мс')
+        self.stdout.write('Самые медленные: ' + ', '.join(f'«{query}» {timing:.2f} мс' for timing, query in measured[-5:]))
@@ -0,0 +1,126 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from hotel_app.metrics import reset_metrics
+from hotel_app.models import RoomType, Room, Client, Reservation
+
+METRICS_MIDDLEWARE = 'hotel_app.middleware.MetricsMiddleware'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет накладные расходы MetricsMiddleware: время ответа эндпоинтов с middleware и без него'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=300)
+        parser.add_argument('--reservations', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=50, help='Запросов к эндпоинту в одном раунде')
+        parser.add_argument('--rounds', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Синтетические данные создаются внутри транзакции и откатываются после замеров.
+        # Запросы идут через тестовый клиент Django с полной цепочкой middleware
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        reset_metrics()
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+
+        room_type = RoomType.objects.create(name='benchmark-metrics', capacity=2)
+        rooms = Room.objects.bulk_create(
+            Room(number=900000 + i, type=room_type, phone=str(i),
+                 status=rng.choice(['AVAILABLE', 'OCCUPIED', 'REQUIRES_CLEANING']))
+            for i in range(options['rooms'])
+        )
+        user = User.objects.create(username='benchmark-metrics')
+        clients = Client.objects.bulk_create(
+            Client(passport_number=f'B{i:09d}', first_name='Иван', last_name='Иванов',
+                   city_from=rng.choice(['Москва', 'Казань', 'Самара']))
+            for i in range(1000)
+        )
+        # Завершённые проживания не проверяются на пересечения
+        Reservation.objects.bulk_create(
+            (
+                Reservation(
+                    room=rng.choice(rooms),
+                    client=rng.choice(clients),
+                    admin=user,
+                    arrival_date=today - timedelta(days=rng.randint(30, 365)),
+                    departure_date=today - timedelta(days=rng.randint(1, 29)),
+                    status='CHECKED_OUT',
+                    price_at_booking=0,
+                    final_price=0,
+                )
+                for _ in range(options['reservations'])
+            ),
+            batch_size=5000,
+        )
+
+        endpoints = [
+            ('health', '/hotel/health'),
+            ('available-rooms-count', '/hotel/rooms?status=OCCUPIED,AVAILABLE'),
+            ('clients-list', f'/hotel/clients?start_date={today - timedelta(days=60)}&city=Казань'),
+            ('room-list', '/hotel/api/rooms/?page_size=50'),
+        ]
+
+        # Два клиента с разным набором middleware: цепочка собирается при первом запросе внутри override_settings
+        variants = {}
+        for name, middleware in (
+            ('без метрик', [item for item in settings.MIDDLEWARE if item != METRICS_MIDDLEWARE]),
+            ('с метриками', [METRICS_MIDDLEWARE] + [item for item in settings.MIDDLEWARE if item != METRICS_MIDDLEWARE]),
+        ):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            with override_settings(MIDDLEWARE=middleware):
+                client.get('/hotel/health')
+            variants[name] = client
+
+        self.stdout.write(f"Комнат: {options['rooms']}, бронирований: {options['reservations']}, "
+                          f"раундов: {options['rounds']} x {options['requests']} запросов")
+        # Кэш ответов отключён, чтобы каждый запрос доходил до БД; DEBUG выключен, как в боевой конфигурации.
+        # Раунды парные, порядок вариантов внутри пары чередуется, а накладные расходы считаются медианой
+        # по парам - так фоновые колебания нагрузки влияют на оба варианта одинаково
+        with override_settings(HOTEL_RESPONSE_CACHE_TIMEOUT=0, DEBUG=False):
+            overheads = []
+            for endpoint, url in endpoints:
+                timings = {name: [] for name in variants}
+                for round_number in range(options['rounds']):
+                    order = list(variants.items())
+                    if round_number % 2:
+                        order.reverse()
+                    for name, client in order:
+                        started = time.perf_counter()
+                        for _ in range(options['requests']):
+                            client.get(url)
+                        timings[name].append((time.perf_counter() - started) / options['requests'] * 1000)
+
+                baseline_timings, measured_timings = (timings[name] for name in variants)
+                overhead = statistics.median(
+                    (measured - baseline) / baseline * 100
+                    for baseline, measured in zip(baseline_timings, measured_timings)
+                )
+                overheads.append(overhead)
+                self.stdout.write(f'{endpoint}: без метрик {statistics.median(baseline_timings):.3f} мс, '
+                                  f'с метриками {statistics.median(measured_timings):.3f} мс, '
+                                  f'накладные расходы {overhead:+.2f}%')
+
+        self.stdout.write(f'Средние накладные расходы: {statistics.mean(overheads):+.2f}%')
@@ -0,0 +1,106 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.models import RoomType, Room, Client, Reservation
+from hotel_app.views import RoomsByStatusView, ClientsListView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность RoomsByStatusView и ClientsListView с кэшем ответов и без него'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=300)
+        parser.add_argument('--reservations', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Синтетические данные создаются внутри транзакции и откатываются после замеров
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+
+        room_type = RoomType.objects.create(name='benchmark-response-cache', capacity=2)
+        rooms = Room.objects.bulk_create(
+            Room(number=900000 + i, type=room_type, phone=str(i),
+                 status=rng.choice(['AVAILABLE', 'OCCUPIED', 'REQUIRES_CLEANING']))
+            for i in range(options['rooms'])
+        )
+        self.user = User.objects.create(username='benchmark-response-cache')
+        clients = Client.objects.bulk_create(
+            Client(passport_number=f'B{i:09d}', first_name='Иван', last_name='Иванов',
+                   city_from=rng.choice(['Москва', 'Казань', 'Самара']))
+            for i in range(2000)
+        )
+        # Активные бронирования одной комнаты не пересекаются - пересекающиеся варианты пропускаются
+        occupied = {room.id: bytearray(410) for room in rooms}
+        reservations = []
+        for _ in range(options['reservations']):
+            room = rng.choice(rooms)
+            start = rng.randint(0, 395)
+            nights = rng.randint(1, 14)
+            status = rng.choice(['CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT'])
+            if status != 'CHECKED_OUT':
+                if any(occupied[room.id][start:start + nights]):
+                    continue
+                occupied[room.id][start:start + nights] = b'\x01' * nights
+            arrival_date = today + timedelta(days=start - 365)
+            reservations.append(Reservation(
+                room=room,
+                client=rng.choice(clients),
+                admin=self.user,
+                arrival_date=arrival_date,
+                departure_date=arrival_date + timedelta(days=nights),
+                status=status,
+                price_at_booking=0,
+                final_price=0,
+            ))
+        Reservation.objects.bulk_create(reservations, batch_size=5000)
+
+        endpoints = [
+            ('RoomsByStatusView', RoomsByStatusView.as_view(), '/hotel/rooms', {'status': 'OCCUPIED,AVAILABLE'}),
+            ('ClientsListView', ClientsListView.as_view(), '/hotel/clients',
+             {'start_date': str(today - timedelta(days=60)), 'city': 'Казань'}),
+        ]
+
+        self.stdout.write(f"Комнат: {options['rooms']}, бронирований: {len(reservations)}, "
+                          f"запросов: {options['requests']}")
+        for name, view, path, params in endpoints:
+            # Таймаут 0 - записи в кэш сразу устаревают, каждый запрос вычисляется заново
+            with override_settings(HOTEL_RESPONSE_CACHE_TIMEOUT=0):
+                uncached = self.measure(view, path, params, options['requests'])
+            # Замер идёт в одном процессе - кэшу ответов достаточно кэша по умолчанию
+            with override_settings(HOTEL_SHARED_CACHE=getattr(settings, 'HOTEL_SHARED_CACHE', None) or 'default'):
+                self.measure(view, path, params, 1)
+                cached = self.measure(view, path, params, options['requests'])
+
+            self.stdout.write(f'{name}: без кэша {uncached:.1f} запр/с, с кэшем {cached:.1f} запр/с '
+                              f'(x{cached / uncached:.1f})')
+
+    def measure(self, view, path, params, count):
+        factory = APIRequestFactory()
+        started = time.perf_counter()
+        for _ in range(count):
+            request = factory.get(path, params)
+            force_authenticate(request, user=self.user)
+            view(request).render()
+        return count / (time.perf_counter() - started)
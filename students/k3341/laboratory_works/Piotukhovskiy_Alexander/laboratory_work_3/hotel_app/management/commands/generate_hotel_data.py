@@ -0,0 +1,263 @@
+import bisect
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from hotel_app import availability, jobs
+from hotel_app.conditional import COLLECTIONS, collection_changed
+from hotel_app.housekeeping import DEFAULT_CAPACITY, assign_rooms
+from hotel_app.management.commands.benchmark_client_search import CITIES, FIRST_NAMES, LAST_NAMES
+from hotel_app.models import RoomType, RoomPriceHistory, Room, Client, Reservation, EmployeePosition, Employee, \
+    EmploymentContract, CleaningSchedule
+from hotel_app.rollups import rebuild_rollup
+
+# Название, вместимость, базовая цена за сутки и удобства типов номеров
+ROOM_TYPES = [
+    ('Стандарт', 2, 3500, ['has_wifi', 'has_tv', 'has_hair_dryer']),
+    ('Улучшенный', 2, 5000, ['has_wifi', 'has_tv', 'has_hair_dryer', 'has_tea_station', 'has_safe']),
+    ('Семейный', 4, 6500, ['has_wifi', 'has_tv', 'has_hair_dryer', 'has_tea_station', 'has_iron_board']),
+    ('Люкс', 2, 12000, ['has_wifi', 'has_tv', 'has_hair_dryer', 'has_tea_station', 'has_safe',
+                        'has_coffee_machine', 'has_air_conditioning', 'has_bathrobe_slippers', 'has_balcony']),
+]
+ROOM_TYPE_WEIGHTS = [50, 25, 15, 10]
+ROOMS_PER_FLOOR = 50
+ADMINS = 5
+CLEANER_POSITION = 'Горничная'
+CLEANER_SALARY = 45000
+# Доля отменённых бронирований: они не занимают номер и не сдвигают последовательность проживаний
+CANCELLED_SHARE = 0.1
+# Бронирования создаются до BOOKING_HORIZON дней вперёд от сегодняшнего дня
+BOOKING_HORIZON = 90
+# Длительность проживания в сутках и её вес; в среднем бронирование вместе с простоем занимает меньше
+# DAYS_PER_RESERVATION дней, по этой оценке выбирается начало истории цен
+STAY_NIGHTS = [1, 2, 3, 4, 5, 7, 10, 14]
+STAY_WEIGHTS = [20, 25, 20, 12, 8, 8, 4, 3]
+DAYS_PER_RESERVATION = 5
+MAX_CLIENTS = 1_000_000
+
+
+class Command(BaseCommand):
+    help = ('Заполняет пустую БД синтетическими данными в объёмах, близких к боевым: комнаты, клиенты, бронирования '
+            'с историей цен и графики уборки. Записи создаются пакетами через bulk_create, производные данные '
+            '(дневная сводка, индекс доступности, метки коллекций) пересчитываются в конце')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1000)
+        parser.add_argument('--clients', type=int, default=1_000_000)
+        parser.add_argument('--reservations', type=int, default=5_000_000)
+        parser.add_argument('--years', type=int, default=5, help='Глубина истории графиков уборки, лет')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if Room.objects.exists() or Client.objects.exists():
+            raise CommandError('В БД уже есть комнаты или клиенты: генератор заполняет только пустую БД.')
+        if options['rooms'] < 1 or options['clients'] < 1:
+            raise CommandError('Нужна хотя бы одна комната и один клиент.')
+        if options['clients'] > MAX_CLIENTS:
+            raise CommandError(f'Номер паспорта - 4 цифры серии и 6 цифр номера: не больше {MAX_CLIENTS} клиентов.')
+
+        self.rng = random.Random(options['seed'])
+        self.today = date.today()
+        self.batch_size = options['batch_size']
+
+        with transaction.atomic():
+            history_days = -(-options['reservations'] // options['rooms']) * DAYS_PER_RESERVATION
+            rooms, prices = self.create_rooms(options['rooms'], self.today - timedelta(days=history_days))
+            client_ids = self.create_clients(options['clients'])
+            first_arrival = self.create_reservations(rooms, prices, client_ids, options['reservations'])
+            self.create_cleaning_schedules(rooms, options['years'])
+
+            started = time.perf_counter()
+            rollup_rows = rebuild_rollup(batch_size=self.batch_size)
+            self.report('Дневная сводка', rollup_rows, started)
+
+        # bulk_create не отправляет сигналы - сбрасываем кэши, зависящие от данных, сами
+        availability.invalidate_availability_index()
+        jobs.invalidate_rooms()
+        jobs.invalidate_period(first_arrival, self.today + timedelta(days=BOOKING_HORIZON * 2))
+        for collection in COLLECTIONS.values():
+            collection_changed(collection)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: история бронирований с {first_arrival}, графики уборки за {options["years"]} лет'
+        ))
+
+    def report(self, name, count, started):
+        self.stdout.write(f'{name}: {count}, {time.perf_counter() - started:.1f} с')
+
+    def save(self, model, objects):
+        objects = list(objects)
+        for start in range(0, len(objects), self.batch_size):
+            model.objects.bulk_create(objects[start:start + self.batch_size])
+        return len(objects)
+
+    def create_rooms(self, count, history_start):
+        started = time.perf_counter()
+        room_types = []
+        for name, capacity, _, amenities in ROOM_TYPES:
+            room_type, _ = RoomType.objects.get_or_create(
+                name=name, defaults={'capacity': capacity, **{amenity: True for amenity in amenities}},
+            )
+            room_types.append(room_type)
+
+        # История цен: с начала истории бронирований цена каждого типа меняется раз в квартал.
+        # Точное начало истории известно только после генерации бронирований, поэтому оно оценивается по объёму
+        prices = {}
+        start = date(history_start.year, 1, 1)
+        history = []
+        for room_type, (_, _, base_price, _) in zip(room_types, ROOM_TYPES):
+            changes = []
+            period_start, price = start, base_price
+            while period_start <= self.today + timedelta(days=BOOKING_HORIZON * 2):
+                month = period_start.month + 3
+                period_end = date(period_start.year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+                changes.append((period_start, price))
+                history.append(RoomPriceHistory(room_type=room_type, start_date=period_start,
+                                                end_date=period_end - timedelta(days=1), price=price))
+                period_start = period_end
+                price = max(500, round(price * self.rng.uniform(0.97, 1.06) / 50) * 50)
+            # Последняя цена действует бессрочно
+            history[-1].end_date = None
+            prices[room_type.id] = ([change_date for change_date, _ in changes], [value for _, value in changes])
+        self.save(RoomPriceHistory, history)
+
+        rooms = Room.objects.bulk_create(
+            Room(
+                number=(i // ROOMS_PER_FLOOR + 1) * 100 + i % ROOMS_PER_FLOOR + 1,
+                type=self.rng.choices(room_types, weights=ROOM_TYPE_WEIGHTS)[0],
+                phone=f'{(i // ROOMS_PER_FLOOR + 1) * 100 + i % ROOMS_PER_FLOOR + 1}',
+                status=self.rng.choices(['AVAILABLE', 'REQUIRES_CLEANING', 'MAINTENANCE'], weights=[85, 13, 2])[0],
+            )
+            for i in range(count)
+        )
+        self.report('Комнаты', len(rooms), started)
+        return rooms, prices
+
+    def create_clients(self, count):
+        started = time.perf_counter()
+        # Паспорт - случайная серия и уникальный номер, как в benchmark_client_search
+        batch = []
+        for i in range(count):
+            batch.append(Client(
+                passport_number=f'{self.rng.randint(1000, 9999)}{i:06d}',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=f'{self.rng.choice(LAST_NAMES)}{"" if self.rng.random() < 0.5 else self.rng.randint(1, 5000)}',
+                city_from=self.rng.choice(CITIES),
+            ))
+            if len(batch) == self.batch_size:
+                Client.objects.bulk_create(batch)
+                batch = []
+        Client.objects.bulk_create(batch)
+        client_ids = list(Client.objects.order_by('id').values_list('id', flat=True))
+        self.report('Клиенты', len(client_ids), started)
+        return client_ids
+
+    def price(self, prices, room, arrival_date, departure_date):
+        change_dates, values = prices[room.type_id]
+        position = max(bisect.bisect_right(change_dates, arrival_date) - 1, 0)
+        return values[position] * (departure_date - arrival_date).days
+
+    def create_reservations(self, rooms, prices, client_ids, count):
+        # У каждой комнаты - цепочка непересекающихся проживаний назад от горизонта бронирования, поэтому глубина
+        # истории определяется объёмом: 5 млн бронирований на 1000 комнат уходят на десятки лет назад.
+        # Статус зависит от дат: прошлые - выселены, текущие - заселены, будущие - забронированы или подтверждены
+        started = time.perf_counter()
+        admins = [User.objects.get_or_create(username=f'admin{number}')[0] for number in range(1, ADMINS + 1)]
+        horizon = self.today + timedelta(days=BOOKING_HORIZON)
+        first_arrival = self.today
+        created = 0
+        batch = []
+        occupied = set()
+
+        for position, room in enumerate(rooms):
+            per_room = count // len(rooms) + (1 if position < count % len(rooms) else 0)
+            departure_date = horizon - timedelta(days=self.rng.randint(0, 14))
+            for _ in range(per_room):
+                nights = self.rng.choices(STAY_NIGHTS, weights=STAY_WEIGHTS)[0]
+                arrival_date = departure_date - timedelta(days=nights)
+                cancelled = self.rng.random() < CANCELLED_SHARE
+                if cancelled:
+                    status, payment_status = 'CANCELLED', self.rng.choice(['REFUNDED', 'UNPAID'])
+                elif departure_date <= self.today:
+                    status, payment_status = 'CHECKED_OUT', 'PAID'
+                elif arrival_date <= self.today:
+                    status, payment_status = 'CHECKED_IN', self.rng.choice(['PAID', 'PREPAID'])
+                    occupied.add(room.id)
+                else:
+                    status = self.rng.choice(['BOOKED', 'CONFIRMED'])
+                    payment_status = self.rng.choice(['UNPAID', 'PREPAID'])
+
+                price = self.price(prices, room, arrival_date, departure_date)
+                batch.append(Reservation(
+                    room=room,
+                    client_id=self.rng.choice(client_ids),
+                    admin=self.rng.choice(admins),
+                    booking_date=min(arrival_date - timedelta(days=self.rng.randint(0, 60)), self.today),
+                    arrival_date=arrival_date,
+                    departure_date=departure_date,
+                    status=status,
+                    payment_status=payment_status,
+                    price_at_booking=price,
+                    final_price=price,
+                ))
+                first_arrival = min(first_arrival, arrival_date)
+                if not cancelled:
+                    # Между проживаниями номер иногда простаивает
+                    departure_date = arrival_date - timedelta(days=self.rng.choices([0, 1, 2], weights=[70, 20, 10])[0])
+
+                if len(batch) == self.batch_size:
+                    created += self.save(Reservation, batch)
+                    batch = []
+        created += self.save(Reservation, batch)
+
+        Room.objects.filter(id__in=occupied).update(status='OCCUPIED')
+        self.report('Бронирования', created, started)
+        return first_arrival
+
+    def create_cleaning_schedules(self, rooms, years):
+        # Уборщиков столько, чтобы каждый убирал не больше DEFAULT_CAPACITY комнат в день. Закрепление комнат
+        # за уборщиками по этажам строится один раз и сдвигается по кругу каждый день
+        started = time.perf_counter()
+        position, _ = EmployeePosition.objects.get_or_create(name=CLEANER_POSITION, defaults={'salary': CLEANER_SALARY})
+        cleaners_count = -(-len(rooms) // DEFAULT_CAPACITY)
+        employees = Employee.objects.bulk_create(
+            Employee(
+                passport_number=f'E{number:09d}',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+            )
+            for number in range(cleaners_count)
+        )
+        start_date = self.today - timedelta(days=365 * years)
+        contracts = EmploymentContract.objects.bulk_create(
+            EmploymentContract(employee=employee, position=position, contract_type='PERMANENT', start_date=start_date)
+            for employee in employees
+        )
+
+        assignments, _ = assign_rooms([(room.id, room.number) for room in rooms],
+                                      [contract.id for contract in contracts], DEFAULT_CAPACITY)
+        shifts = list(assignments.values())
+        cleaner_ids = list(assignments)
+
+        created = 0
+        batch = []
+        day = start_date
+        while day <= self.today + timedelta(days=7):
+            status = 'COMPLETED' if day < self.today else 'IN_PROGRESS' if day == self.today else 'PENDING'
+            offset = (day - start_date).days
+            for shift, room_ids in enumerate(shifts):
+                cleaner_id = cleaner_ids[(shift + offset) % len(cleaner_ids)]
+                for room_id, _ in room_ids:
+                    batch.append(CleaningSchedule(cleaner_id=cleaner_id, room_id=room_id, cleaning_date=day,
+                                                  status=status))
+            if len(batch) >= self.batch_size:
+                created += self.save(CleaningSchedule, batch)
+                batch = []
+            day += timedelta(days=1)
+        created += self.save(CleaningSchedule, batch)
+        self.report('Графики уборки', created, started)
@@ -0,0 +1,277 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from hotel_app.management.commands.benchmark_client_search import CITIES
+from hotel_app.models import Room, Client
+from hotel_app.serializers import DAYS_OF_WEEK
+
+SAMPLE_SIZE = 1000
+
+
+def _stay(rng, today):
+    arrival_date = today + timedelta(days=rng.randint(0, 60))
+    return arrival_date, arrival_date + timedelta(days=rng.choice([1, 2, 3, 5, 7]))
+
+
+def _period(rng, today, max_days):
+    end_date = today - timedelta(days=rng.randint(0, 365))
+    return end_date - timedelta(days=rng.randint(1, max_days)), end_date
+
+
+# Смесь запросов: маршрут, вес и построитель запроса (метод, адрес, параметры или тело). Веса примерно повторяют
+# соотношение обращений к API в течение рабочего дня: поиск гостей и свободных номеров, карточки и списки,
+# расчёт стоимости; тяжёлые отчёты запрашиваются редко. Изменяющие запросы в смесь не входят,
+# чтобы повторные прогоны на одних и тех же данных были сравнимы
+def _clients_list(rng, sample):
+    start_date, end_date = _period(rng, sample['today'], 30)
+    return 'get', '/hotel/clients', {'start_date': start_date, 'end_date': end_date, 'city': rng.choice(CITIES)}
+
+
+def _client_search(rng, sample):
+    last_name, passport = rng.choice(sample['clients'])
+    query = passport[:rng.randint(4, 10)] if rng.random() < 0.3 else last_name[:rng.randint(2, len(last_name))]
+    return 'get', '/hotel/clients/search', {'q': query}
+
+
+def _rooms_by_status(rng, sample):
+    statuses = rng.sample(['AVAILABLE', 'OCCUPIED', 'REQUIRES_CLEANING'], rng.randint(1, 2))
+    return 'get', '/hotel/rooms', {'status': ','.join(statuses)}
+
+
+def _available_rooms(rng, sample):
+    arrival_date, departure_date = _stay(rng, sample['today'])
+    return 'get', '/hotel/rooms/available', {'arrival_date': arrival_date, 'departure_date': departure_date}
+
+
+def _stay_overlap(rng, sample):
+    return 'get', '/hotel/clients/stay-overlap', {'client_id': rng.randint(*sample['client_ids'])}
+
+
+def _room_cleaner(rng, sample):
+    return 'get', '/hotel/clients/room-cleaner', {
+        'client_id': rng.randint(*sample['client_ids']),
+        'day_of_week': rng.choice(DAYS_OF_WEEK)[0],
+    }
+
+
+def _room_list(rng, sample):
+    return 'get', '/hotel/api/rooms/', {'page_size': 50}
+
+
+def _room_detail(rng, sample):
+    return 'get', f'/hotel/api/rooms/{rng.choice(sample["room_ids"])}/', {}
+
+
+def _reservation_list(rng, sample):
+    return 'get', '/hotel/api/reservations/', {'page_size': 50}
+
+
+def _price_quote(rng, sample):
+    items = []
+    for _ in range(rng.randint(1, 3)):
+        arrival_date, departure_date = _stay(rng, sample['today'])
+        items.append({'room_number': rng.choice(sample['room_numbers']),
+                      'arrival_date': arrival_date.isoformat(), 'departure_date': departure_date.isoformat()})
+    return 'post', '/hotel/pricing/quote', {'items': items}
+
+
+def _quarterly_report(rng, sample):
+    return 'get', '/hotel/reports/quarterly', {
+        'year': sample['today'].year - rng.randint(1, 3), 'quarter': rng.randint(1, 4),
+    }
+
+
+def _occupancy(rng, sample):
+    start_date, end_date = _period(rng, sample['today'], 365)
+    return 'get', '/hotel/analytics/occupancy', {
+        'start_date': start_date, 'end_date': end_date, 'granularity': rng.choice(['day', 'week', 'month']),
+    }
+
+
+def _range_report(rng, sample):
+    start_date, end_date = _period(rng, sample['today'], 90)
+    return 'get', '/hotel/reports/range', {'start_date': start_date, 'end_date': end_date}
+
+
+def _health(rng, sample):
+    return 'get', '/hotel/health', {}
+
+
+REQUEST_MIX = [
+    ('client-search', 15, _client_search),
+    ('available-rooms', 15, _available_rooms),
+    ('clients-list', 8, _clients_list),
+    ('available-rooms-count', 8, _rooms_by_status),
+    ('client-stay-overlap', 8, _stay_overlap),
+    ('pricing-quote', 8, _price_quote),
+    ('room-list', 8, _room_list),
+    ('room-detail', 6, _room_detail),
+    ('reservation-list', 6, _reservation_list),
+    ('client-room-cleaning', 4, _room_cleaner),
+    ('occupancy-analytics', 4, _occupancy),
+    ('quarterly-report', 3, _quarterly_report),
+    ('range-report', 2, _range_report),
+    ('health', 2, _health),
+]
+
+
+def _percentile(timings, value):
+    return timings[min(int(len(timings) * value), len(timings) - 1)]
+
+
+def _commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон API в процессе: потоки-клиенты в течение заданного времени отправляют взвешенную '
+            'смесь запросов к эндпоинтам отеля, итог - пропускная способность и p50/p95/p99 по эндпоинтам в JSON. '
+            'Данные берутся из текущей БД (см. generate_hotel_data)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=30, help='Длительность замера, секунды')
+        parser.add_argument('--warmup', type=float, default=3, help='Прогрев перед замером, секунды')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-cache', action='store_true', help='Отключить кэш ответов')
+        parser.add_argument('--output', help='Файл для JSON-отчёта, по умолчанию - stdout')
+
+    def handle(self, *args, **options):
+        sample = self.load_sample(random.Random(options['seed']))
+        user, _ = User.objects.get_or_create(username='load-test')
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'], 'DEBUG': False}
+        if options['no_cache']:
+            overrides['HOTEL_RESPONSE_CACHE_TIMEOUT'] = 0
+        elif not getattr(settings, 'HOTEL_SHARED_CACHE', None):
+            # Все клиенты работают в этом процессе - кэшу ответов достаточно кэша по умолчанию
+            overrides['HOTEL_SHARED_CACHE'] = 'default'
+        with override_settings(**overrides):
+            results, elapsed = self.run_workers(options, sample, user)
+
+        report = self.build_report(options, results, elapsed)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(text + '\n')
+            self.stderr.write(f"Отчёт сохранён в {options['output']}: {report['requests']} запросов, "
+                              f"{report['throughput_rps']} запросов/с")
+        else:
+            self.stdout.write(text)
+
+    def load_sample(self, rng):
+        rooms = list(Room.objects.values_list('id', 'number'))
+        client_ids = Client.objects.aggregate(first=Min('id'), last=Max('id'))
+        if not rooms or client_ids['first'] is None:
+            raise CommandError('В БД нет комнат или клиентов: сначала заполните её командой generate_hotel_data.')
+
+        # Клиенты для поиска выбираются по случайным id, чтобы не сортировать всю таблицу
+        ids = [rng.randint(client_ids['first'], client_ids['last']) for _ in range(SAMPLE_SIZE)]
+        clients = list(Client.objects.filter(id__in=ids).values_list('last_name', 'passport_number'))
+        return {
+            'today': date.today(),
+            'room_ids': [room_id for room_id, _ in rooms],
+            'room_numbers': [number for _, number in rooms],
+            'client_ids': (client_ids['first'], client_ids['last']),
+            'clients': clients,
+        }
+
+    def run_workers(self, options, sample, user):
+        names = [name for name, _, _ in REQUEST_MIX]
+        weights = [weight for _, weight, _ in REQUEST_MIX]
+        builders = {name: builder for name, _, builder in REQUEST_MIX}
+        results = []
+        barrier = threading.Barrier(options['workers'] + 1)
+        lock = threading.Lock()
+
+        def worker(number):
+            rng = random.Random(options['seed'] + number)
+            client = APIClient()
+            client.force_authenticate(user=user)
+            measured = []
+            barrier.wait()
+            try:
+                while True:
+                    started = time.perf_counter()
+                    if started >= deadline:
+                        break
+                    name = rng.choices(names, weights=weights)[0]
+                    method, path, data = builders[name](rng, sample)
+                    try:
+                        if method == 'get':
+                            status = client.get(path, data).status_code
+                        else:
+                            status = client.post(path, data, format='json').status_code
+                    except Exception as error:
+                        status = type(error).__name__
+                    finished = time.perf_counter()
+                    if started >= measure_from:
+                        measured.append((name, finished - started, status))
+            finally:
+                connections.close_all()
+            with lock:
+                results.extend(measured)
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        measure_from = time.perf_counter() + options['warmup']
+        deadline = measure_from + options['duration']
+        barrier.wait()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - measure_from
+
+    def build_report(self, options, results, elapsed):
+        # Ошибки - ответы 5xx и исключения; 4xx (например, 404 для клиента без проживаний) - обычные ответы
+        by_endpoint = defaultdict(list)
+        for name, latency, status in results:
+            by_endpoint[name].append((latency, status))
+
+        endpoints = {}
+        for name, _, _ in REQUEST_MIX:
+            measured = by_endpoint.get(name)
+            if not measured:
+                continue
+            timings = sorted(latency * 1000 for latency, _ in measured)
+            statuses = Counter(str(status) for _, status in measured)
+            endpoints[name] = {
+                'requests': len(measured),
+                'errors': sum(count for status, count in statuses.items() if not status.isdigit() or status >= '500'),
+                'statuses': dict(sorted(statuses.items())),
+                'throughput_rps': round(len(measured) / elapsed, 2),
+                'p50_ms': round(_percentile(timings, 0.5), 2),
+                'p95_ms': round(_percentile(timings, 0.95), 2),
+                'p99_ms': round(_percentile(timings, 0.99), 2),
+                'max_ms': round(timings[-1], 2),
+            }
+
+        return {
+            'commit': _commit(),
+            'database': connections['default'].vendor,
+            'workers': options['workers'],
+            'duration_seconds': round(elapsed, 2),
+            'response_cache': not options['no_cache'],
+            'requests': len(results),
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'throughput_rps': round(len(results) / elapsed, 2),
+            'endpoints': endpoints,
+        }
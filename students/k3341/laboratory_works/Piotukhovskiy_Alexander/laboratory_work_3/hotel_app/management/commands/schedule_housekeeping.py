@@ -0,0 +1,51 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from hotel_app.housekeeping import DEFAULT_CAPACITY, schedule_housekeeping
+from hotel_app.models import EmployeePosition
+
+
+class Command(BaseCommand):
+    help = 'Распределяет уборку комнат со статусом «Требуется уборка» между сотрудниками на указанный день'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Дата уборки (YYYY-MM-DD), по умолчанию - сегодня')
+        parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                            help='Максимальное количество уборок на сотрудника за день')
+        parser.add_argument('--position-id', type=int, help='Распределять только между сотрудниками этой должности')
+        parser.add_argument('--dry-run', action='store_true', help='Показать распределение, не сохраняя его')
+
+    def handle(self, *args, **options):
+        cleaning_date = date.today()
+        if options['date'] is not None:
+            cleaning_date = parse_date(options['date'])
+            if cleaning_date is None:
+                raise CommandError(f"Некорректная дата в --date: {options['date']}")
+        if options['capacity'] < 1:
+            raise CommandError('--capacity должен быть положительным.')
+        if options['position_id'] is not None and not EmployeePosition.objects.filter(id=options['position_id']).exists():
+            raise CommandError(f"Должность с id {options['position_id']} не найдена.")
+
+        started = time.perf_counter()
+        result = schedule_housekeeping(
+            cleaning_date,
+            capacity=options['capacity'],
+            position_id=options['position_id'],
+            commit=not options['dry_run'],
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+
+        for assignment in result['assignments']:
+            self.stdout.write(f"Сотрудник {assignment['employee_id']}: "
+                              f"{', '.join(map(str, assignment['room_numbers']))}")
+        if result['unassigned_room_numbers']:
+            self.stdout.write(self.style.WARNING(
+                f"Не распределены: {', '.join(map(str, result['unassigned_room_numbers']))}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{cleaning_date}: комнат {result['rooms']}, сотрудников {result['cleaners']}, "
+            f"назначено {result['assigned']}{' (без сохранения)' if options['dry_run'] else ''}, {elapsed:.1f} мс"
+        ))
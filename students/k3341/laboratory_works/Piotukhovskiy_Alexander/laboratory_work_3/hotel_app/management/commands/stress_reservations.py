@@ -0,0 +1,114 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.models import RoomType, Room, Client, Reservation
+from hotel_app.views import ReservationManagementView, BulkReservationView
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочная проверка конкурентных правок: потоки одновременно изменяют одно бронирование с If-Match '
+            'и бронируют одну комнату на пересекающиеся даты')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=25)
+
+    def handle(self, *args, **options):
+        # Потокам нужны зафиксированные данные, поэтому они создаются вне транзакции и удаляются в конце
+        self.user = User.objects.create(username='stress-reservations')
+        room_type = RoomType.objects.create(name='stress-reservations', capacity=1)
+        try:
+            self.room = Room.objects.create(number=990001, type=room_type, phone='990001')
+            client = Client.objects.create(passport_number='S000000000', first_name='Иван', last_name='Иванов',
+                                           city_from='Москва')
+            self.reservation = Reservation.objects.create(
+                room=self.room, client=client, admin=self.user, arrival_date=date(2030, 1, 1),
+                departure_date=date(2030, 1, 5), price_at_booking=0, final_price=0,
+            )
+            self.check_updates(options)
+            self.check_bookings(options)
+        finally:
+            Client.objects.filter(passport_number__startswith='S').filter(reservation__room__type=room_type).delete()
+            room_type.delete()
+            self.user.delete()
+
+    def run_threads(self, count, target):
+        results = []
+        barrier = threading.Barrier(count)
+
+        def worker(number):
+            barrier.wait()
+            try:
+                results.extend(target(number))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def call(self, view, method, path, data, view_kwargs=None, **headers):
+        while True:
+            request = getattr(APIRequestFactory(), method)(path, data, format='json', **headers)
+            force_authenticate(request, user=self.user)
+            try:
+                return view(request, **(view_kwargs or {}))
+            except OperationalError:
+                # SQLite отклоняет запись, пока другой поток держит блокировку, - повторяем как клиент
+                time.sleep(0.005)
+
+    def check_updates(self, options):
+        view = ReservationManagementView.as_view()
+        path = f'/hotel/reservation/{self.reservation.id}'
+
+        def edit(number):
+            statuses = []
+            for attempt in range(options['attempts']):
+                version = Reservation.objects.values_list('version', flat=True).get(id=self.reservation.id)
+                response = self.call(
+                    view, 'patch', path, {'payment_status': ['PAID', 'UNPAID'][(number + attempt) % 2]},
+                    view_kwargs={'reservation_id': self.reservation.id}, HTTP_IF_MATCH=f'"{version}"',
+                )
+                statuses.append(response.status_code)
+            return statuses
+
+        statuses, elapsed = self.run_threads(options['threads'], edit)
+        version = Reservation.objects.values_list('version', flat=True).get(id=self.reservation.id)
+        self.stdout.write(f'Правки: {len(statuses)} запросов за {elapsed:.2f} с, успешных {statuses.count(200)}, '
+                          f'конфликтов 412: {statuses.count(412)}, версия {version}')
+        if set(statuses) - {200, 412}:
+            raise CommandError(f'Неожиданные ответы: {sorted(set(statuses) - {200, 412})}')
+        if version != 1 + statuses.count(200):
+            raise CommandError('Число успешных правок не совпадает с версией - часть обновлений потеряна.')
+
+    def check_bookings(self, options):
+        view = BulkReservationView.as_view()
+
+        def book(number):
+            arrival_date = date(2030, 2, 1) + timedelta(days=number)
+            response = self.call(view, 'post', '/hotel/reservations/bulk', {'items': [{
+                'passport_number': f'S{number + 1:09d}', 'first_name': 'Иван', 'last_name': 'Иванов',
+                'city_from': 'Москва', 'room_number': self.room.number, 'arrival_date': str(arrival_date),
+                'departure_date': str(arrival_date + timedelta(days=3)),
+            }]})
+            return [response.status_code]
+
+        statuses, elapsed = self.run_threads(options['threads'], book)
+        stays = sorted(Reservation.objects.filter(room=self.room, arrival_date__gte=date(2030, 2, 1)).values_list(
+            'arrival_date', 'departure_date'
+        ))
+        self.stdout.write(f'Бронирования: {len(statuses)} запросов за {elapsed:.2f} с, создано {len(stays)}')
+        if len(stays) != statuses.count(201):
+            raise CommandError('Число созданных бронирований не совпадает с успешными ответами.')
+        if any(departure > arrival for (_, departure), (arrival, _) in zip(stays, stays[1:])):
+            raise CommandError('Бронирования комнаты пересекаются.')
@@ -0,0 +1,146 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from rest_framework.renderers import BaseRenderer
+
+# Границы корзин гистограммы времени ответа, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Запросы, для которых не нашлось маршрута (404 до представления)
+UNMATCHED_ENDPOINT = 'unmatched'
+
+
+class EndpointStats:
+    __slots__ = ('responses', 'buckets', 'latency_sum', 'queries', 'sql_seconds')
+
+    def __init__(self):
+        self.responses = defaultdict(int)
+        # Последняя корзина - запросы дольше самой большой границы (+Inf)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+class QueryTimer:
+    # Число SQL-запросов и их суммарное время в рамках HTTP-запроса
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Таймер текущего HTTP-запроса; вне MetricsMiddleware запросы не учитываются
+_current_timer = ContextVar('hotel_query_timer', default=None)
+
+
+def start_query_timer():
+    timer = QueryTimer()
+    return timer, _current_timer.set(timer)
+
+
+def stop_query_timer(token):
+    _current_timer.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.seconds += time.perf_counter() - started
+        timer.queries += 1
+
+
+def track_queries(connection):
+    # Обёртка ставится один раз на соединение (сигнал connection_created), а не на каждый HTTP-запрос:
+    # так middleware не перебирает все соединения и почти ничего не стоит запросам без SQL
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+_lock = threading.Lock()
+_endpoints = {}
+
+
+def record_request(endpoint, method, status, latency, queries, sql_seconds):
+    with _lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = EndpointStats()
+        stats.responses[method, status] += 1
+        stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        stats.latency_sum += latency
+        stats.queries += queries
+        stats.sql_seconds += sql_seconds
+
+
+def reset_metrics():
+    with _lock:
+        _endpoints.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    # Текстовый формат Prometheus 0.0.4; снимок берётся под блокировкой, текст собирается без неё
+    with _lock:
+        snapshot = [
+            (endpoint, dict(stats.responses), list(stats.buckets), stats.latency_sum, stats.queries, stats.sql_seconds)
+            for endpoint, stats in sorted(_endpoints.items())
+        ]
+
+    requests = [
+        '# HELP hotel_http_requests_total Количество HTTP-запросов по маршруту, методу и статусу ответа.',
+        '# TYPE hotel_http_requests_total counter',
+    ]
+    durations = [
+        '# HELP hotel_http_request_duration_seconds Время обработки HTTP-запроса.',
+        '# TYPE hotel_http_request_duration_seconds histogram',
+    ]
+    queries = [
+        '# HELP hotel_sql_queries_total Количество SQL-запросов, выполненных при обработке HTTP-запросов.',
+        '# TYPE hotel_sql_queries_total counter',
+    ]
+    sql_time = [
+        '# HELP hotel_sql_duration_seconds_total Суммарное время SQL-запросов при обработке HTTP-запросов.',
+        '# TYPE hotel_sql_duration_seconds_total counter',
+    ]
+
+    for endpoint, responses, buckets, latency_sum, query_count, sql_seconds in snapshot:
+        name = _label(endpoint)
+        for (method, status), count in sorted(responses.items()):
+            requests.append(
+                f'hotel_http_requests_total{{endpoint="{name}",method="{_label(method)}",status="{status}"}} {count}'
+            )
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            durations.append(f'hotel_http_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+        durations.append(f'hotel_http_request_duration_seconds_sum{{endpoint="{name}"}} {latency_sum:.6f}')
+        durations.append(f'hotel_http_request_duration_seconds_count{{endpoint="{name}"}} {cumulative}')
+        queries.append(f'hotel_sql_queries_total{{endpoint="{name}"}} {query_count}')
+        sql_time.append(f'hotel_sql_duration_seconds_total{{endpoint="{name}"}} {sql_seconds:.6f}')
+
+    return '\n'.join(requests + durations + queries + sql_time) + '\n'
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Ошибки (например, 401) приходят словарём - отдаём их как текст
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items()) + '\n'
+        return data.encode(self.charset)
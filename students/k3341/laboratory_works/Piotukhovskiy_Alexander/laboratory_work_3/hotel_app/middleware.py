@@ -0,0 +1,48 @@
+import time
+
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import UNMATCHED_ENDPOINT, record_request, start_query_timer, stop_query_timer
+from .routers import routing_scope, unpin_primary
+
+
+class MetricsMiddleware:
+    # Время ответа, число и время SQL-запросов по имени маршрута (/hotel/metrics). Должна стоять первой,
+    # чтобы учитывать остальные middleware. SQL потоковых ответов (выгрузки), выполняемый уже при отдаче
+    # тела, и запросы фоновых задач не учитываются
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer, token = start_query_timer()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_query_timer(token)
+        latency = time.perf_counter() - started
+
+        match = request.resolver_match
+        endpoint = (match.url_name or match.view_name) if match is not None else UNMATCHED_ENDPOINT
+        record_request(endpoint, request.method, response.status_code, latency, timer.queries, timer.seconds)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    # Запросы с безопасными методами читают из реплики, остальные - из первичной БД.
+    # Представления с атрибутом read_from_replica (отчёты) читают из реплики при любом методе;
+    # после первой записи запрос в любом случае переключается на первичную БД
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_scope(pinned=request.method not in SAFE_METHODS):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if getattr(view_class, 'read_from_replica', False):
+            unpin_primary()
+        return None
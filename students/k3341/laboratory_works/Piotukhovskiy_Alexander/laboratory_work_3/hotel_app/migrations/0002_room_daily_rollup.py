@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('reservations', models.IntegerField(default=0, verbose_name='Количество заездов')),
+                ('nights', models.IntegerField(default=0, verbose_name='Количество занятых ночей')),
+                ('income', models.BigIntegerField(default=0, verbose_name='Доход')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hotel_app.room', verbose_name='Комната')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'room'), name='unique_room_daily_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0002_room_daily_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['cleaning_date', 'id'], name='cleaning_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['last_name', 'id'], name='client_last_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['last_name', 'id'], name='employee_last_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employmentcontract',
+            index=models.Index(fields=['start_date', 'id'], name='contract_start_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['arrival_date', 'id'], name='reservation_arrival_id_idx'),
+        ),
+    ]
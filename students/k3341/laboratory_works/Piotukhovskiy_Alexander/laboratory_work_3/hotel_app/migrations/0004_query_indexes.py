@@ -0,0 +1,62 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deactivate_duplicate_contracts(apps, schema_editor):
+    # Перед добавлением ограничения оставляем активным только самый поздний контракт сотрудника
+    EmploymentContract = apps.get_model('hotel_app', 'EmploymentContract')
+    seen = set()
+    for contract in EmploymentContract.objects.filter(is_active=True).order_by('employee_id', '-start_date', '-id'):
+        if contract.employee_id in seen:
+            contract.is_active = False
+            contract.save(update_fields=['is_active'])
+        seen.add(contract.employee_id)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0003_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['room', 'cleaning_date'], name='cleaning_room_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['cleaner', 'cleaning_date'], name='cleaning_cleaner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employmentcontract',
+            index=models.Index(fields=['employee', 'is_active'], name='contract_employee_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'status', 'arrival_date'], name='reservation_room_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['arrival_date', 'departure_date'], name='reservation_stay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['client', 'departure_date'], name='reservation_client_stay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status'], name='room_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roompricehistory',
+            index=models.Index(fields=['room_type', 'start_date'], name='price_room_type_start_idx'),
+        ),
+        migrations.RunPython(deactivate_duplicate_contracts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='employmentcontract',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('employee',), name='unique_active_contract_per_employee'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+# Активные бронирования одной комнаты не должны пересекаться по датам [заезд, выезд)
+ACTIVE_STATUSES = "('BOOKED', 'CONFIRMED', 'CHECKED_IN')"
+
+SQLITE_OVERLAP_CHECK = """
+    NEW.status IN {statuses} AND EXISTS (
+        SELECT 1 FROM hotel_app_reservation AS other
+        WHERE other.room_id = NEW.room_id
+          AND other.id IS NOT NEW.id
+          AND other.status IN {statuses}
+          AND other.arrival_date < NEW.departure_date
+          AND other.departure_date > NEW.arrival_date
+    )
+""".format(statuses=ACTIVE_STATUSES)
+
+
+def create_overlap_guard(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        schema_editor.execute(
+            'ALTER TABLE hotel_app_reservation ADD CONSTRAINT reservation_room_no_overlap '
+            'EXCLUDE USING gist (room_id WITH =, daterange(arrival_date, departure_date) WITH &&) '
+            f'WHERE (status IN {ACTIVE_STATUSES})'
+        )
+    elif vendor == 'sqlite':
+        # В SQLite нет ограничений исключения - проверка выполняется триггерами (ABORT даёт IntegrityError)
+        schema_editor.execute(
+            'CREATE TRIGGER reservation_room_no_overlap_insert BEFORE INSERT ON hotel_app_reservation '
+            f'WHEN {SQLITE_OVERLAP_CHECK} '
+            "BEGIN SELECT RAISE(ABORT, 'reservation_room_no_overlap'); END"
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER reservation_room_no_overlap_update '
+            'BEFORE UPDATE OF room_id, arrival_date, departure_date, status ON hotel_app_reservation '
+            f'WHEN {SQLITE_OVERLAP_CHECK} '
+            "BEGIN SELECT RAISE(ABORT, 'reservation_room_no_overlap'); END"
+        )
+
+
+def drop_overlap_guard(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE hotel_app_reservation DROP CONSTRAINT IF EXISTS reservation_room_no_overlap')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TRIGGER IF EXISTS reservation_room_no_overlap_insert')
+        schema_editor.execute('DROP TRIGGER IF EXISTS reservation_room_no_overlap_update')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0006_export_updated_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+        migrations.RunPython(create_overlap_guard, drop_overlap_guard),
+    ]
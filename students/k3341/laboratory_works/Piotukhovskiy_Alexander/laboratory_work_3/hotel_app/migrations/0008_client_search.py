@@ -0,0 +1,72 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = 'last_name, first_name, middle_name, passport_number, city_from'
+# Веса колонок для bm25 в порядке SEARCH_COLUMNS
+SEARCH_RANK = 'bm25(10.0, 5.0, 2.0, 10.0, 1.0)'
+
+POSTGRES_DOCUMENT = (
+    "(last_name || ' ' || first_name || ' ' || coalesce(middle_name, '') || ' ' || passport_number "
+    "|| ' ' || city_from)"
+)
+
+
+def _values(prefix):
+    return ', '.join(f'{prefix}.{column.strip()}' for column in SEARCH_COLUMNS.split(','))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX client_search_trgm_idx ON hotel_app_client USING gin ({POSTGRES_DOCUMENT} gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        # Внешняя таблица FTS5 поверх hotel_app_client: хранит только индекс, строки берутся из таблицы клиентов.
+        # Префиксные индексы до 8 символов покрывают ввод фамилии целиком: без них префикс длиннее индекса
+        # раскрывается в объединение всех подходящих слов словаря и читается целиком.
+        # Триггеры срабатывают и для bulk_create/upsert, которые обходят сигналы Django
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE hotel_app_client_search USING fts5({SEARCH_COLUMNS}, "
+            f"content='hotel_app_client', content_rowid='id', tokenize='unicode61', prefix='1 2 3 4 5 6 7 8')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO hotel_app_client_search(hotel_app_client_search, rank) VALUES ('rank', '{SEARCH_RANK}')"
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER hotel_app_client_search_insert AFTER INSERT ON hotel_app_client BEGIN '
+            f'INSERT INTO hotel_app_client_search(rowid, {SEARCH_COLUMNS}) VALUES (new.id, {_values("new")}); END'
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER hotel_app_client_search_delete AFTER DELETE ON hotel_app_client BEGIN '
+            f'INSERT INTO hotel_app_client_search(hotel_app_client_search, rowid, {SEARCH_COLUMNS}) '
+            f"VALUES ('delete', old.id, {_values('old')}); END"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER hotel_app_client_search_update AFTER UPDATE OF {SEARCH_COLUMNS} ON hotel_app_client BEGIN '
+            f'INSERT INTO hotel_app_client_search(hotel_app_client_search, rowid, {SEARCH_COLUMNS}) '
+            f"VALUES ('delete', old.id, {_values('old')}); "
+            f'INSERT INTO hotel_app_client_search(rowid, {SEARCH_COLUMNS}) VALUES (new.id, {_values("new")}); END'
+        )
+        schema_editor.execute("INSERT INTO hotel_app_client_search(hotel_app_client_search) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS client_search_trgm_idx')
+    elif vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS hotel_app_client_search_{trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS hotel_app_client_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0007_optimistic_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 21:11
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_schedules(apps, schema_editor):
+    # Перед созданием уникального ограничения оставляем по одной (самой ранней) строке на сотрудника, комнату и дату
+    CleaningSchedule = apps.get_model('hotel_app', 'CleaningSchedule')
+    keep_ids = CleaningSchedule.objects.values('cleaner_id', 'room_id', 'cleaning_date').annotate(keep_id=Min('id'))
+    CleaningSchedule.objects.exclude(id__in=keep_ids.values('keep_id')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0008_client_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_schedules, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cleaningschedule',
+            constraint=models.UniqueConstraint(fields=('cleaner', 'room', 'cleaning_date'), name='unique_cleaning_schedule'),
+        ),
+    ]
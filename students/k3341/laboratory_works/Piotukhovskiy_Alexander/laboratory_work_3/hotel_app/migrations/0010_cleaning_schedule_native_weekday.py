@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-18 22:14
+
+import hotel_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Изменить выражение GeneratedField нельзя - столбец и индекс по нему создаются заново
+
+    dependencies = [
+        ('hotel_app', '0009_cleaning_schedule_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cleaningschedule',
+            name='cleaning_room_weekday_idx',
+        ),
+        migrations.RemoveField(
+            model_name='cleaningschedule',
+            name='weekday',
+        ),
+        migrations.AddField(
+            model_name='cleaningschedule',
+            name='weekday',
+            field=models.GeneratedField(db_persist=True, expression=hotel_app.models.WeekDay('cleaning_date'), output_field=models.PositiveSmallIntegerField(), verbose_name='День недели уборки (1 - воскресенье, 7 - суббота)'),
+        ),
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['room', 'weekday'], name='cleaning_room_weekday_idx'),
+        ),
+    ]
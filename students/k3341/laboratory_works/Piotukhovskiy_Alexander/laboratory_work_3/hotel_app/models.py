@@ -3,7 +3,41 @@ from django.utils import timezone
 
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import DatabaseError, models
+from django.db.models import F, Func
+from django.db.models.functions import ExtractWeekDay
+
+
+class StaleVersionError(DatabaseError):
+
+    def __init__(self, message, instance=None):
+        super().__init__(message)
+        self.instance = instance
+
+
+class VersionedModel(models.Model):
+    # Оптимистическая блокировка: UPDATE выполняется с условием WHERE version = <загруженная версия>
+    # и увеличивает версию в том же запросе; если строку успели изменить, запись отклоняется
+    version = models.PositiveIntegerField(default=1, verbose_name='Версия')
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        version_field = self._meta.get_field('version')
+        expected = self.version
+        values = [(field, model, value) for field, model, value in values if field is not version_field]
+        values.append((version_field, None, F('version') + 1))
+
+        updated = super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update)
+        if updated:
+            self.version = expected + 1
+        elif base_qs.filter(pk=pk_val).exists():
+            raise StaleVersionError(
+                f'{self._meta.object_name} {pk_val}: версия {expected} устарела, запись изменена другим запросом.',
+                self,
+            )
+        return updated
 
 
 class RoomType(models.Model):
@@ -29,8 +63,13 @@ class RoomPriceHistory(models.Model):
     end_date = models.DateField(null=True, blank=True, verbose_name='Конец действия цены')
     price = models.PositiveIntegerField(verbose_name='Стоимость за сутки')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['room_type', 'start_date'], name='price_room_type_start_idx'),
+        ]
+
 
-class Room(models.Model):
+class Room(VersionedModel):
     STATUS_CHOICES = [
         ('AVAILABLE', 'Свободен'),
         ('OCCUPIED', 'Занят'),
@@ -44,6 +83,11 @@ class Room(models.Model):
     status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='AVAILABLE', verbose_name='Статус комнаты')
     phone = models.CharField(max_length=11, verbose_name='Телефон в номере')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='room_status_idx'),
+        ]
+
 
 class Client(models.Model):
     passport_number = models.CharField(max_length=10, unique=True, verbose_name='Номер паспорта')
@@ -51,9 +95,16 @@ class Client(models.Model):
     last_name = models.CharField(max_length=50, verbose_name="Фамилия")
     middle_name = models.CharField(max_length=50, blank=True, null=True, verbose_name="Отчество")
     city_from = models.CharField(max_length=50, verbose_name='Город')
+    last_updated_date = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'id'], name='client_last_name_id_idx'),
+            models.Index(fields=['last_updated_date'], name='client_updated_idx'),
+        ]
 
 
-class Reservation(models.Model):
+class Reservation(VersionedModel):
     STATUS_CHOICES = [
         ('BOOKED', 'Забронирован'),
         ('CONFIRMED', 'Подтвержден'),
@@ -73,7 +124,7 @@ class Reservation(models.Model):
     admin = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Администратор', related_name="reservations_created")
     booking_date = models.DateField(default=timezone.now, verbose_name='Дата бронирования')
     updated_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Обновивший администратор", related_name="reservations_updated")
-    last_updated_date = models.DateTimeField(default=timezone.now, verbose_name="Дата последнего обновления")
+    last_updated_date = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
 
     arrival_date = models.DateField(verbose_name='Дата заселения')
     departure_date = models.DateField(verbose_name='Дата выселения')
@@ -82,6 +133,15 @@ class Reservation(models.Model):
     price_at_booking = models.PositiveIntegerField(verbose_name='Стоимость при бронировании')
     final_price = models.PositiveIntegerField(verbose_name='Стоимость при бронировании')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['arrival_date', 'id'], name='reservation_arrival_id_idx'),
+            models.Index(fields=['room', 'status', 'arrival_date'], name='reservation_room_status_idx'),
+            models.Index(fields=['arrival_date', 'departure_date'], name='reservation_stay_idx'),
+            models.Index(fields=['client', 'departure_date'], name='reservation_client_stay_idx'),
+            models.Index(fields=['last_updated_date'], name='reservation_updated_idx'),
+        ]
+
 
 class EmployeePosition(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name='Название должности')
@@ -103,6 +163,19 @@ class EmploymentContract(models.Model):
     termination_date = models.DateField(null=True, blank=True, verbose_name='Дата расторжения')
     is_active = models.BooleanField(default=True, verbose_name='Активный контракт')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'id'], name='contract_start_date_id_idx'),
+            models.Index(fields=['employee', 'is_active'], name='contract_employee_active_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['employee'],
+                condition=models.Q(is_active=True),
+                name='unique_active_contract_per_employee',
+            ),
+        ]
+
 
     def terminate_contract(self, termination_date=None):
         if termination_date is None:
@@ -120,6 +193,25 @@ class Employee(models.Model):
     last_name = models.CharField(max_length=50, verbose_name="Фамилия")
     middle_name = models.CharField(max_length=50, blank=True, null=True, verbose_name="Отчество")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'id'], name='employee_last_name_id_idx'),
+        ]
+
+
+class WeekDay(Func):
+    # День недели даты в нумерации ExtractWeekDay (1 - воскресенье, 7 - суббота). На SQLite ExtractWeekDay
+    # вызывает функцию, которую регистрирует Django, и столбец с таким выражением нельзя записать
+    # вне Django (sqlite3, другие приложения) - там используется встроенная strftime
+    output_field = models.PositiveSmallIntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(ExtractWeekDay(*self.get_source_expressions()))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="(CAST(strftime('%%%%w', %(expressions)s) AS INTEGER) + 1)",
+                              **extra_context)
+
 
 class CleaningSchedule(models.Model):
     STATUS_CHOICES = [
@@ -132,3 +224,33 @@ class CleaningSchedule(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
     cleaning_date = models.DateField(verbose_name='Дата уборки')
     status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='PENDING', verbose_name='Статус уборки')
+    weekday = models.GeneratedField(
+        expression=WeekDay('cleaning_date'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+        verbose_name='День недели уборки (1 - воскресенье, 7 - суббота)',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cleaning_date', 'id'], name='cleaning_date_id_idx'),
+            models.Index(fields=['room', 'cleaning_date'], name='cleaning_room_date_idx'),
+            models.Index(fields=['cleaner', 'cleaning_date'], name='cleaning_cleaner_date_idx'),
+            models.Index(fields=['room', 'weekday'], name='cleaning_room_weekday_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['cleaner', 'room', 'cleaning_date'], name='unique_cleaning_schedule'),
+        ]
+
+
+class RoomDailyRollup(models.Model):
+    date = models.DateField(verbose_name='Дата')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
+    reservations = models.IntegerField(default=0, verbose_name='Количество заездов')
+    nights = models.IntegerField(default=0, verbose_name='Количество занятых ночей')
+    income = models.BigIntegerField(default=0, verbose_name='Доход')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'room'], name='unique_room_daily_rollup'),
+        ]
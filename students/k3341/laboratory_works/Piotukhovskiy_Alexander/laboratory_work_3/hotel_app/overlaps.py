@@ -0,0 +1,100 @@
+import heapq
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .models import Reservation
+
+# Сколько непересекающихся окон проживаний проверяется одним запросом кандидатов (OR диапазонных условий)
+WINDOWS_PER_QUERY = 100
+
+TARGET, CANDIDATE = 0, 1
+
+
+def merge_intervals(intervals):
+    # Интервалы [arrival, departure) должны быть отсортированы по дате заезда
+    merged = []
+    for arrival_date, departure_date in intervals:
+        if merged and arrival_date <= merged[-1][1]:
+            if departure_date > merged[-1][1]:
+                merged[-1][1] = departure_date
+        else:
+            merged.append([arrival_date, departure_date])
+    return merged
+
+
+def _sweep(targets, candidates, overlaps):
+    # Заметание по датам начала: targets и candidates - (начало, окончание, client_id), отсортированные по началу.
+    # В кучах - интервалы, ещё не закончившиеся к текущей дате; новый интервал пересекается со всеми
+    # активными интервалами другой стороны
+    active = {TARGET: [], CANDIDATE: []}
+    events = heapq.merge(
+        ((start, TARGET, end, client_id) for start, end, client_id in targets),
+        ((start, CANDIDATE, end, client_id) for start, end, client_id in candidates),
+    )
+    for start, kind, end, client_id in events:
+        for heap in active.values():
+            while heap and heap[0][0] <= start:
+                heapq.heappop(heap)
+
+        if kind == TARGET:
+            overlaps[client_id].update(other_id for _, other_id in active[CANDIDATE] if other_id != client_id)
+        else:
+            for _, target_id in active[TARGET]:
+                if target_id != client_id:
+                    overlaps[target_id].add(client_id)
+        heapq.heappush(active[kind], (end, client_id))
+
+
+def find_stay_overlaps(client_ids, start_date=None, end_date=None):
+    # {client_id: множество id клиентов, проживавших в те же дни}: запрос проживаний клиентов
+    # и запросы кандидатов только по окнам, где эти клиенты проживали
+    client_ids = list(client_ids)
+    overlaps = {client_id: set() for client_id in client_ids}
+
+    date_filter = Q()
+    if start_date:
+        date_filter &= Q(arrival_date__gte=start_date)
+    if end_date:
+        date_filter &= Q(departure_date__lte=end_date)
+
+    client_intervals = {client_id: [] for client_id in client_ids}
+    target_reservations = (
+        Reservation.objects.filter(date_filter, client_id__in=client_ids)
+        .order_by('arrival_date')
+        .values_list('client_id', 'arrival_date', 'departure_date')
+    )
+    for client_id, arrival_date, departure_date in target_reservations:
+        client_intervals[client_id].append((arrival_date, departure_date))
+
+    targets = sorted(
+        (arrival_date, departure_date, client_id)
+        for client_id, intervals in client_intervals.items()
+        for arrival_date, departure_date in merge_intervals(intervals)
+    )
+    if not targets:
+        return overlaps
+
+    # Окна - объединение проживаний всех клиентов; каждое проживание целиком лежит в одном окне,
+    # поэтому кандидатов и проживания можно сопоставлять по группам окон независимо
+    windows = merge_intervals([(arrival_date, departure_date) for arrival_date, departure_date, _ in targets])
+    position = 0
+    for first in range(0, len(windows), WINDOWS_PER_QUERY):
+        group = windows[first:first + WINDOWS_PER_QUERY]
+        group_end = group[-1][1]
+        group_targets = []
+        while position < len(targets) and targets[position][0] < group_end:
+            group_targets.append(targets[position])
+            position += 1
+
+        candidates = (
+            Reservation.objects.filter(reduce(or_, (
+                Q(arrival_date__lt=window_end, departure_date__gt=window_start) for window_start, window_end in group
+            )))
+            .order_by('arrival_date')
+            .values_list('arrival_date', 'departure_date', 'client_id')
+        )
+        _sweep(group_targets, candidates.iterator(chunk_size=2000), overlaps)
+
+    return overlaps
@@ -0,0 +1,160 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Window
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Постраничная выдача по ключу (поле сортировки, id): страница выбирается условием WHERE по позиции
+    # последней записи предыдущей страницы, поэтому время выборки не зависит от глубины страницы.
+    # Поле сортировки задаётся атрибутом представления keyset_ordering, например ('-arrival_date', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 500
+    default_ordering = ('id',)
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(view)
+        cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = cursor is not None and cursor['reverse']
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+        if cursor is not None:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': cursor['value']}) |
+                Q(**{self.field: cursor['value'], f'id__{lookup}': cursor['id']})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, view):
+        field = getattr(view, 'keyset_ordering', self.default_ordering)[0]
+        return field.lstrip('-'), field.startswith('-')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        # Страница может состоять из моделей или из словарей queryset.values()
+        if isinstance(instance, dict):
+            value, pk = instance[self.field], instance['id']
+        else:
+            value, pk = getattr(instance, self.field), instance.id
+        position = {'v': value, 'id': pk, 'r': int(reverse)}
+        encoded = base64.urlsafe_b64encode(json.dumps(position, cls=DjangoJSONEncoder).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return {
+                'value': model._meta.get_field(self.field).to_python(position['v']),
+                'id': int(position['id']),
+                'reverse': bool(position.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы из полей next/previous предыдущего ответа.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Размер страницы (не более {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class WindowCountPagination(LimitOffsetPagination):
+    # Страница по limit/offset, общее число строк приходит в том же запросе из оконной функции
+    # COUNT(*) OVER (): отдельный SELECT COUNT(*) не нужен
+    default_limit = 100
+    max_limit = 1000
+    count_annotation = 'window_total_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+
+        rows = list(
+            queryset.annotate(**{self.count_annotation: Window(Count('*'))})[self.offset:self.offset + self.limit]
+        )
+        if rows:
+            self.count = getattr(rows[0], self.count_annotation)
+        elif self.offset:
+            # Смещение за пределами выборки - строк с оконным значением нет, считаем отдельно
+            self.count = queryset.count()
+        else:
+            self.count = 0
+        return rows
@@ -0,0 +1,195 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .models import RoomPriceHistory
+from .routers import PRIMARY
+from .versions import get_version, bump_version, shared_cache_configured
+
+CALENDAR_PAST_DAYS = 365
+CALENDAR_FUTURE_DAYS = 2 * 365
+# Ограничения запроса /hotel/pricing/quote
+MAX_QUOTE_ITEMS = 100
+
+
+class PriceCalendar:
+    # Посуточные цены типа номера на горизонте [origin, origin + len(prices)) и их префиксные суммы:
+    # стоимость проживания с arrival по departure - prefix[departure] - prefix[arrival]
+
+    def __init__(self, room_type_id, origin, days, version):
+        self.room_type_id = room_type_id
+        self.origin = origin
+        self.prices = np.zeros(days, dtype=np.int64)
+        self.prefix = np.zeros(days + 1, dtype=np.int64)
+        self.periods = {}
+        self.version = version
+
+    @property
+    def end(self):
+        return self.origin + timedelta(days=len(self.prices))
+
+    def load(self):
+        # Календарь помечается текущей версией и живёт до следующего изменения - отстающая реплика
+        # закрепила бы в нём старые цены, поэтому он строится по первичной БД
+        self.periods = _load_periods(self.room_type_id, self.origin, self.end)
+        self.repaint(self.origin, self.end)
+
+    def repaint(self, start_date, end_date):
+        # Пересчитывает цены на отрезке [start_date, end_date) и префиксные суммы после него
+        lo = max((start_date - self.origin).days, 0)
+        hi = min((end_date - self.origin).days, len(self.prices))
+        if lo >= hi:
+            return
+
+        self.prices[lo:hi] = 0
+        # При пересечении периодов действует период с более ранней датой начала, поэтому он рисуется последним
+        ordered = sorted(self.periods.items(), key=lambda item: (item[1][0], item[0]), reverse=True)
+        for _, (period_start, period_end, price) in ordered:
+            period_lo = max((period_start - self.origin).days, lo)
+            period_hi = hi if period_end is None else min((period_end - self.origin).days + 1, hi)
+            if period_lo < period_hi:
+                self.prices[period_lo:period_hi] = price
+
+        np.cumsum(self.prices[lo:], out=self.prefix[lo + 1:])
+        self.prefix[lo + 1:] += self.prefix[lo]
+
+    def apply(self, period_id, period):
+        # period = (start_date, end_date, price) или None при удалении
+        previous = self.periods.pop(period_id, None)
+        if period is not None:
+            self.periods[period_id] = period
+
+        changed = [item for item in (previous, period) if item is not None]
+        if changed:
+            start_date = min(item[0] for item in changed)
+            # Открытый период или период дальше горизонта (вплоть до 9999-12-31) перерисовывается до конца календаря
+            last_day = None if any(item[1] is None for item in changed) else max(item[1] for item in changed)
+            end_date = self.end if last_day is None or last_day >= self.end else last_day + timedelta(days=1)
+            self.repaint(start_date, end_date)
+
+    def quote(self, arrival_date, departure_date):
+        lo = (arrival_date - self.origin).days
+        hi = (departure_date - self.origin).days
+        return int(self.prefix[hi] - self.prefix[lo])
+
+
+_calendars = {}
+_lock = threading.Lock()
+
+
+def _load_periods(room_type_id, start_date, end_date):
+    # Периоды цен типа номера, действующие хотя бы день на отрезке [start_date, end_date)
+    periods = RoomPriceHistory.objects.using(PRIMARY).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=start_date),
+        room_type_id=room_type_id, start_date__lt=end_date,
+    ).values_list('id', 'start_date', 'end_date', 'price')
+    return {period_id: (start, end, price) for period_id, start, end, price in periods}
+
+
+def _version_name(room_type_id):
+    return f'pricing:room-type:{room_type_id}'
+
+
+def calendar_horizon(today=None):
+    # Календарь в памяти покрывает фиксированное окно относительно текущей даты и не расширяется под запросы
+    today = today or date.today()
+    return today - timedelta(days=CALENDAR_PAST_DAYS), today + timedelta(days=CALENDAR_FUTURE_DAYS)
+
+
+def _build_calendar(room_type_id, origin, end, version):
+    calendar = PriceCalendar(room_type_id, origin, (end - origin).days, version)
+    calendar.load()
+    return calendar
+
+
+def get_price_calendar(room_type_id):
+    origin, end = calendar_horizon()
+    version = get_version(_version_name(room_type_id))
+
+    with _lock:
+        calendar = _calendars.get(room_type_id)
+        if calendar is None or calendar.version != version or calendar.origin != origin:
+            calendar = _build_calendar(room_type_id, origin, end, version)
+            _calendars[room_type_id] = calendar
+        return calendar
+
+
+def _quote_from_db(stays):
+    # Без календаря в памяти: периоды каждого типа номера читаются одним запросом на все проживания,
+    # а разовый календарь строится только на даты конкретного проживания
+    spans = {}
+    for room_type_id, arrival_date, departure_date in stays:
+        lo, hi = spans.get(room_type_id, (arrival_date, departure_date))
+        spans[room_type_id] = (min(lo, arrival_date), max(hi, departure_date))
+    periods = {room_type_id: _load_periods(room_type_id, lo, hi) for room_type_id, (lo, hi) in spans.items()}
+
+    totals = []
+    for room_type_id, arrival_date, departure_date in stays:
+        calendar = PriceCalendar(room_type_id, arrival_date, (departure_date - arrival_date).days, None)
+        calendar.periods = periods[room_type_id]
+        calendar.repaint(arrival_date, departure_date)
+        totals.append(calendar.quote(arrival_date, departure_date))
+    return totals
+
+
+def quote_price(room_type_id, arrival_date, departure_date):
+    return quote_prices([(room_type_id, arrival_date, departure_date)])[0]
+
+
+def quote_prices(stays):
+    # stays - последовательность (room_type_id, arrival_date, departure_date)
+    stays = list(stays)
+    totals = [0] * len(stays)
+    cached, uncached = [], []
+    origin, end = calendar_horizon()
+    for position, (room_type_id, arrival_date, departure_date) in enumerate(stays):
+        if departure_date <= arrival_date:
+            continue
+        if shared_cache_configured() and origin <= arrival_date and departure_date <= end:
+            cached.append(position)
+        else:
+            # Без общего кэша версия календаря видна только своему процессу, и изменение цены в другом процессе
+            # осталось бы незамеченным; даты вне окна календаря тоже считаются по БД
+            uncached.append(position)
+
+    for position, total in zip(uncached, _quote_from_db([stays[position] for position in uncached])):
+        totals[position] = total
+
+    for position in cached:
+        room_type_id, arrival_date, departure_date = stays[position]
+        calendar = get_price_calendar(room_type_id)
+        with _lock:
+            totals[position] = calendar.quote(arrival_date, departure_date)
+    return totals
+
+
+def price_period_changed(period, deleted=False):
+    # Календарь перерисовывается после фиксации транзакции: откаченное изменение цены не должно попасть в расчёт
+    change = (period.id, period.room_type_id, period.start_date, period.end_date, period.price)
+    transaction.on_commit(lambda: _apply_period(*change, deleted=deleted))
+
+
+def _apply_period(period_id, room_type_id, start_date, end_date, price, deleted=False):
+    version = bump_version(_version_name(room_type_id))
+
+    with _lock:
+        calendar = _calendars.get(room_type_id)
+        if calendar is None:
+            return
+
+        if calendar.version != version - 1 or not isinstance(start_date, date):
+            # Календарь устарел из-за изменений в другом процессе (или даты ещё не приведены к date) -
+            # он будет перестроен при следующем запросе
+            del _calendars[room_type_id]
+            return
+
+        calendar.apply(period_id, None if deleted else (start_date, end_date, price))
+        calendar.version = version
+
+
+def reset_price_calendars():
+    with _lock:
+        _calendars.clear()
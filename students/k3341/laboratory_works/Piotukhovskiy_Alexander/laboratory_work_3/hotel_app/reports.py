@@ -0,0 +1,74 @@
+import calendar
+from datetime import datetime
+
+from django.db.models import Sum, Count, F, ExpressionWrapper, IntegerField
+from django.db.models.functions import Substr
+
+from .models import Room, RoomDailyRollup
+
+# Правила подсчёта по дневной сводке. До неё отчёт учитывал только бронирования, целиком лежащие в периоде,
+# а доход брал по статусу оплаты, в том числе у отменённых бронирований
+REPORT_COUNTING = (
+    "Клиенты считаются по дням заезда внутри периода, доход - по оплаченным ночам внутри периода: стоимость "
+    "проживания делится по ночам поровну, поэтому проживание на границе периода учитывается частично. "
+    "Отменённые бронирования в отчёт не попадают."
+)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def build_report(start_date, end_date):
+    # Число клиентов и доход по каждому номеру - одним агрегирующим запросом к дневной сводке
+    per_room = (
+        RoomDailyRollup.objects.filter(date__gte=_as_date(start_date), date__lte=_as_date(end_date))
+        .values('room__number')
+        .annotate(client_count=Sum('reservations'), total_income=Sum('income'))
+        .order_by('room__number')
+    )
+
+    clients_per_room = []
+    income_per_room = []
+    for row in per_room:
+        if row['client_count']:
+            clients_per_room.append({"room__number": row['room__number'], "client_count": row['client_count']})
+        if row['total_income']:
+            income_per_room.append({"room__number": row['room__number'], "total_income": row['total_income']})
+
+    # Количество номеров на каждом этаже
+    rooms_per_floor = (
+        Room.objects.annotate(
+            floor=ExpressionWrapper(
+                Substr(F('number'), 1, 1),
+                output_field=IntegerField()
+            )
+        )
+        .values('floor')
+        .annotate(room_count=Count('id'))
+        .order_by('floor')
+    )
+
+    return {
+        "clients_per_room": clients_per_room,
+        "rooms_per_floor": list(rooms_per_floor),
+        "income_per_room": income_per_room,
+        "total_income": sum(row['total_income'] for row in income_per_room),
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
+
+def quarter_date_range(quarter, year):
+    start_month = (quarter - 1) * 3 + 1
+    end_month = start_month + 2
+
+    start_date = datetime(year, start_month, 1)
+    last_day = calendar.monthrange(year, end_month)[1]
+    end_date = datetime(year, end_month, last_day)
+
+    return start_date, end_date
+
+
+def year_date_range(year):
+    return datetime(year, 1, 1), datetime(year, 12, 31)
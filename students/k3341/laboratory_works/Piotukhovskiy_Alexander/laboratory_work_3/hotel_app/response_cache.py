@@ -0,0 +1,93 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from .conditional import collection_stamp_names
+from .routers import require_fresh
+from .versions import get_stamps, shared_cache, shared_cache_configured
+
+RESPONSE_CACHE_KEY = 'hotel:response:{}:{}'
+COUNTER_CACHE_KEY = 'hotel:response-cache:{}:{}'
+CACHEABLE_STATUSES = (200, 404)
+
+_endpoints = []
+
+
+def normalize_query(query_params):
+    # Порядок параметров и пустые значения не меняют ответ - ключ от них не зависит
+    return '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params)
+        for value in sorted(query_params.getlist(key))
+        if value != ''
+    )
+
+
+def _count(endpoint, counter):
+    cache = shared_cache()
+    key = COUNTER_CACHE_KEY.format(endpoint, counter)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    keys = [COUNTER_CACHE_KEY.format(endpoint, counter) for endpoint in _endpoints for counter in ('hits', 'misses')]
+    counters = shared_cache().get_many(keys)
+    stats = {}
+    for endpoint in _endpoints:
+        hits = counters.get(COUNTER_CACHE_KEY.format(endpoint, 'hits'), 0)
+        misses = counters.get(COUNTER_CACHE_KEY.format(endpoint, 'misses'), 0)
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
+
+
+def cached_response(endpoint, *collections):
+    # Ключ включает метки коллекций, которые обновляются сигналами после фиксации изменений:
+    # старые записи больше не находятся и вытесняются по таймауту. Метки и ответы должны лежать в общем
+    # для всех процессов кэше (HOTEL_SHARED_CACHE) - без него изменения из других процессов не видны,
+    # поэтому кэш выключен
+    _endpoints.append(endpoint)
+    stamp_names = collection_stamp_names(collections)
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            if not shared_cache_configured():
+                return handler(view, request, *args, **kwargs)
+
+            cache = shared_cache()
+            renderer = getattr(request, 'accepted_renderer', None)
+            # Метки читаются до данных: изменение, зафиксированное во время построения ответа, сменит метку,
+            # и ответ со смесью старых и новых данных окажется под уже устаревшим ключом
+            stamps = get_stamps(stamp_names)
+            tokens = [token for token, _ in stamps]
+            fingerprint = '|'.join([normalize_query(request.query_params), getattr(renderer, 'format', '')] + tokens)
+            key = RESPONSE_CACHE_KEY.format(endpoint, hashlib.sha1(fingerprint.encode()).hexdigest())
+
+            cached = cache.get(key)
+            if cached is not None:
+                _count(endpoint, 'hits')
+                data, status = cached
+                return Response(data, status=status)
+
+            _count(endpoint, 'misses')
+            # Ответ кэшируется под текущими метками - реплика должна уже содержать эти изменения
+            require_fresh(max(modified for _, modified in stamps))
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code in CACHEABLE_STATUSES:
+                timeout = getattr(settings, 'HOTEL_RESPONSE_CACHE_TIMEOUT', 300)
+                cache.set(key, (response.data, response.status_code), timeout=timeout)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.dateparse import parse_date
+
+from .models import Reservation, RoomDailyRollup
+
+COUNTED_STATUSES = ['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
+PAID_STATUSES = ['PREPAID', 'PAID']
+ROLLUP_FIELDS = ('room_id', 'arrival_date', 'departure_date', 'status', 'payment_status', 'price_at_booking')
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return parse_date(value)
+    return value
+
+
+def reservation_state(reservation):
+    # Поля бронирования, от которых зависит его вклад в сводку, или None, если часть полей не загружена
+    if any(field not in reservation.__dict__ for field in ROLLUP_FIELDS):
+        return None
+    return tuple(reservation.__dict__[field] for field in ROLLUP_FIELDS)
+
+
+def add_contribution(totals, state, sign=1, start_date=None, end_date=None):
+    # Заезд учитывается в день заселения, ночи и доход (для оплаченных бронирований) - по дням проживания.
+    # Доход делится по ночам поровну, остаток от деления приходится на первые ночи
+    room_id, arrival_date, departure_date, status, payment_status, price = state
+    arrival_date, departure_date = _as_date(arrival_date), _as_date(departure_date)
+    if status not in COUNTED_STATUSES or departure_date <= arrival_date:
+        return totals
+
+    nights = (departure_date - arrival_date).days
+    paid = payment_status in PAID_STATUSES
+    base_income, remainder = divmod(price or 0, nights) if paid else (0, 0)
+
+    first = 0 if start_date is None else max((start_date - arrival_date).days, 0)
+    last = nights if end_date is None else min((end_date - arrival_date).days + 1, nights)
+    for night in range(first, last):
+        day = arrival_date + timedelta(days=night)
+        row = totals[(day, room_id)]
+        row[0] += sign if night == 0 else 0
+        row[1] += sign
+        row[2] += sign * (base_income + (1 if night < remainder else 0))
+
+    return totals
+
+
+def apply_totals(totals):
+    totals = {key: value for key, value in totals.items() if any(value)}
+    if not totals:
+        return
+
+    days = [day for day, _ in totals]
+    room_ids = {room_id for _, room_id in totals}
+
+    with transaction.atomic():
+        existing = {
+            (row.date, row.room_id): row
+            for row in RoomDailyRollup.objects.select_for_update().filter(
+                room_id__in=room_ids, date__gte=min(days), date__lte=max(days)
+            )
+        }
+
+        updated, created = [], []
+        for (day, room_id), (reservations, nights, income) in totals.items():
+            row = existing.get((day, room_id))
+            if row is None:
+                # Строки нет, а вклад только вычитается - строка уже удалена вместе с комнатой
+                if reservations <= 0 and nights <= 0 and income <= 0:
+                    continue
+                created.append(RoomDailyRollup(
+                    date=day, room_id=room_id, reservations=reservations, nights=nights, income=income
+                ))
+            else:
+                row.reservations = F('reservations') + reservations
+                row.nights = F('nights') + nights
+                row.income = F('income') + income
+                updated.append(row)
+
+        RoomDailyRollup.objects.bulk_update(updated, ['reservations', 'nights', 'income'])
+        RoomDailyRollup.objects.bulk_create(created)
+
+
+def reservation_loaded(reservation):
+    reservation.initial_rollup_state = reservation_state(reservation) if reservation.pk is not None else None
+
+
+def reservation_saving(reservation):
+    # Если бронирование загружено не полностью, прежний вклад берём из БД до сохранения
+    if reservation.pk is not None and getattr(reservation, 'initial_rollup_state', None) is None:
+        reservation.initial_rollup_state = Reservation.objects.filter(
+            pk=reservation.pk
+        ).values_list(*ROLLUP_FIELDS).first()
+
+
+def reservation_changed(reservation, deleted=False):
+    previous = getattr(reservation, 'initial_rollup_state', None)
+    current = None if deleted else reservation_state(reservation)
+
+    totals = defaultdict(lambda: [0, 0, 0])
+    if previous is not None:
+        add_contribution(totals, previous, sign=-1)
+    if current is not None:
+        add_contribution(totals, current)
+    apply_totals(totals)
+
+    reservation.initial_rollup_state = current
+
+
+def rebuild_rollup(start_date=None, end_date=None, batch_size=5000):
+    # Полностью пересчитывает сводку за период (или за всю историю) по таблице бронирований
+    rollup = RoomDailyRollup.objects.all()
+    reservations = Reservation.objects.filter(status__in=COUNTED_STATUSES)
+    if start_date:
+        rollup = rollup.filter(date__gte=start_date)
+        reservations = reservations.filter(departure_date__gt=start_date)
+    if end_date:
+        rollup = rollup.filter(date__lte=end_date)
+        reservations = reservations.filter(arrival_date__lte=end_date)
+
+    totals = defaultdict(lambda: [0, 0, 0])
+    for state in reservations.values_list(*ROLLUP_FIELDS).iterator(chunk_size=batch_size):
+        add_contribution(totals, state, start_date=start_date, end_date=end_date)
+
+    with transaction.atomic():
+        rollup.delete()
+        RoomDailyRollup.objects.bulk_create(
+            (
+                RoomDailyRollup(date=day, room_id=room_id, reservations=arrivals, nights=nights, income=income)
+                for (day, room_id), (arrivals, nights, income) in totals.items()
+                if arrivals or nights or income
+            ),
+            batch_size=batch_size,
+        )
+
+    return len(totals)
+
@@ -0,0 +1,120 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# Отставание реплики PostgreSQL в секундах: 0, если все полученные изменения применены.
+# Для других СУБД (локальная копия без репликации) отставание считается нулевым
+REPLICA_LAG_SQL = {
+    'postgresql': """
+        SELECT COALESCE(
+            CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+            END, 0)
+    """,
+}
+
+# Маршрутизация в рамках запроса (или потока вне запроса): после записи чтение идёт только из первичной БД,
+# а fresh_since - момент последнего изменения данных, которые реплика должна уже содержать
+_pinned = ContextVar('hotel_db_pinned', default=False)
+_fresh_since = ContextVar('hotel_db_fresh_since', default=0.0)
+
+_replica_lock = threading.Lock()
+_replica_state = {'checked_at': 0.0, 'replayed_until': None}
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    pinned_token = _pinned.set(pinned)
+    fresh_token = _fresh_since.set(0.0)
+    try:
+        yield
+    finally:
+        _pinned.reset(pinned_token)
+        _fresh_since.reset(fresh_token)
+
+
+def pin_primary():
+    _pinned.set(True)
+
+
+def unpin_primary():
+    _pinned.set(False)
+
+
+def require_fresh(since):
+    _fresh_since.set(max(_fresh_since.get(), since))
+
+
+def replica_lag():
+    connection = connections[REPLICA]
+    sql = REPLICA_LAG_SQL.get(connection.vendor)
+    if sql is None:
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return float(cursor.fetchone()[0])
+
+
+def reset_replica_state():
+    with _replica_lock:
+        _replica_state.update(checked_at=0.0, replayed_until=None)
+
+
+def replica_replayed_until(since=0.0):
+    # Момент, до которого реплика гарантированно применила изменения первичной БД, или None, если реплика
+    # недоступна или отстаёт больше HOTEL_REPLICA_MAX_LAG. Отставание проверяется не чаще раза в
+    # HOTEL_REPLICA_LAG_CHECK_INTERVAL секунд и сразу, если данные с момента since изменились после проверки
+    if REPLICA not in settings.DATABASES:
+        return None
+
+    now = time.time()
+    with _replica_lock:
+        checked_at, replayed_until = _replica_state['checked_at'], _replica_state['replayed_until']
+        expired = now - checked_at >= getattr(settings, 'HOTEL_REPLICA_LAG_CHECK_INTERVAL', 1)
+        stale = replayed_until is not None and replayed_until < since and checked_at < since
+        if not expired and not stale:
+            return replayed_until
+        # Пока идёт проверка, остальные потоки пользуются прежним результатом
+        _replica_state['checked_at'] = now
+
+    try:
+        lag = replica_lag()
+    except DatabaseError:
+        replayed_until = None
+    else:
+        replayed_until = now - lag if lag <= getattr(settings, 'HOTEL_REPLICA_MAX_LAG', 5) else None
+
+    with _replica_lock:
+        if _replica_state['checked_at'] == now:
+            _replica_state['replayed_until'] = replayed_until
+    return replayed_until
+
+
+class PrimaryReplicaRouter:
+    # Чтение - из реплики, запись и всё внутри transaction.atomic() - в первичную БД.
+    # Реплика не используется, если она отстаёт или ещё не содержит изменений, от которых зависит ответ
+
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        since = _fresh_since.get()
+        replayed_until = replica_replayed_until(since)
+        if replayed_until is None or replayed_until < since:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # После первой записи запрос читает только из первичной БД, чтобы видеть свои изменения
+        pin_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и первичная БД
+        return True
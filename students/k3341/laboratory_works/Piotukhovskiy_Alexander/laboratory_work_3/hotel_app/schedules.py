@@ -0,0 +1,47 @@
+from django.db import transaction
+
+from .conditional import collection_changed
+from .models import CleaningSchedule
+
+
+def sync_cleaning_schedule(cleaner_id, room_ids, cleaning_dates, period=None):
+    # Приводит расписание сотрудника по комнатам к запрошенному набору (комната, дата), не пересоздавая
+    # совпадающие строки: у них сохраняются id и статус уборки. Удаляются дубликаты и, если задан период
+    # (начало, конец), уборки внутри периода в даты, которых нет в запросе.
+    # Возвращает количество созданных, удалённых и оставшихся без изменений строк
+    requested = {(room_id, cleaning_date) for room_id in room_ids for cleaning_date in cleaning_dates}
+
+    with transaction.atomic():
+        existing = CleaningSchedule.objects.filter(cleaner_id=cleaner_id, room_id__in=room_ids)
+        if period is not None:
+            existing = existing.filter(cleaning_date__range=period)
+        else:
+            existing = existing.filter(cleaning_date__in=cleaning_dates)
+
+        kept = set()
+        stale_ids = []
+        for schedule_id, room_id, cleaning_date in existing.values_list('id', 'room_id', 'cleaning_date'):
+            key = (room_id, cleaning_date)
+            if key in requested and key not in kept:
+                kept.add(key)
+            else:
+                stale_ids.append(schedule_id)
+
+        if stale_ids:
+            CleaningSchedule.objects.filter(id__in=stale_ids).delete()
+
+        # Параллельный запрос мог успеть вставить те же строки - их пропускает уникальное ограничение
+        missing = sorted(requested - kept)
+        CleaningSchedule.objects.bulk_create(
+            [
+                CleaningSchedule(cleaner_id=cleaner_id, room_id=room_id, cleaning_date=cleaning_date)
+                for room_id, cleaning_date in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+    if missing or stale_ids:
+        # bulk_create не отправляет post_save - метку коллекции обновляем вручную
+        collection_changed('cleaning_schedule')
+
+    return {'created': len(missing), 'deleted': len(stale_ids), 'unchanged': len(kept)}
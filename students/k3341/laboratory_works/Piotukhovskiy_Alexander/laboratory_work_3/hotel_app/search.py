@@ -0,0 +1,76 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Client
+
+SEARCH_TABLE = 'hotel_app_client_search'
+SEARCH_FIELDS = ('last_name', 'first_name', 'middle_name', 'passport_number', 'city_from')
+
+# PostgreSQL: GIN-индекс pg_trgm по склеенным полям клиента, ранжирование по word_similarity.
+# Выражение должно совпадать с выражением индекса из миграции, иначе индекс не будет использован
+POSTGRES_DOCUMENT = (
+    "(last_name || ' ' || first_name || ' ' || coalesce(middle_name, '') || ' ' || passport_number "
+    "|| ' ' || city_from)"
+)
+POSTGRES_SQL = f"""
+    SELECT *, word_similarity(%s, {POSTGRES_DOCUMENT}) AS rank
+    FROM hotel_app_client
+    WHERE %s <%% {POSTGRES_DOCUMENT}
+    ORDER BY rank DESC, last_name, id
+    LIMIT %s
+"""
+
+# SQLite: таблица FTS5 с префиксными индексами, синхронизируется триггерами. Вес колонок для bm25
+# задан в миграции (фамилия и паспорт важнее города). bm25 считается только для первых
+# SQLITE_CANDIDATES совпадений в порядке rowid: для коротких префиксов («Ив», «К») совпадают десятки тысяч строк,
+# и полная сортировка по rank занимает сотни миллисекунд. Ответ API сообщает, что ранжирование неполное
+# (ranking_complete = false), если совпадений не меньше этого предела
+SQLITE_CANDIDATES = 200
+SQLITE_SQL = f"""
+    SELECT client.*, found.rank AS rank, found.matches AS matches
+    FROM (
+        SELECT rowid, rank, COUNT(*) OVER () AS matches FROM (
+            SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT {SQLITE_CANDIDATES}
+        )
+        ORDER BY rank LIMIT %s
+    ) AS found
+    JOIN hotel_app_client AS client ON client.id = found.rowid
+    ORDER BY found.rank, client.last_name, client.id
+"""
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query)
+
+
+def search_clients(query, limit=20):
+    # Клиенты, у которых каждое слово запроса - начало фамилии, имени, отчества, паспорта или города,
+    # от наиболее релевантных к наименее
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'postgresql':
+        text = ' '.join(terms)
+        return list(Client.objects.raw(POSTGRES_SQL, [text, text, limit]))
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return list(Client.objects.raw(SQLITE_SQL, [match, limit]))
+
+    # Для остальных СУБД поискового индекса нет - префиксный поиск через ORM (полный просмотр таблицы)
+    queryset = Client.objects.order_by('last_name', 'id')
+    for term in terms:
+        term_filter = Q()
+        for field in SEARCH_FIELDS:
+            term_filter |= Q(**{f'{field}__istartswith': term})
+        queryset = queryset.filter(term_filter)
+    return list(queryset[:limit])
+
+
+def ranking_complete(clients):
+    # False, если на SQLite по релевантности упорядочены только первые SQLITE_CANDIDATES совпадений
+    matches = getattr(clients[0], 'matches', None) if clients else None
+    return matches is None or matches < SQLITE_CANDIDATES
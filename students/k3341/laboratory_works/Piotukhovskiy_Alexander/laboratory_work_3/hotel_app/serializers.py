@@ -1,9 +1,26 @@
-from datetime import datetime
+import calendar
+from datetime import date, datetime, timedelta
 
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from django.contrib.auth.models import User
-from .models import Client, Room, Employee, EmploymentContract, EmployeePosition, Reservation, CleaningSchedule
+from django.db.models import F, FilteredRelation, Q, Window
+from django.db.models.functions import RowNumber
+from .models import Client, Room, RoomType, Employee, EmploymentContract, EmployeePosition, Reservation, CleaningSchedule
+from .availability import INDEX_PAST_DAYS, INDEX_FUTURE_DAYS, index_horizon
+from .housekeeping import DEFAULT_CAPACITY
+from .pricing import CALENDAR_PAST_DAYS, CALENDAR_FUTURE_DAYS, MAX_QUOTE_ITEMS, calendar_horizon
+from .search import search_terms
+
+DAYS_OF_WEEK = [
+    ('MONDAY', 'Понедельник'),
+    ('TUESDAY', 'Вторник'),
+    ('WEDNESDAY', 'Среда'),
+    ('THURSDAY', 'Четверг'),
+    ('FRIDAY', 'Пятница'),
+    ('SATURDAY', 'Суббота'),
+    ('SUNDAY', 'Воскресенье'),
+]
 
 
 class CustomUserSerializer(UserSerializer):
@@ -26,6 +43,14 @@ class ClientSerializer(serializers.ModelSerializer):
         fields = ['id', 'passport_number', 'first_name', 'last_name', 'middle_name', 'city_from']
 
 
+class RoomListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        rooms = list(data.all() if hasattr(data, 'all') else data)
+        if 'current_reservations' not in self.context:
+            self.context.update(RoomSerializer.preload_context(rooms))
+        return super().to_representation(rooms)
+
+
 class RoomSerializer(serializers.ModelSerializer):
     type_id = serializers.IntegerField(source='type.id', read_only=True)
     type_name = serializers.CharField(source='type.name', read_only=True)
@@ -34,22 +59,64 @@ class RoomSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Room
-        fields = ['id', 'number', 'type_id', 'type_name', 'phone', 'status', 'current_client', 'last_cleaner']
+        fields = ['id', 'number', 'type_id', 'type_name', 'phone', 'status', 'current_client', 'last_cleaner', 'version']
+        read_only_fields = ['version']
+        list_serializer_class = RoomListSerializer
+
+    @staticmethod
+    def preload_context(rooms):
+        # Последнее активное бронирование и последняя уборка по каждой комнате - по одному запросу на всё
+        room_ids = [room.id for room in rooms]
+
+        current_reservations = (
+            Reservation.objects.filter(room_id__in=room_ids, status__in=['CONFIRMED', 'CHECKED_IN'])
+            .select_related('client')
+            .annotate(row_number=Window(
+                RowNumber(),
+                partition_by=F('room_id'),
+                order_by=[F('arrival_date').desc(), F('id').desc()]
+            ))
+            .filter(row_number=1)
+        )
+
+        last_cleanings = (
+            CleaningSchedule.objects.filter(room_id__in=room_ids)
+            .select_related('cleaner__employee')
+            .annotate(row_number=Window(
+                RowNumber(),
+                partition_by=F('room_id'),
+                order_by=[F('cleaning_date').desc(), F('id').desc()]
+            ))
+            .filter(row_number=1)
+        )
+
+        return {
+            'current_reservations': {reservation.room_id: reservation for reservation in current_reservations},
+            'last_cleanings': {cleaning.room_id: cleaning for cleaning in last_cleanings},
+        }
 
     def get_current_client(self, obj):
         if obj.status == 'AVAILABLE':
             return None
 
-        reservation = Reservation.objects.filter(
-            room=obj,
-            status__in=['CONFIRMED', 'CHECKED_IN']
-        ).order_by('-arrival_date').first()
+        if 'current_reservations' in self.context:
+            reservation = self.context['current_reservations'].get(obj.id)
+        else:
+            reservation = Reservation.objects.filter(
+                room=obj,
+                status__in=['CONFIRMED', 'CHECKED_IN']
+            ).select_related('client').order_by('-arrival_date', '-id').first()
 
         if reservation:
             return ClientSerializer(reservation.client).data
 
     def get_last_cleaner(self, obj):
-        last_cleaning = CleaningSchedule.objects.order_by('-cleaning_date').first()
+        if 'last_cleanings' in self.context:
+            last_cleaning = self.context['last_cleanings'].get(obj.id)
+        else:
+            last_cleaning = CleaningSchedule.objects.filter(
+                room=obj
+            ).select_related('cleaner__employee').order_by('-cleaning_date', '-id').first()
 
         if last_cleaning:
             cleaner = last_cleaning.cleaner.employee
@@ -79,6 +146,22 @@ class ClientStayOverlapSerializer(serializers.Serializer):
         return data
 
 
+class ClientStayOverlapBatchSerializer(ClientStayOverlapSerializer):
+    client_id = None
+    client_ids = serializers.CharField(required=True)
+
+    def validate_client_ids(self, value):
+        try:
+            client_ids = [int(client_id) for client_id in value.split(',') if client_id.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Список ID клиентов должен состоять из целых чисел через запятую.")
+
+        if not client_ids:
+            raise serializers.ValidationError("Необходимо указать хотя бы один ID клиента.")
+
+        return list(dict.fromkeys(client_ids))
+
+
 class CleaningEmployeeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Employee
@@ -87,15 +170,7 @@ class CleaningEmployeeSerializer(serializers.ModelSerializer):
 
 class ClientRoomCleaningSerializer(serializers.Serializer):
     client_id = serializers.IntegerField(required=True)
-    day_of_week = serializers.ChoiceField(choices=[
-        ('MONDAY', 'Понедельник'),
-        ('TUESDAY', 'Вторник'),
-        ('WEDNESDAY', 'Среда'),
-        ('THURSDAY', 'Четверг'),
-        ('FRIDAY', 'Пятница'),
-        ('SATURDAY', 'Суббота'),
-        ('SUNDAY', 'Воскресенье'),
-    ], required=True)
+    day_of_week = serializers.ChoiceField(choices=DAYS_OF_WEEK, required=True)
 
     def to_internal_value(self, data):
         data = data.copy()
@@ -215,13 +290,28 @@ class FireEmployeeSerializer(serializers.Serializer):
         return data
 
 
+class CleaningTemplateSerializer(serializers.Serializer):
+    month = serializers.DateField(input_formats=['%Y-%m'], required=True)
+    days_of_week = serializers.ListField(
+        child=serializers.ChoiceField(choices=DAYS_OF_WEEK),
+        required=True,
+        allow_empty=False
+    )
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('days_of_week'), list):
+            data = {**data, 'days_of_week': [str(day).upper() for day in data['days_of_week']]}
+        return super().to_internal_value(data)
+
+
 class UpdateCleaningScheduleSerializer(serializers.Serializer):
     cleaner_id = serializers.IntegerField(required=True)
     cleaning_dates = serializers.ListField(
         child=serializers.DateField(),
-        required=True,
+        required=False,
         allow_empty=False
     )
+    template = CleaningTemplateSerializer(required=False)
     room_ids = serializers.ListField(
         child=serializers.IntegerField(),
         required=True,
@@ -229,21 +319,62 @@ class UpdateCleaningScheduleSerializer(serializers.Serializer):
     )
 
     def validate_cleaner_id(self, value):
-        if not EmploymentContract.objects.filter(employee_id=value, is_active=True).exists():
+        # В запросе передаётся id сотрудника, а в расписании хранится его активный контракт
+        contract_id = EmploymentContract.objects.filter(
+            employee_id=value, is_active=True
+        ).values_list('id', flat=True).first()
+        if contract_id is None:
             raise serializers.ValidationError("Указанный служащий не найден или не имеет активного контракта.")
-        return value
+        return contract_id
 
     def validate_room_ids(self, value):
-        existing_numbers = set(Room.objects.filter(number__in=value).values_list('number', flat=True))
-        missing_numbers = [room_number for room_number in value if room_number not in existing_numbers]
+        # В запросе передаются номера комнат, дальше используются их id
+        room_ids = dict(Room.objects.filter(number__in=value).values_list('number', 'id'))
+        missing_numbers = [room_number for room_number in value if room_number not in room_ids]
 
         if missing_numbers:
             raise serializers.ValidationError(
                 {"missing_rooms": f"Следующие номера комнат не найдены: {', '.join(map(str, missing_numbers))}."}
             )
 
+        return list(dict.fromkeys(room_ids[room_number] for room_number in value))
+
+    def validate(self, data):
+        if ('cleaning_dates' in data) == ('template' in data):
+            raise serializers.ValidationError(
+                {"cleaning_dates": "Укажите либо список дат cleaning_dates, либо шаблон месяца template."}
+            )
+
+        if 'template' in data:
+            # Шаблон задаёт всё расписание сотрудника по этим комнатам на месяц: даты генерируются здесь,
+            # а период нужен, чтобы убрать из месяца уборки в дни, которых нет в шаблоне
+            month = data['template']['month'].replace(day=1)
+            days = calendar.monthrange(month.year, month.month)[1]
+            # Порядок DAYS_OF_WEEK совпадает с нумерацией date.weekday(): 0 - понедельник
+            weekdays = {day for day, (name, _) in enumerate(DAYS_OF_WEEK) if name in data['template']['days_of_week']}
+            dates = (month + timedelta(days=offset) for offset in range(days))
+            data['cleaning_dates'] = [cleaning_date for cleaning_date in dates if cleaning_date.weekday() in weekdays]
+            data['period'] = (month, month + timedelta(days=days - 1))
+        else:
+            data['cleaning_dates'] = list(dict.fromkeys(data['cleaning_dates']))
+            data['period'] = None
+        return data
+
+
+class AutoAssignCleaningSerializer(serializers.Serializer):
+    cleaning_date = serializers.DateField(required=False)
+    capacity = serializers.IntegerField(min_value=1, max_value=200, default=DEFAULT_CAPACITY)
+    position_id = serializers.IntegerField(required=False)
+
+    def validate_position_id(self, value):
+        if not EmployeePosition.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Должность с указанным id не найдена.")
         return value
 
+    def validate(self, data):
+        data.setdefault('cleaning_date', date.today())
+        return data
+
 
 class CreateReservationSerializer(serializers.Serializer):
     passport_number = serializers.CharField(max_length=10, required=True)
@@ -277,6 +408,46 @@ class CreateReservationSerializer(serializers.Serializer):
         return data
 
 
+class BulkReservationItemSerializer(serializers.Serializer):
+    passport_number = serializers.CharField(max_length=10, required=True)
+    first_name = serializers.CharField(max_length=50, required=True)
+    last_name = serializers.CharField(max_length=50, required=True)
+    middle_name = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+    city_from = serializers.CharField(max_length=50, required=True)
+    room_number = serializers.IntegerField(required=True)
+    arrival_date = serializers.DateField(required=True)
+    departure_date = serializers.DateField(required=True)
+    status = serializers.ChoiceField(choices=Reservation.STATUS_CHOICES, required=False)
+    payment_status = serializers.ChoiceField(choices=Reservation.PAYMENT_STATUS_CHOICES, required=False)
+
+    def validate(self, data):
+        if data['departure_date'] <= data['arrival_date']:
+            raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
+        return data
+
+
+class BulkReservationSerializer(serializers.Serializer):
+    items = BulkReservationItemSerializer(many=True, allow_empty=False, max_length=5000)
+
+    def validate_items(self, value):
+        # Все комнаты пакета читаются одним запросом; ошибки возвращаются списком по элементам
+        room_numbers = {item['room_number'] for item in value}
+        rooms = {room.number: room for room in Room.objects.filter(number__in=room_numbers)}
+
+        errors = []
+        for item in value:
+            room = rooms.get(item['room_number'])
+            if room is None:
+                errors.append({"room_number": f"Комната с номером {item['room_number']} не найдена."})
+            else:
+                item['room'] = room
+                errors.append({})
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return value
+
+
 class UpdateReservationSerializer(serializers.Serializer):
     arrival_date = serializers.DateField(required=False)
     departure_date = serializers.DateField(required=False)
@@ -309,6 +480,80 @@ class UpdateReservationSerializer(serializers.Serializer):
         return data
 
 
+class AvailableRoomsSerializer(serializers.Serializer):
+    arrival_date = serializers.DateField(required=True)
+    departure_date = serializers.DateField(required=True)
+    capacity = serializers.IntegerField(min_value=1, required=False)
+    amenities = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_amenities(self, value):
+        amenities = [f'has_{amenity.strip().lower()}' for amenity in value.split(',') if amenity.strip()]
+        available = [field.name for field in RoomType._meta.get_fields() if field.name.startswith('has_')]
+        invalid = [amenity for amenity in amenities if amenity not in available]
+
+        if invalid:
+            raise serializers.ValidationError(
+                f"Недопустимые удобства: {[amenity[4:] for amenity in invalid]}. "
+                f"Доступные удобства: {[amenity[4:] for amenity in available]}."
+            )
+
+        return amenities
+
+    def validate(self, data):
+        if data['departure_date'] <= data['arrival_date']:
+            raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
+
+        earliest, latest = index_horizon()
+        if data['arrival_date'] < earliest:
+            raise serializers.ValidationError(
+                {"arrival_date": f"Дата заселения не может быть раньше чем за {INDEX_PAST_DAYS} дней до текущей."}
+            )
+        if data['departure_date'] > latest:
+            raise serializers.ValidationError(
+                {"departure_date": f"Дата выезда не может быть позже чем через {INDEX_FUTURE_DAYS} дней от текущей."}
+            )
+        return data
+
+
+class PriceQuoteItemSerializer(serializers.Serializer):
+    room_number = serializers.IntegerField(required=True)
+    arrival_date = serializers.DateField(required=True)
+    departure_date = serializers.DateField(required=True)
+
+    def validate(self, data):
+        if data['departure_date'] <= data['arrival_date']:
+            raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
+
+        earliest, latest = calendar_horizon()
+        if data['arrival_date'] < earliest:
+            raise serializers.ValidationError(
+                {"arrival_date": f"Дата заселения не может быть раньше чем за {CALENDAR_PAST_DAYS} дней до текущей."}
+            )
+        if data['departure_date'] > latest:
+            raise serializers.ValidationError(
+                {"departure_date": f"Дата выезда не может быть позже чем через {CALENDAR_FUTURE_DAYS} дней от текущей."}
+            )
+        return data
+
+
+class PriceQuoteSerializer(serializers.Serializer):
+    items = PriceQuoteItemSerializer(many=True, allow_empty=False, max_length=MAX_QUOTE_ITEMS)
+
+    def validate_items(self, value):
+        room_numbers = {item['room_number'] for item in value}
+        rooms = {room.number: room for room in Room.objects.filter(number__in=room_numbers)}
+        missing_numbers = sorted(room_numbers - rooms.keys())
+
+        if missing_numbers:
+            raise serializers.ValidationError(
+                {"missing_rooms": f"Следующие номера комнат не найдены: {', '.join(map(str, missing_numbers))}."}
+            )
+
+        for item in value:
+            item['room'] = rooms[item['room_number']]
+        return value
+
+
 class QuarterlyReportSerializer(serializers.Serializer):
     quarter = serializers.IntegerField(min_value=1, max_value=4, required=True)
     year = serializers.IntegerField(required=True)
@@ -329,6 +574,101 @@ class QuarterlyReportSerializer(serializers.Serializer):
         return data
 
 
+class RangeReportSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=True)
+    end_date = serializers.DateField(required=True)
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+        return data
+
+
+class OccupancyAnalyticsSerializer(serializers.Serializer):
+    MAX_DAYS = 10 * 366
+
+    start_date = serializers.DateField(required=True)
+    end_date = serializers.DateField(required=True)
+    granularity = serializers.ChoiceField(choices=[
+        ('day', 'День'),
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+    ], default='month')
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+        if (data['end_date'] - data['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError("Период не может быть длиннее 10 лет.")
+        return data
+
+
+class ClientSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100, required=True)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate_q(self, value):
+        if not search_terms(value):
+            raise serializers.ValidationError("Запрос должен содержать хотя бы одну букву или цифру.")
+        return value
+
+
+class ExportSerializer(serializers.Serializer):
+    updated_since = serializers.DateTimeField(required=False)
+
+
+class YearlyReportSerializer(serializers.Serializer):
+    year = serializers.IntegerField(required=True)
+
+    def validate(self, data):
+        if data['year'] > datetime.now().year:
+            raise serializers.ValidationError("Год не может быть в будущем.")
+        return data
+
+
+class CreateReportJobSerializer(serializers.Serializer):
+    REPORT_TYPE_CHOICES = [
+        ('QUARTERLY', 'Квартальный'),
+        ('YEARLY', 'Годовой'),
+        ('CUSTOM', 'За произвольный период'),
+    ]
+    PARAMS_SERIALIZERS = {
+        'QUARTERLY': QuarterlyReportSerializer,
+        'YEARLY': YearlyReportSerializer,
+        'CUSTOM': RangeReportSerializer,
+    }
+
+    report_type = serializers.ChoiceField(choices=REPORT_TYPE_CHOICES, required=True)
+    quarter = serializers.IntegerField(required=False)
+    year = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def to_internal_value(self, data):
+        data = data.copy()
+        if 'report_type' in data and isinstance(data['report_type'], str):
+            data['report_type'] = data['report_type'].upper()
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        params_serializer = self.PARAMS_SERIALIZERS[data['report_type']](data=self.initial_data)
+        if not params_serializer.is_valid():
+            raise serializers.ValidationError(params_serializer.errors)
+
+        data['params'] = dict(params_serializer.validated_data)
+        return data
+
+
+class ReservationListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Вложенные комнаты получают гостя и уборщика из общего контекста, как в RoomListSerializer
+        reservations = list(data.all() if hasattr(data, 'all') else data)
+        if 'current_reservations' not in self.context:
+            rooms = {reservation.room_id: reservation.room for reservation in reservations}
+            self.context.update(RoomSerializer.preload_context(rooms.values()))
+        return super().to_representation(reservations)
+
+
 class ReservationSerializer(serializers.ModelSerializer):
     client = ClientSerializer(read_only=True)
     room = RoomSerializer(read_only=True)
@@ -348,8 +688,11 @@ class ReservationSerializer(serializers.ModelSerializer):
             'price_at_booking',
             'final_price',
             'last_updated_date',
-            'updated_by_id'
+            'updated_by_id',
+            'version'
         ]
+        read_only_fields = ['version']
+        list_serializer_class = ReservationListSerializer
 
 
 
@@ -367,8 +710,30 @@ class EmployeeSerializer(serializers.ModelSerializer):
             'position',
         ]
 
+    @staticmethod
+    def with_active_position(queryset):
+        # Должность по активному контракту - LEFT JOIN в том же запросе: контракт каждого сотрудника страницы
+        # ищется по индексу (employee, is_active), и план не зависит от соотношения размеров таблиц.
+        # Активный контракт у сотрудника не больше одного (ограничение unique_active_contract_per_employee)
+        return queryset.annotate(
+            active_contract=FilteredRelation('employmentcontract', condition=Q(employmentcontract__is_active=True)),
+            active_position_id=F('active_contract__position_id'),
+            active_position_name=F('active_contract__position__name'),
+            active_position_salary=F('active_contract__position__salary'),
+        )
+
     def get_position(self, obj):
-        active_contract = EmploymentContract.objects.filter(employee=obj, is_active=True).first()
+        if hasattr(obj, 'active_position_id'):
+            if obj.active_position_id is None:
+                return None
+            return {
+                'id': obj.active_position_id,
+                'name': obj.active_position_name,
+                'salary': obj.active_position_salary,
+            }
+        active_contract = EmploymentContract.objects.filter(
+            employee=obj, is_active=True
+        ).select_related('position').first()
         if active_contract and active_contract.position:
             return {
                 'id': active_contract.position.id,
@@ -411,4 +776,35 @@ class CleaningScheduleSerializer(serializers.ModelSerializer):
             'number': obj.room.number,
             'type_id': obj.room.type.id,
             'type_name': obj.room.type.name,
-        }
\ No newline at end of file
+        }
+
+
+class CleaningScheduleCleanerRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='cleaner__employee__id')
+    first_name = serializers.CharField(source='cleaner__employee__first_name')
+    last_name = serializers.CharField(source='cleaner__employee__last_name')
+    middle_name = serializers.CharField(source='cleaner__employee__middle_name', allow_null=True)
+
+
+class CleaningScheduleRoomRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='room_id')
+    number = serializers.IntegerField(source='room__number')
+    type_id = serializers.IntegerField(source='room__type_id')
+    type_name = serializers.CharField(source='room__type__name')
+
+
+class CleaningScheduleRowSerializer(serializers.Serializer):
+    # Тот же ответ, что у CleaningScheduleSerializer, но из словаря CleaningSchedule.objects.values(*FIELDS):
+    # списки уборок читаются без создания моделей уборки, контракта, сотрудника, комнаты и типа
+    FIELDS = (
+        'id', 'cleaning_date', 'status',
+        'cleaner__employee__id', 'cleaner__employee__first_name', 'cleaner__employee__last_name',
+        'cleaner__employee__middle_name',
+        'room_id', 'room__number', 'room__type_id', 'room__type__name',
+    )
+
+    id = serializers.IntegerField()
+    cleaner = CleaningScheduleCleanerRowSerializer(source='*')
+    room = CleaningScheduleRoomRowSerializer(source='*')
+    cleaning_date = serializers.DateField()
+    status = serializers.CharField()
@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save, post_delete, post_init, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, availability, conditional, jobs, metrics, pricing, rollups
+from .models import RoomPriceHistory, Reservation, Room, RoomType
+
+
+@receiver(post_save, sender=RoomPriceHistory)
+def room_price_saved(sender, instance, **kwargs):
+    pricing.price_period_changed(instance)
+
+
+@receiver(post_delete, sender=RoomPriceHistory)
+def room_price_deleted(sender, instance, **kwargs):
+    pricing.price_period_changed(instance, deleted=True)
+
+
+@receiver(post_init, sender=Reservation)
+def reservation_initialized(sender, instance, **kwargs):
+    rollups.reservation_loaded(instance)
+
+
+@receiver(pre_save, sender=Reservation)
+def reservation_saving(sender, instance, **kwargs):
+    rollups.reservation_saving(instance)
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    availability.reservation_changed(instance)
+    jobs.invalidate_reservation(instance)
+    rollups.reservation_changed(instance)
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    availability.reservation_changed(instance, deleted=True)
+    jobs.invalidate_reservation(instance, deleted=True)
+    rollups.reservation_changed(instance, deleted=True)
+
+
+@receiver(post_init, sender=Room)
+def room_initialized(sender, instance, **kwargs):
+    instance.initial_type_id = instance.__dict__.get('type_id')
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, **kwargs):
+    availability.room_changed(instance, created=created)
+    jobs.invalidate_rooms()
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    availability.room_changed(instance, deleted=True)
+    jobs.invalidate_rooms()
+
+
+@receiver([post_save, post_delete], sender=RoomType)
+def room_type_changed(sender, instance, **kwargs):
+    availability.invalidate_availability_index()
+
+
+@receiver([post_save, post_delete])
+def collection_changed(sender, **kwargs):
+    conditional.model_changed(sender)
+
+
+@receiver(connection_created)
+def track_connection_queries(sender, connection, **kwargs):
+    metrics.track_queries(connection)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, **kwargs):
+    authentication.invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Деактивация и любые другие изменения пользователя сбрасывают его закэшированные токены
+    authentication.invalidate_user_tokens([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Смена групп и прямых прав; reverse - изменение со стороны группы или права (group.user_set.add(...)),
+    # тогда затронутые пользователи - pk_set, а при очистке - все пользователи до неё
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            authentication.invalidate_user_tokens([instance.pk])
+        return
+    if action == 'pre_clear':
+        user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        user_ids = pk_set
+    else:
+        return
+    authentication.invalidate_user_tokens(user_ids)
@@ -1,3 +1,2020 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission, User
+from django.conf import settings
+from django.core.cache import caches
+from django.core import checks
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import IntegrityError, OperationalError, connection, connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from hotel_app import availability, pricing, search, urls as hotel_urls
+from hotel_app.cache import FileCache
+from hotel_app.authentication import CachedTokenAuthentication, invalidate_tokens, reset_token_cache
+from hotel_app.models import RoomType, Room, Client, Reservation, EmployeePosition, Employee, EmploymentContract, \
+    CleaningSchedule, RoomPriceHistory, RoomDailyRollup, StaleVersionError
+from hotel_app.db_objects import missing_database_objects
+from hotel_app.availability import find_available_rooms, available_rooms_queryset, reset_availability_index
+from hotel_app.housekeeping import assign_rooms, room_floor
+from hotel_app.imports import import_reservations
+from hotel_app.metrics import reset_metrics
+from hotel_app.overlaps import find_stay_overlaps
+from hotel_app.pricing import MAX_QUOTE_ITEMS, quote_price, reset_price_calendars
+from hotel_app.rollups import COUNTED_STATUSES, rebuild_rollup
+from hotel_app.routers import reset_replica_state, routing_scope
+from hotel_app.serializers import CleaningScheduleSerializer
+
+
+def clear_caches():
+    # Общий кэш (HOTEL_SHARED_CACHE) файловый и переживает тест - очищаются все кэши
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+class HotelTestCase(APITransactionTestCase):
+    # Производные данные (индексы, календари цен, метки коллекций) обновляются в transaction.on_commit,
+    # поэтому тесты работают с настоящими фиксациями, а не внутри общей транзакции APITestCase
+
+    def setUp(self):
+        # Реплика здесь не нужна: как и раньше внутри транзакции, все чтения идут в первичную БД
+        replica = mock.patch('hotel_app.routers.replica_replayed_until', return_value=None)
+        replica.start()
+        self.addCleanup(replica.stop)
+
+        clear_caches()
+        reset_price_calendars()
+        reset_availability_index()
+
+        self.user = User.objects.create_user(username='admin', password='admin')
+        self.client.force_authenticate(user=self.user)
+
+        self.room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        self.position = EmployeePosition.objects.create(name='Уборщик', salary=30000)
+
+    def create_rooms(self, count, start_number=101):
+        rooms = []
+        for i in range(count):
+            number = start_number + i
+            room = Room.objects.create(number=number, type=self.room_type, status='OCCUPIED', phone=str(number))
+            client = Client.objects.create(
+                passport_number=f'{number:010d}',
+                first_name='Иван',
+                last_name='Иванов',
+                city_from='Москва'
+            )
+            Reservation.objects.create(
+                room=room,
+                client=client,
+                admin=self.user,
+                arrival_date=date(2024, 1, 1),
+                departure_date=date(2024, 1, 5),
+                status='CHECKED_IN',
+                price_at_booking=1000,
+                final_price=1000,
+            )
+            employee = Employee.objects.create(passport_number=f'E{number:09d}', first_name='Анна', last_name='Петрова')
+            contract = EmploymentContract.objects.create(
+                employee=employee,
+                position=self.position,
+                contract_type='PERMANENT',
+                start_date=date(2023, 1, 1),
+            )
+            for day in range(2):
+                CleaningSchedule.objects.create(cleaner=contract, room=room, cleaning_date=date(2024, 1, 1) + timedelta(days=day))
+            rooms.append(room)
+        return rooms
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+class RoomSerializerPreloadTests(HotelTestCase):
+
+    def test_rooms_by_status_query_count_does_not_depend_on_rooms(self):
+        self.create_rooms(2)
+        small = self.count_queries('/hotel/rooms?status=OCCUPIED')
+        self.create_rooms(10, start_number=201)
+        large = self.count_queries('/hotel/rooms?status=OCCUPIED')
+        self.assertEqual(small, large)
+
+    def test_room_viewset_query_count_does_not_depend_on_rooms(self):
+        self.create_rooms(2)
+        small = self.count_queries('/hotel/api/rooms/')
+        self.create_rooms(10, start_number=201)
+        large = self.count_queries('/hotel/api/rooms/')
+        self.assertEqual(small, large)
+
+    def test_preloaded_values_match_latest_records(self):
+        room = self.create_rooms(1)[0]
+        response = self.client.get('/hotel/rooms?status=OCCUPIED')
+        data = response.json()['rooms'][0]
+        reservation = Reservation.objects.get(room=room)
+        self.assertEqual(data['current_client']['id'], reservation.client_id)
+        self.assertEqual(data['last_cleaner']['cleaning_date'], '2024-01-02')
+
+
+class ClientStayOverlapTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='101')
+        self.guests = [
+            Client.objects.create(passport_number=f'{i:010d}', first_name='Иван', last_name='Иванов', city_from='Москва')
+            for i in range(5)
+        ]
+
+    def reserve(self, client, arrival, departure):
+        Reservation.objects.create(
+            room=self.room,
+            client=client,
+            admin=self.user,
+            arrival_date=arrival,
+            departure_date=departure,
+            # Завершённые проживания: пересекаться в одной комнате не могут только активные бронирования
+            status='CHECKED_OUT',
+            price_at_booking=1000,
+            final_price=1000,
+        )
+
+    def test_overlaps_match_pairwise_check(self):
+        target, touching, inside, spanning, outside = self.guests
+        self.reserve(target, date(2024, 1, 1), date(2024, 1, 5))
+        self.reserve(target, date(2024, 1, 5), date(2024, 1, 8))
+        self.reserve(target, date(2024, 3, 1), date(2024, 3, 3))
+        self.reserve(touching, date(2024, 1, 8), date(2024, 1, 10))
+        self.reserve(inside, date(2024, 1, 4), date(2024, 1, 6))
+        self.reserve(spanning, date(2024, 2, 20), date(2024, 3, 10))
+        self.reserve(outside, date(2024, 2, 1), date(2024, 2, 10))
+
+        response = self.client.get(f'/hotel/clients/stay-overlap?client_id={target.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([client['id'] for client in response.json()['clients']], sorted([inside.id, spanning.id]))
+
+    def test_batch_returns_overlaps_per_client(self):
+        first, second, third = self.guests[:3]
+        self.reserve(first, date(2024, 1, 1), date(2024, 1, 5))
+        self.reserve(second, date(2024, 1, 3), date(2024, 1, 7))
+        self.reserve(third, date(2024, 1, 6), date(2024, 1, 9))
+
+        response = self.client.get(f'/hotel/clients/stay-overlap/batch?client_ids={first.id},{second.id},999')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([client['id'] for client in results[0]['clients']], [second.id])
+        self.assertEqual([client['id'] for client in results[1]['clients']], sorted([first.id, third.id]))
+        self.assertEqual(results[2]['count'], 0)
+        self.assertIn('detail', results[2])
+
+    def test_candidates_are_queried_per_window(self):
+        first, second, third, fourth, _ = self.guests
+        self.reserve(first, date(2024, 1, 1), date(2024, 1, 5))
+        self.reserve(first, date(2024, 6, 1), date(2024, 6, 3))
+        self.reserve(second, date(2024, 5, 20), date(2024, 6, 2))
+        self.reserve(third, date(2024, 1, 4), date(2024, 1, 5))
+        self.reserve(third, date(2024, 3, 1), date(2024, 3, 2))
+        self.reserve(fourth, date(2024, 3, 1), date(2024, 3, 20))
+
+        stays = list(Reservation.objects.values_list('client_id', 'arrival_date', 'departure_date'))
+        expected = {
+            client.id: {other for other, arrival, departure in stays for own, own_arrival, own_departure in stays
+                        if own == client.id and other != client.id and arrival < own_departure and own_arrival < departure}
+            for client in (first, third)
+        }
+        with mock.patch('hotel_app.overlaps.WINDOWS_PER_QUERY', 1), CaptureQueriesContext(connection) as context:
+            self.assertEqual(find_stay_overlaps([first.id, third.id]), expected)
+        # Проживания клиентов и по одному запросу кандидатов на каждое из трёх окон
+        self.assertEqual(len(context.captured_queries), 4)
+
+
+class PriceCalendarTests(HotelTestCase):
+
+    def naive_price(self, arrival, departure):
+        periods = list(RoomPriceHistory.objects.filter(room_type=self.room_type).order_by('start_date', 'id'))
+        total = 0
+        current = arrival
+        while current < departure:
+            for period in periods:
+                if period.start_date <= current and (period.end_date is None or period.end_date >= current):
+                    total += period.price
+                    break
+            current += timedelta(days=1)
+        return total
+
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def test_quote_matches_day_by_day_calculation(self):
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(0), end_date=self.day(30), price=1000)
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(19), end_date=None, price=1500)
+        stays = [
+            (self.day(-7), self.day(4)),
+            (self.day(14), self.day(40)),
+            (self.day(-2000), self.day(-1990)),
+            (self.day(0), self.day(2500)),
+        ]
+        for arrival, departure in stays:
+            self.assertEqual(quote_price(self.room_type.id, arrival, departure), self.naive_price(arrival, departure))
+
+    def test_calendar_follows_price_history_changes(self):
+        period = RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(0), end_date=None, price=1000)
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 2000)
+
+        period.price = 1200
+        period.save()
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 2400)
+
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(-31), end_date=self.day(0), price=500)
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 1700)
+
+        period.delete()
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 500)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(0), price=9000)
+            raise IntegrityError
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 500)
+
+    def test_period_up_to_max_date_is_applied(self):
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 0)
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(1), end_date=date.max, price=700)
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 700)
+        self.assertEqual(quote_price(self.room_type.id, date.max - timedelta(days=2), date.max), 1400)
+
+    @override_settings(HOTEL_SHARED_CACHE=None)
+    def test_quote_reads_database_without_shared_cache(self):
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(0), end_date=None, price=1000)
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 2000)
+
+        # Изменение в обход сигналов (как из другого процесса) видно сразу, календарь в памяти не строится
+        RoomPriceHistory.objects.update(price=1300)
+        self.assertEqual(quote_price(self.room_type.id, self.day(0), self.day(2)), 2600)
+        self.assertEqual(pricing._calendars, {})
+
+    def test_quote_endpoint_prices_many_stays(self):
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=self.day(0), end_date=None, price=1000)
+        Room.objects.create(number=101, type=self.room_type, phone='101')
+        response = self.client.post('/hotel/pricing/quote', {
+            'items': [
+                {'room_number': 101, 'arrival_date': str(self.day(0)), 'departure_date': str(self.day(3))},
+                {'room_number': 101, 'arrival_date': str(self.day(31)), 'departure_date': str(self.day(32))},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['total_price'] for item in response.json()['results']], [3000, 1000])
+
+        response = self.client.post('/hotel/pricing/quote', {
+            'items': [{'room_number': 999, 'arrival_date': str(self.day(0)), 'departure_date': str(self.day(3))}]
+        }, format='json')
+        self.assertEqual(response.status_code, 422)
+
+    def test_quote_endpoint_limits_request_size(self):
+        Room.objects.create(number=101, type=self.room_type, phone='101')
+        item = {'room_number': 101, 'arrival_date': str(self.day(0)), 'departure_date': str(self.day(1))}
+        response = self.client.post('/hotel/pricing/quote', {'items': [item] * (MAX_QUOTE_ITEMS + 1)}, format='json')
+        self.assertEqual(response.status_code, 422)
+
+        for arrival, departure in [(self.day(-400), self.day(1)), (self.day(0), date.max)]:
+            response = self.client.post('/hotel/pricing/quote', {
+                'items': [{'room_number': 101, 'arrival_date': str(arrival), 'departure_date': str(departure)}]
+            }, format='json')
+            self.assertEqual(response.status_code, 422)
+
+
+class AvailabilityIndexTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        self.suite = RoomType.objects.create(name='Люкс', capacity=3, has_wifi=True, has_balcony=True)
+        self.single = Room.objects.create(number=101, type=self.room_type, phone='101')
+        self.suite_room = Room.objects.create(number=201, type=self.suite, phone='201')
+        self.guest = Client.objects.create(passport_number='1234567890', first_name='Иван', last_name='Иванов', city_from='Москва')
+
+    def reserve(self, room, arrival_offset, departure_offset, status='BOOKED'):
+        return Reservation.objects.create(
+            room=room,
+            client=self.guest,
+            admin=self.user,
+            arrival_date=self.today + timedelta(days=arrival_offset),
+            departure_date=self.today + timedelta(days=departure_offset),
+            status=status,
+            price_at_booking=1000,
+            final_price=1000,
+        )
+
+    def assert_matches_orm(self, arrival_offset, departure_offset, capacity=None, amenities=()):
+        args = (self.today + timedelta(days=arrival_offset), self.today + timedelta(days=departure_offset), capacity, amenities)
+        expected = list(available_rooms_queryset(*args).values_list('id', flat=True))
+        self.assertEqual(find_available_rooms(*args), expected)
+        return expected
+
+    def test_index_follows_reservation_changes(self):
+        self.assertEqual(self.assert_matches_orm(1, 3), [self.single.id, self.suite_room.id])
+
+        reservation = self.reserve(self.single, 2, 5)
+        self.assertEqual(self.assert_matches_orm(1, 3), [self.suite_room.id])
+        self.assertEqual(self.assert_matches_orm(5, 7), [self.single.id, self.suite_room.id])
+
+        reservation.status = 'CANCELLED'
+        reservation.save()
+        self.assertEqual(self.assert_matches_orm(1, 3), [self.single.id, self.suite_room.id])
+
+        self.reserve(self.suite_room, -10, 400, status='CHECKED_IN')
+        self.assert_matches_orm(1, 3)
+        self.assert_matches_orm(-20, 900)
+
+    def test_filters_by_capacity_and_amenities(self):
+        self.assertEqual(self.assert_matches_orm(1, 3, capacity=2), [self.suite_room.id])
+        self.assertEqual(self.assert_matches_orm(1, 3, amenities=['has_balcony']), [self.suite_room.id])
+
+        Room.objects.create(number=202, type=self.suite, phone='202')
+        self.assertEqual(len(self.assert_matches_orm(1, 3, amenities=['has_wifi'])), 2)
+
+    def test_available_rooms_endpoint(self):
+        self.reserve(self.single, 0, 3)
+        arrival = self.today + timedelta(days=1)
+        departure = self.today + timedelta(days=2)
+
+        response = self.client.get(f'/hotel/rooms/available?arrival_date={arrival}&departure_date={departure}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['number'] for room in response.json()['rooms']], [201])
+
+        response = self.client.get(f'/hotel/rooms/available?arrival_date={arrival}&departure_date={departure}&amenities=pool')
+        self.assertEqual(response.status_code, 422)
+
+        departure = self.today + timedelta(days=3 * 365)
+        response = self.client.get(f'/hotel/rooms/available?arrival_date={arrival}&departure_date={departure}')
+        self.assertEqual(response.status_code, 422)
+
+    def test_rolled_back_reservation_leaves_index_unchanged(self):
+        self.assert_matches_orm(1, 3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.reserve(self.single, 1, 3)
+            raise IntegrityError
+        self.assertEqual(self.assert_matches_orm(1, 3), [self.single.id, self.suite_room.id])
+
+    @override_settings(HOTEL_SHARED_CACHE=None)
+    def test_queries_database_without_shared_cache(self):
+        self.assertEqual(self.assert_matches_orm(1, 3), [self.single.id, self.suite_room.id])
+
+        # Бронирование в обход сигналов (как из другого процесса) сразу видно в поиске, индекс не строится
+        Reservation.objects.bulk_create([Reservation(
+            room=self.single, client=self.guest, admin=self.user, arrival_date=self.today,
+            departure_date=self.today + timedelta(days=5), status='BOOKED', price_at_booking=0, final_price=0,
+        )])
+        self.assertEqual(self.assert_matches_orm(1, 3), [self.suite_room.id])
+        self.assertIsNone(availability._index)
+
+
+class RoomDailyRollupTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='101')
+        self.guest = Client.objects.create(passport_number='1234567890', first_name='Иван', last_name='Иванов', city_from='Москва')
+
+    def reserve(self, arrival, departure, price, status='BOOKED', payment_status='PAID'):
+        return Reservation.objects.create(
+            room=self.room,
+            client=self.guest,
+            admin=self.user,
+            arrival_date=arrival,
+            departure_date=departure,
+            status=status,
+            payment_status=payment_status,
+            price_at_booking=price,
+            final_price=price,
+        )
+
+    def snapshot(self):
+        return sorted(RoomDailyRollup.objects.filter(
+            Q(reservations__gt=0) | Q(nights__gt=0) | Q(income__gt=0)
+        ).values_list('date', 'room_id', 'reservations', 'nights', 'income'))
+
+    def test_incremental_rollup_matches_rebuild(self):
+        first = self.reserve(date(2024, 3, 30), date(2024, 4, 2), 1000)
+        second = self.reserve(date(2024, 4, 10), date(2024, 4, 12), 500, payment_status='UNPAID')
+
+        first.departure_date = date(2024, 4, 4)
+        first.save()
+        second.payment_status = 'PREPAID'
+        second.save()
+        self.reserve(date(2024, 5, 1), date(2024, 5, 3), 700).delete()
+        cancelled = Reservation.objects.only('id').get(id=second.id)
+        cancelled.status = 'CANCELLED'
+        cancelled.save()
+        self.reserve(date(2024, 6, 1), date(2024, 6, 2), 300)
+
+        incremental = self.snapshot()
+        rebuild_rollup()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(sum(row[4] for row in incremental), 1300)
+
+    def test_reports_are_built_from_rollup(self):
+        self.reserve(date(2024, 4, 1), date(2024, 4, 3), 1000)
+        self.reserve(date(2024, 6, 30), date(2024, 7, 2), 600)
+        self.reserve(date(2024, 5, 1), date(2024, 5, 2), 400, payment_status='UNPAID')
+
+        response = self.client.get('/hotel/reports/quarterly?quarter=2&year=2024')
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['clients_per_room'], [{'room__number': 101, 'client_count': 3}])
+        self.assertEqual(report['total_income'], 1300)
+
+        response = self.client.get('/hotel/reports/range?start_date=2024-04-02&end_date=2024-04-02')
+        self.assertEqual(response.json()['total_income'], 500)
+
+    def test_report_counts_boundary_and_cancelled_stays_by_nights(self):
+        # Проживания на границах квартала и оплаченное отменённое бронирование. Отчёт до дневной сводки
+        # учитывал только бронирования целиком внутри квартала (здесь - 15 февраля и 27 марта: 2 клиента)
+        # и доход по статусу оплаты, включая отменённое (400 + 500 = 900)
+        self.reserve(date(2023, 12, 31), date(2024, 1, 2), 200, status='CHECKED_OUT')
+        self.reserve(date(2024, 2, 1), date(2024, 2, 3), 500, status='CANCELLED')
+        self.reserve(date(2024, 2, 15), date(2024, 2, 17), 400, status='CONFIRMED')
+        self.reserve(date(2024, 3, 27), date(2024, 3, 30), 900, payment_status='UNPAID')
+        self.reserve(date(2024, 3, 30), date(2024, 4, 2), 300)
+
+        report = self.client.get('/hotel/reports/quarterly?quarter=1&year=2024').json()
+        # Клиенты - по заездам в квартале: 15 февраля, 27 и 30 марта
+        self.assertEqual(report['clients_per_room'], [{'room__number': 101, 'client_count': 3}])
+        # Доход - по оплаченным ночам квартала: 1 января (100), 15-16 февраля (400), 30-31 марта (200)
+        self.assertEqual(report['income_per_room'], [{'room__number': 101, 'total_income': 700}])
+        self.assertEqual(report['total_income'], 700)
+
+
+@override_settings(HOTEL_REPORT_JOBS_EAGER=True)
+class ReportJobTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='101')
+        self.guest = Client.objects.create(passport_number='1234567890', first_name='Иван', last_name='Иванов', city_from='Москва')
+
+    def reserve(self, arrival, departure, price):
+        return Reservation.objects.create(
+            room=self.room,
+            client=self.guest,
+            admin=self.user,
+            arrival_date=arrival,
+            departure_date=departure,
+            payment_status='PAID',
+            price_at_booking=price,
+            final_price=price,
+        )
+
+    def run_job(self, payload):
+        response = self.client.post('/hotel/reports/jobs', payload, format='json')
+        self.assertEqual(response.status_code, 202)
+        response = self.client.get(f"/hotel/reports/jobs/{response.json()['id']}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_job_result_is_cached_until_reservations_change(self):
+        reservation = self.reserve(date(2024, 5, 1), date(2024, 5, 3), 1000)
+
+        job = self.run_job({'report_type': 'quarterly', 'quarter': 2, 'year': 2024})
+        self.assertEqual(job['status'], 'DONE')
+        self.assertFalse(job['cached'])
+        self.assertEqual(job['result']['total_income'], 1000)
+
+        self.assertTrue(self.run_job({'report_type': 'QUARTERLY', 'quarter': 2, 'year': 2024})['cached'])
+
+        self.reserve(date(2024, 9, 1), date(2024, 9, 2), 300)
+        self.assertTrue(self.run_job({'report_type': 'QUARTERLY', 'quarter': 2, 'year': 2024})['cached'])
+
+        reservation.price_at_booking = 1500
+        reservation.save()
+        job = self.run_job({'report_type': 'QUARTERLY', 'quarter': 2, 'year': 2024})
+        self.assertFalse(job['cached'])
+        self.assertEqual(job['result']['total_income'], 1500)
+
+        job = self.run_job({'report_type': 'YEARLY', 'year': 2024})
+        self.assertEqual(job['result']['total_income'], 1800)
+
+        job = self.run_job({'report_type': 'CUSTOM', 'start_date': '2024-05-02', 'end_date': '2024-05-31'})
+        self.assertEqual(job['result']['total_income'], 750)
+
+    def test_room_changes_and_backfill_reset_cached_results(self):
+        self.reserve(date(2024, 5, 1), date(2024, 5, 3), 1000)
+        payload = {'report_type': 'QUARTERLY', 'quarter': 2, 'year': 2024}
+        self.run_job(payload)
+
+        self.room.number = 201
+        self.room.save()
+        job = self.run_job(payload)
+        self.assertFalse(job['cached'])
+        self.assertEqual(job['result']['income_per_room'][0]['room__number'], 201)
+
+        self.assertTrue(self.run_job(payload)['cached'])
+        call_command('backfill_rollup', stdout=io.StringIO())
+        self.assertFalse(self.run_job(payload)['cached'])
+
+    def test_invalid_and_unknown_jobs(self):
+        response = self.client.post('/hotel/reports/jobs', {'report_type': 'QUARTERLY', 'year': 2024}, format='json')
+        self.assertEqual(response.status_code, 422)
+
+        response = self.client.get('/hotel/reports/jobs/unknown')
+        self.assertEqual(response.status_code, 404)
+
+
+class KeysetPaginationTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_rooms(7)
+
+    def collect(self, url, key='next'):
+        pages, ids = 0, []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data[key]
+            pages += 1
+        return pages, ids
+
+    def test_pages_cover_collection_in_keyset_order(self):
+        expected = list(Reservation.objects.order_by('-arrival_date', '-id').values_list('id', flat=True))
+        pages, ids = self.collect('/hotel/api/reservations/?page_size=3')
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, expected)
+
+        response = self.client.get('/hotel/api/clients/?page_size=2')
+        self.assertIsNone(response.data['previous'])
+        second = self.client.get(response.data['next'])
+        self.assertEqual(self.client.get(second.data['previous']).data['results'], response.data['results'])
+
+    def test_rows_inserted_before_cursor_do_not_shift_pages(self):
+        response = self.client.get('/hotel/api/rooms/?page_size=4')
+        Room.objects.create(number=100, type=self.room_type, phone='100')
+        pages, ids = self.collect(response.data['next'])
+        self.assertEqual(ids, list(Room.objects.filter(number__gt=104).order_by('number').values_list('id', flat=True)))
+
+    def test_page_query_count_does_not_depend_on_depth(self):
+        first = self.count_queries('/hotel/api/cleaning-schedules/?page_size=2')
+        response = self.client.get('/hotel/api/cleaning-schedules/?page_size=2')
+        deep = self.count_queries(self.client.get(response.data['next']).data['next'])
+        self.assertEqual(first, deep)
+
+    def test_page_size_is_capped_and_cursor_validated(self):
+        self.assertEqual(len(self.client.get('/hotel/api/employees/?page_size=100000').data['results']), 7)
+        self.assertEqual(self.client.get('/hotel/api/employees/?cursor=garbage').status_code, 404)
+
+    def test_contracts_are_filtered_by_employees_of_a_page(self):
+        employees = self.client.get('/hotel/api/employees/?page_size=3').data['results']
+        ids = [employee['id'] for employee in employees]
+        _, contract_ids = self.collect(f"/hotel/api/employment-contracts/?employee_id={','.join(map(str, ids))}")
+        self.assertEqual(sorted(contract_ids), sorted(
+            EmploymentContract.objects.filter(employee_id__in=ids).values_list('id', flat=True)
+        ))
+
+
+class QueryPlanTests(HotelTestCase):
+    # Крупные таблицы, полный просмотр которых недопустим; справочники (комнаты, типы, должности) малы
+    LARGE_TABLES = {
+        'hotel_app_client', 'hotel_app_reservation', 'hotel_app_employee', 'hotel_app_employmentcontract',
+        'hotel_app_cleaningschedule', 'hotel_app_roomdailyrollup',
+    }
+    FULL_SCAN_PATTERNS = {
+        'sqlite': re.compile(r'^SCAN (\w+)(?: AS \w+)?$'),
+        'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    }
+
+    def setUp(self):
+        super().setUp()
+        rooms = Room.objects.bulk_create(
+            Room(number=100 + i, type=self.room_type, status='OCCUPIED' if i % 3 else 'AVAILABLE', phone=str(i))
+            for i in range(200)
+        )
+        clients = Client.objects.bulk_create(
+            Client(passport_number=f'{i:010d}', first_name='Иван', last_name=f'Иванов{i % 97}', city_from='Москва')
+            for i in range(2000)
+        )
+        statuses = ['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT', 'CANCELLED']
+        Reservation.objects.bulk_create(
+            Reservation(
+                room=rooms[i % len(rooms)],
+                client=clients[i % len(clients)],
+                admin=self.user,
+                # Проживания одной комнаты идут с шагом 24 дня и не пересекаются
+                arrival_date=date(2023, 1, 1) + timedelta(days=i // 200 * 24 + i % 17),
+                departure_date=date(2023, 1, 1) + timedelta(days=i // 200 * 24 + i % 17 + 1 + i % 5),
+                status=statuses[i % len(statuses)],
+                price_at_booking=1000,
+                final_price=1000,
+            )
+            for i in range(6000)
+        )
+        employees = Employee.objects.bulk_create(
+            Employee(passport_number=f'E{i:09d}', first_name='Анна', last_name=f'Петрова{i % 31}')
+            for i in range(300)
+        )
+        contracts = EmploymentContract.objects.bulk_create(
+            EmploymentContract(
+                employee=employee, position=self.position, contract_type='PERMANENT',
+                start_date=date(2022, 1, 1) + timedelta(days=i), is_active=True,
+            )
+            for i, employee in enumerate(employees)
+        )
+        # Строки i и i + 4200 совпадают по (контракт, комната, дата) - повторы отбрасывает уникальное ограничение
+        CleaningSchedule.objects.bulk_create(
+            (CleaningSchedule(cleaner=contracts[i % len(contracts)], room=rooms[i % len(rooms)],
+                              cleaning_date=date(2023, 1, 1) + timedelta(days=i % 700))
+             for i in range(6000)),
+            ignore_conflicts=True,
+        )
+        rebuild_rollup()
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.client_id = clients[5].id
+
+    def full_scans(self, sql, params=()):
+        pattern = self.FULL_SCAN_PATTERNS[connection.vendor]
+        with connection.cursor() as cursor:
+            cursor.execute(connection.ops.explain_query_prefix() + ' ' + sql, params)
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+        return [table for line in plan for table in pattern.findall(line.strip()) if table in self.LARGE_TABLES]
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        selects = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql), [], f'{url}: {sql}')
+
+    def test_endpoint_queries_use_indexes(self):
+        urls = [
+            '/hotel/api/clients/',
+            '/hotel/api/rooms/',
+            '/hotel/api/reservations/',
+            '/hotel/api/employees/',
+            '/hotel/api/employment-contracts/',
+            '/hotel/api/cleaning-schedules/',
+            '/hotel/rooms?status=AVAILABLE',
+            '/hotel/clients?room=150&start_date=2023-06-01&end_date=2023-06-10',
+            f'/hotel/clients/stay-overlap?client_id={self.client_id}',
+            f'/hotel/clients/room-cleaner?client_id={self.client_id}&day_of_week=MONDAY',
+            '/hotel/reports/range?start_date=2023-03-01&end_date=2023-03-31',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_indexed(url)
+
+    def test_orm_availability_query_uses_indexes(self):
+        queryset = available_rooms_queryset(date(2023, 5, 1), date(2023, 5, 5))
+        sql, params = queryset.query.sql_with_params()
+        self.assertEqual(self.full_scans(sql, params), [])
+
+
+class ActiveContractConstraintTests(HotelTestCase):
+
+    def test_employee_has_at_most_one_active_contract(self):
+        employee = Employee.objects.create(passport_number='E000000001', first_name='Анна', last_name='Петрова')
+        contract = EmploymentContract.objects.create(
+            employee=employee, position=self.position, contract_type='PERMANENT', start_date=date(2023, 1, 1)
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EmploymentContract.objects.create(
+                employee=employee, position=self.position, contract_type='PERMANENT', start_date=date(2024, 1, 1)
+            )
+
+        contract.is_active = False
+        contract.save()
+        EmploymentContract.objects.create(
+            employee=employee, position=self.position, contract_type='PERMANENT', start_date=date(2024, 1, 1)
+        )
+        self.assertEqual(EmploymentContract.objects.filter(employee=employee).count(), 2)
+
+
+class EmployeeQueryCountTests(HotelTestCase):
+
+    def test_employee_list_query_count_does_not_depend_on_employees(self):
+        self.create_rooms(2)
+        small = self.count_queries('/hotel/api/employees/')
+        self.create_rooms(10, start_number=201)
+        self.assertEqual(self.count_queries('/hotel/api/employees/'), small)
+
+        response = self.client.get('/hotel/api/employees/')
+        self.assertEqual(
+            {item['position']['id'] for item in response.data['results']},
+            {self.position.id},
+        )
+
+    def test_contract_list_query_count_does_not_depend_on_contracts(self):
+        self.create_rooms(2)
+        small = self.count_queries('/hotel/api/employment-contracts/')
+        self.create_rooms(10, start_number=201)
+        self.assertEqual(self.count_queries('/hotel/api/employment-contracts/'), small)
+
+    def test_employee_without_active_contract_has_no_position(self):
+        employee = Employee.objects.create(passport_number='E000000001', first_name='Анна', last_name='Петрова')
+        EmploymentContract.objects.create(
+            employee=employee, position=self.position, contract_type='PERMANENT',
+            start_date=date(2023, 1, 1), is_active=False,
+        )
+        response = self.client.get(f'/hotel/api/employees/{employee.id}/')
+        self.assertIsNone(response.data['position'])
+        self.assertIsNone(self.client.get('/hotel/api/employees/').data['results'][0]['position'])
+
+
+class CleaningScheduleQueryTests(HotelTestCase):
+
+    def test_weekday_column_follows_cleaning_date(self):
+        room, = self.create_rooms(1)
+        contract = EmploymentContract.objects.get()
+        CleaningSchedule.objects.bulk_create(
+            CleaningSchedule(cleaner=contract, room=room, cleaning_date=date(2024, 2, 1) + timedelta(days=day))
+            for day in range(7)
+        )
+        for schedule in CleaningSchedule.objects.all():
+            self.assertEqual(schedule.weekday, (schedule.cleaning_date.isoweekday() % 7) + 1)
+            self.assertEqual(
+                CleaningSchedule.objects.filter(id=schedule.id, cleaning_date__week_day=schedule.weekday).count(), 1
+            )
+
+    def test_room_cleaner_query_count_does_not_depend_on_schedules(self):
+        room, = self.create_rooms(1)
+        reservation = Reservation.objects.get()
+        url = f'/hotel/clients/room-cleaner?client_id={reservation.client_id}&day_of_week=MONDAY'
+
+        contract = EmploymentContract.objects.get()
+        CleaningSchedule.objects.create(cleaner=contract, room=room, cleaning_date=date(2024, 1, 8))
+        small = self.count_queries(url)
+        CleaningSchedule.objects.bulk_create(
+            CleaningSchedule(cleaner=contract, room=room, cleaning_date=date(2024, 1, 15) + timedelta(weeks=week))
+            for week in range(10)
+        )
+        self.assertEqual(self.count_queries(url), small)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(response.data['employees'][0], {
+            'id': contract.employee.id, 'first_name': 'Анна', 'last_name': 'Петрова', 'middle_name': None,
+        })
+
+    def test_schedule_list_query_count_does_not_depend_on_schedules(self):
+        self.create_rooms(2)
+        small = self.count_queries('/hotel/api/cleaning-schedules/')
+        self.create_rooms(10, start_number=201)
+        self.assertEqual(self.count_queries('/hotel/api/cleaning-schedules/'), small)
+
+    def test_schedule_rows_match_model_serializer(self):
+        self.create_rooms(3)
+        schedules = CleaningSchedule.objects.order_by('-cleaning_date', '-id')
+        expected = json.loads(json.dumps(CleaningScheduleSerializer(schedules, many=True).data))
+
+        response = self.client.get('/hotel/api/cleaning-schedules/?page_size=2')
+        results = response.json()['results']
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(results + response.json()['results'], expected[:4])
+
+        response = self.client.get(f"/hotel/api/cleaning-schedules/{expected[0]['id']}/")
+        self.assertEqual(response.json(), expected[0])
+
+    def test_weekday_column_uses_only_builtin_sql_functions(self):
+        # Столбец вычисляет сама SQLite, поэтому строки можно вставлять и не через Django
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [CleaningSchedule._meta.db_table])
+            table_sql = cursor.fetchone()[0]
+        self.assertNotIn('django_', table_sql)
+        self.assertIn('strftime', table_sql)
+
+
+class ExportTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_rooms(3)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_reservations_ndjson_by_default(self):
+        lines = self.read(self.client.get('/hotel/export/reservations')).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], list(Reservation.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(rows[0]['room_number'], 101)
+        self.assertEqual(rows[0]['arrival_date'], '2024-01-01')
+
+    def test_clients_csv_by_accept_header(self):
+        response = self.client.get('/hotel/export/clients', HTTP_ACCEPT='text/csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = list(csv.reader(io.StringIO(self.read(response))))
+        self.assertEqual(rows[0][:3], ['id', 'passport_number', 'first_name'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][2], 'Иван')
+
+    def test_updated_since_filter(self):
+        since = timezone.now()
+        reservation = Reservation.objects.order_by('id').last()
+        reservation.status = 'CHECKED_OUT'
+        reservation.save()
+
+        lines = self.read(self.client.get('/hotel/export/reservations', {'updated_since': since.isoformat()})).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [reservation.id])
+        self.assertEqual(self.client.get('/hotel/export/clients', {'updated_since': 'вчера'}).status_code, 422)
+
+    def test_rows_are_read_in_chunks(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/hotel/export/clients')
+            self.assertEqual(len(context.captured_queries), 0)
+            self.read(response)
+        self.assertEqual(len(context.captured_queries), 1)
+
+
+class ConditionalGetTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rooms = self.create_rooms(3)
+
+    def test_unchanged_collection_returns_not_modified_without_queries(self):
+        for url in ['/hotel/rooms?status=OCCUPIED', '/hotel/api/reservations/', '/hotel/api/rooms/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(len(context.captured_queries), 0)
+
+    def test_writes_change_etag(self):
+        url = '/hotel/api/reservations/'
+        etag = self.client.get(url)['ETag']
+
+        contract = EmploymentContract.objects.first()
+        CleaningSchedule.objects.create(cleaner=contract, room=self.rooms[0], cleaning_date=date(2024, 2, 1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.rooms[1].status = 'AVAILABLE'
+        self.rooms[1].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertNotEqual(self.client.get(url + '?page_size=1')['ETag'], self.client.get(url)['ETag'])
+
+    def test_bulk_schedule_update_changes_etag(self):
+        url = '/hotel/api/cleaning-schedules/'
+        etag = self.client.get(url)['ETag']
+        contract = EmploymentContract.objects.first()
+        response = self.client.patch('/hotel/cleaning-schedules/manage', {
+            'cleaner_id': contract.employee_id,
+            'cleaning_dates': ['2024-03-01'],
+            'room_ids': [self.rooms[0].number],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stamp_changes_only_after_commit(self):
+        url = '/hotel/api/rooms/'
+        etag = self.client.get(url)['ETag']
+        with transaction.atomic():
+            self.rooms[0].status = 'AVAILABLE'
+            self.rooms[0].save()
+            self.assertEqual(self.client.get(url)['ETag'], etag)
+        committed = self.client.get(url)['ETag']
+        self.assertNotEqual(committed, etag)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Room.objects.create(number=999, type=self.room_type, phone='999')
+            raise IntegrityError
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=committed).status_code, 304)
+
+    @override_settings(HOTEL_SHARED_CACHE=None)
+    def test_etag_follows_data_without_shared_cache(self):
+        url = '/hotel/api/rooms/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Изменение в обход сигналов (как из другого процесса) не обновляет меток, но меняет данные и ETag
+        Room.objects.filter(id=self.rooms[0].id).update(status='AVAILABLE')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ResponseCacheTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rooms = self.create_rooms(3)
+
+    def stats(self, endpoint):
+        return self.client.get('/hotel/cache/stats').data[endpoint]
+
+    def test_repeated_queries_are_served_from_cache(self):
+        first = self.client.get('/hotel/rooms?status=OCCUPIED,AVAILABLE')
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get('/hotel/rooms?status=OCCUPIED,AVAILABLE')
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.stats('rooms-by-status'), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+        self.client.get('/hotel/clients', {'city': 'Москва', 'room': ''})
+        self.client.get('/hotel/clients', {'city': 'Москва'})
+        self.assertEqual(self.stats('clients-list')['hits'], 1)
+
+    @override_settings(HOTEL_SHARED_CACHE=None)
+    def test_cache_is_off_without_shared_cache(self):
+        self.client.get('/hotel/rooms?status=OCCUPIED')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get('/hotel/rooms?status=OCCUPIED').status_code, 200)
+        self.assertGreater(len(context.captured_queries), 0)
+        self.assertEqual(self.stats('rooms-by-status'), {'hits': 0, 'misses': 0, 'hit_ratio': None})
+
+    def test_shared_file_cache_counts_every_increment(self):
+        # Параллельные incr из разных потоков (как из разных процессов) не теряются
+        with tempfile.TemporaryDirectory() as directory:
+            shared = FileCache(directory, {})
+            shared.set('counter', 0, timeout=None)
+
+            def increment():
+                for _ in range(50):
+                    shared.incr('counter')
+
+            threads = [threading.Thread(target=increment) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(shared.get('counter'), 200)
+
+    def test_signals_invalidate_dependent_entries(self):
+        url = '/hotel/clients?city=Казань'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        Client.objects.create(passport_number='K000000001', first_name='Ильдар', last_name='Сафин', city_from='Казань')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+        url = '/hotel/rooms?status=OCCUPIED'
+        self.assertEqual(self.client.get(url).data['count'], 3)
+        self.rooms[0].status = 'REQUIRES_CLEANING'
+        self.rooms[0].save()
+        self.assertEqual(self.client.get(url).data['count'], 2)
+
+        contract = EmploymentContract.objects.first()
+        CleaningSchedule.objects.create(cleaner=contract, room=self.rooms[1], cleaning_date=date(2024, 3, 1))
+        room = next(room for room in self.client.get(url).data['rooms'] if room['id'] == self.rooms[1].id)
+        self.assertEqual(room['last_cleaner']['id'], contract.employee_id)
+
+
+class OccupancyAnalyticsTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.suite = RoomType.objects.create(name='Люкс', capacity=2)
+        self.rooms = [
+            Room.objects.create(number=101, type=self.room_type, phone='101'),
+            Room.objects.create(number=102, type=self.room_type, phone='102'),
+            Room.objects.create(number=201, type=self.suite, phone='201'),
+        ]
+        self.guest = Client.objects.create(passport_number='0000000001', first_name='Иван', last_name='Иванов',
+                                           city_from='Москва')
+        stays = [
+            (0, date(2023, 12, 30), date(2024, 1, 3), 4000, 'CHECKED_OUT'),
+            (0, date(2024, 1, 2), date(2024, 1, 4), 3000, 'CHECKED_OUT'),
+            (1, date(2024, 1, 10), date(2024, 2, 2), 23000, 'CHECKED_IN'),
+            (2, date(2024, 1, 5), date(2024, 1, 8), 9000, 'BOOKED'),
+            (2, date(2024, 1, 20), date(2024, 1, 25), 50000, 'CANCELLED'),
+        ]
+        for room, arrival, departure, price, status in stays:
+            Reservation.objects.create(
+                room=self.rooms[room], client=self.guest, admin=self.user, arrival_date=arrival,
+                departure_date=departure, price_at_booking=price, final_price=price, status=status,
+            )
+
+    def naive(self, start, end, room_type=None):
+        # Подневный пересчёт по каждой комнате - эталон для векторного расчёта
+        rooms = [room for room in self.rooms if room_type is None or room.type_id == room_type.id]
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        occupied, revenue = 0, 0.0
+        for room in rooms:
+            stays = Reservation.objects.filter(room=room).exclude(status='CANCELLED')
+            for day in days:
+                active = [stay for stay in stays if stay.arrival_date <= day < stay.departure_date]
+                occupied += bool(active)
+                revenue += sum(stay.price_at_booking / (stay.departure_date - stay.arrival_date).days for stay in active)
+        return len(rooms) * len(days), occupied, round(revenue, 2)
+
+    def test_metrics_match_day_by_day_calculation(self):
+        response = self.client.get('/hotel/analytics/occupancy', {
+            'start_date': '2024-01-01', 'end_date': '2024-01-31', 'granularity': 'week',
+        })
+        self.assertEqual(response.status_code, 200)
+
+        periods = response.data['periods']
+        self.assertEqual([period['period_start'] for period in periods][:2], [date(2024, 1, 1), date(2024, 1, 8)])
+        self.assertEqual(periods[-1]['period_end'], date(2024, 1, 31))
+        for period in periods:
+            total = period['total']
+            expected = self.naive(period['period_start'], period['period_end'])
+            self.assertEqual(
+                (total['available_room_nights'], total['occupied_room_nights'], total['revenue']), expected
+            )
+            for room_type in (self.room_type, self.suite):
+                row = next(row for row in period['room_types'] if row['room_type_id'] == room_type.id)
+                expected = self.naive(period['period_start'], period['period_end'], room_type)
+                self.assertEqual(
+                    (row['available_room_nights'], row['occupied_room_nights'], row['revenue']), expected
+                )
+
+        first = periods[0]['total']
+        self.assertEqual(first['occupancy_rate'], round(first['occupied_room_nights'] / 21, 4))
+        self.assertEqual(first['revpar'], round(first['revenue'] / 21, 2))
+        self.assertEqual(first['adr'], round(first['revenue'] / first['occupied_room_nights'], 2))
+
+    def test_granularity_and_validation(self):
+        response = self.client.get('/hotel/analytics/occupancy', {'start_date': '2023-12-15', 'end_date': '2024-02-10'})
+        self.assertEqual(
+            [(period['period_start'], period['period_end']) for period in response.data['periods']],
+            [(date(2023, 12, 15), date(2023, 12, 31)), (date(2024, 1, 1), date(2024, 1, 31)),
+             (date(2024, 2, 1), date(2024, 2, 10))],
+        )
+        daily = self.client.get('/hotel/analytics/occupancy', {
+            'start_date': '2024-01-01', 'end_date': '2024-01-03', 'granularity': 'day',
+        })
+        self.assertEqual([period['total']['occupied_room_nights'] for period in daily.data['periods']], [1, 1, 1])
+
+        for params in [{'start_date': '2024-02-01', 'end_date': '2024-01-01'},
+                       {'start_date': '2000-01-01', 'end_date': '2024-01-01'},
+                       {'start_date': '2024-01-01', 'end_date': '2024-01-31', 'granularity': 'year'}]:
+            self.assertEqual(self.client.get('/hotel/analytics/occupancy', params).status_code, 422)
+
+
+class BulkReservationTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rooms = [Room.objects.create(number=101 + i, type=self.room_type, phone=str(101 + i)) for i in range(20)]
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2024, 1, 1), price=1000)
+        Client.objects.create(passport_number='0000000001', first_name='Старое', last_name='Имя', city_from='Омск')
+
+    def item(self, number, passport, arrival, departure, **extra):
+        return {
+            'passport_number': passport, 'first_name': 'Иван', 'last_name': 'Иванов', 'city_from': 'Москва',
+            'room_number': number, 'arrival_date': str(arrival), 'departure_date': str(departure), **extra,
+        }
+
+    def test_batch_creates_reservations_clients_and_rollup(self):
+        items = [
+            self.item(101, '0000000001', date(2024, 3, 1), date(2024, 3, 4), payment_status='PAID'),
+            self.item(101, '0000000002', date(2024, 3, 4), date(2024, 3, 6), status='CHECKED_IN'),
+            self.item(102, '0000000002', date(2024, 3, 1), date(2024, 3, 2), payment_status='PREPAID'),
+        ]
+        response = self.client.post('/hotel/reservations/bulk', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([row['price_at_booking'] for row in response.data['results']], [3000, 2000, 1000])
+
+        self.assertEqual(Client.objects.count(), 2)
+        self.assertEqual(Client.objects.get(passport_number='0000000001').first_name, 'Иван')
+        self.assertEqual(Reservation.objects.filter(client__passport_number='0000000002').count(), 2)
+        self.assertEqual(Room.objects.get(number=101).status, 'OCCUPIED')
+        self.assertEqual(Room.objects.get(number=102).status, 'AVAILABLE')
+
+        incremental = sorted(RoomDailyRollup.objects.values_list('date', 'room_id', 'reservations', 'nights', 'income'))
+        rebuild_rollup()
+        self.assertEqual(incremental, sorted(
+            RoomDailyRollup.objects.values_list('date', 'room_id', 'reservations', 'nights', 'income')
+        ))
+        self.assertEqual(
+            find_available_rooms(date(2024, 3, 1), date(2024, 3, 2)), [room.id for room in self.rooms[2:]]
+        )
+
+    def test_room_status_is_read_under_lock(self):
+        # Копии комнат в элементах пакета прочитаны до транзакции; к моменту импорта комнату 101 уже заняли,
+        # а 102 отправили на уборку - импорт опирается на строки, перечитанные под блокировкой
+        stale = {room.number: Room.objects.get(id=room.id) for room in self.rooms[:2]}
+        Room.objects.filter(number=101).update(status='OCCUPIED', version=F('version') + 1)
+        Room.objects.filter(number=102).update(status='REQUIRES_CLEANING', version=F('version') + 1)
+
+        items = [
+            {'passport_number': f'000000000{i}', 'first_name': 'Иван', 'last_name': 'Иванов', 'city_from': 'Москва',
+             'room': stale[number], 'arrival_date': date(2024, 3, 1), 'departure_date': date(2024, 3, 3),
+             'status': 'CHECKED_IN'}
+            for i, number in enumerate([101, 102], start=2)
+        ]
+        import_reservations(items, self.user)
+
+        self.assertEqual(list(Room.objects.filter(number__in=[101, 102]).order_by('number').values_list(
+            'status', 'version'
+        )), [('OCCUPIED', 2), ('OCCUPIED', 3)])
+
+    def test_errors_are_reported_per_item_and_nothing_is_written(self):
+        Reservation.objects.create(
+            room=self.rooms[2], client=Client.objects.get(), admin=self.user, arrival_date=date(2024, 3, 1),
+            departure_date=date(2024, 3, 5), price_at_booking=0, final_price=0,
+        )
+        items = [
+            self.item(101, '0000000002', date(2024, 3, 1), date(2024, 3, 4)),
+            self.item(101, '0000000003', date(2024, 3, 3), date(2024, 3, 5)),
+            self.item(103, '0000000004', date(2024, 3, 4), date(2024, 3, 6)),
+            self.item(104, '0000000005', date(2024, 3, 4), date(2024, 3, 6), status='CANCELLED'),
+            self.item(104, '0000000006', date(2024, 3, 4), date(2024, 3, 6)),
+        ]
+        response = self.client.post('/hotel/reservations/bulk', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 422)
+        errors = response.data['items']
+        self.assertEqual([bool(error) for error in errors], [True, True, True, False, False])
+        self.assertIn('элементом 1', errors[0]['room_number'])
+        self.assertIn('элементом 0', errors[1]['room_number'])
+        self.assertIn('бронированием', errors[2]['room_number'])
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(Client.objects.count(), 1)
+
+        for item, field in [(self.item(999, '0000000002', date(2024, 3, 1), date(2024, 3, 4)), 'room_number'),
+                            (self.item(101, '0000000002', date(2024, 3, 4), date(2024, 3, 1)), 'departure_date')]:
+            items = [self.item(105, '0000000007', date(2024, 3, 1), date(2024, 3, 4)), item]
+            response = self.client.post('/hotel/reservations/bulk', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 422)
+            self.assertEqual(response.data['items'][0], {})
+            self.assertIn(field, response.data['items'][1])
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        def import_batch(count, offset):
+            items = [
+                self.item(101 + i % 20, f'{offset + i:010d}', date(2025, 1, 1) + timedelta(days=offset + i // 20 * 3),
+                          date(2025, 1, 3) + timedelta(days=offset + i // 20 * 3), payment_status='PAID')
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post('/hotel/reservations/bulk', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(context.captured_queries)
+
+        # Число запросов растёт только с числом пачек INSERT (ограничение SQLite на параметры запроса)
+        import_batch(1, 0)
+        self.assertEqual(import_batch(20, 10), import_batch(40, 100))
+        self.assertLess(import_batch(500, 1000), 30)
+
+
+class OptimisticConcurrencyTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='101', status='OCCUPIED')
+        self.guest = Client.objects.create(passport_number='0000000001', first_name='Иван', last_name='Иванов',
+                                           city_from='Москва')
+        self.reservation = self.reserve(date(2024, 3, 1), date(2024, 3, 5), status='CHECKED_IN')
+
+    def reserve(self, arrival, departure, status='BOOKED', room=None):
+        return Reservation.objects.create(
+            room=room or self.room, client=self.guest, admin=self.user, arrival_date=arrival,
+            departure_date=departure, status=status, price_at_booking=0, final_price=0,
+        )
+
+    def test_stale_copy_is_not_saved(self):
+        first = Reservation.objects.get(id=self.reservation.id)
+        second = Reservation.objects.get(id=self.reservation.id)
+        first.payment_status = 'PAID'
+        first.save()
+        self.assertEqual(first.version, 2)
+
+        second.payment_status = 'REFUNDED'
+        with self.assertRaises(StaleVersionError), transaction.atomic():
+            second.save()
+        self.assertEqual(Reservation.objects.get(id=self.reservation.id).payment_status, 'PAID')
+
+    def test_patch_checks_if_match_and_saves_room_once(self):
+        url = f'/hotel/reservation/{self.reservation.id}'
+        response = self.client.patch(url, {'payment_status': 'PAID'}, format='json', HTTP_IF_MATCH='"5"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.data['version'], 1)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(url, {'status': 'CHECKED_OUT'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+        self.assertEqual(response.data['version'], 2)
+        room_updates = [query for query in context.captured_queries
+                        if query['sql'].startswith('UPDATE "hotel_app_room"')]
+        self.assertEqual(len(room_updates), 1)
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.status, self.room.version), ('REQUIRES_CLEANING', 2))
+
+        response = self.client.patch(url, {'payment_status': 'PAID'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 412)
+        response = self.client.patch(url, {'payment_status': 'PAID'}, format='json', HTTP_IF_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+
+    def test_room_conflicts_are_reported_separately(self):
+        Room.objects.create(number=102, type=self.room_type, phone='102')
+        save = Room.save
+
+        def concurrent_save(room, *args, **kwargs):
+            # Другой запрос успевает изменить комнату между чтением и записью
+            Room.objects.filter(pk=room.pk).update(version=F('version') + 1)
+            save(room, *args, **kwargs)
+
+        with mock.patch.object(Room, 'save', concurrent_save):
+            response = self.client.patch(f'/hotel/reservation/{self.reservation.id}', {'room_number': 102},
+                                         format='json', HTTP_IF_MATCH='"1"')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual((response.data['room_number'], response.data['room_version']), (101, 1))
+            self.assertNotIn('version', response.data)
+
+            response = self.client.post('/hotel/reservation', {
+                'passport_number': '0000000002', 'first_name': 'Пётр', 'last_name': 'Петров', 'city_from': 'Омск',
+                'room_number': 102, 'arrival_date': '2024-03-01', 'departure_date': '2024-03-03',
+            }, format='json')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data['room_number'], 102)
+
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(Room.objects.get(number=102).status, 'AVAILABLE')
+
+    def test_database_rejects_double_booking(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.reserve(date(2024, 3, 4), date(2024, 3, 6))
+
+        # Отменённые бронирования и соседние периоды не конфликтуют
+        self.reserve(date(2024, 3, 2), date(2024, 3, 3), status='CANCELLED')
+        later = self.reserve(date(2024, 3, 5), date(2024, 3, 7))
+
+        later.arrival_date = date(2024, 3, 4)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            later.save()
+
+        response = self.client.patch(f'/hotel/reservation/{later.id}', {'arrival_date': '2024-03-03'}, format='json')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('room_number', response.data)
+
+
+class DatabaseObjectTests(HotelTestCase):
+
+    def database_errors(self):
+        return [error.id for error in checks.run_checks(tags=[checks.Tags.database], databases=['default'])]
+
+    def test_objects_exist_after_migrate(self):
+        self.assertEqual(missing_database_objects(), {})
+        self.assertEqual(self.database_errors(), [])
+
+    def test_post_migrate_restores_objects_lost_in_table_rebuild(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Пересоздание таблиц при миграциях - особенность SQLite')
+
+        # Так SQLite выполняет AlterField/RemoveField: новая таблица, копирование строк, удаление старой
+        with connection.schema_editor() as schema_editor:
+            schema_editor._remake_table(Reservation)
+            schema_editor._remake_table(Client)
+        self.assertEqual(sorted(missing_database_objects()), ['client_search', 'reservation_room_no_overlap'])
+        self.assertEqual(self.database_errors(), ['hotel_app.E002', 'hotel_app.E002'])
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        self.assertEqual(missing_database_objects(), {})
+
+        room = Room.objects.create(number=101, type=self.room_type, phone='101')
+        guest = Client.objects.create(passport_number='0000000001', first_name='Иван', last_name='Щукин',
+                                      city_from='Москва')
+        self.assertEqual(
+            [client['id'] for client in self.client.get('/hotel/clients/search', {'q': 'щук'}).data['clients']],
+            [guest.id]
+        )
+        Reservation.objects.create(room=room, client=guest, admin=self.user, arrival_date=date(2024, 3, 1),
+                                   departure_date=date(2024, 3, 5), price_at_booking=0, final_price=0)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reservation.objects.create(room=room, client=guest, admin=self.user, arrival_date=date(2024, 3, 4),
+                                       departure_date=date(2024, 3, 6), price_at_booking=0, final_price=0)
+
+
+class ClientsListTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rooms = self.create_rooms(3)
+        for i in range(5):
+            Client.objects.create(passport_number=f'K{i:09d}', first_name='Ильдар', last_name=f'Сафин{i}',
+                                  city_from='Казань')
+
+    def test_filters_return_page_and_total_in_one_query(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/hotel/clients', {'city': 'Казань', 'limit': 2, 'offset': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('OVER ()', context.captured_queries[0]['sql'])
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([client['last_name'] for client in response.data['clients']], ['Сафин1', 'Сафин2'])
+        self.assertIn('offset=3', response.data['next'])
+        self.assertIn('limit=2', response.data['previous'])
+
+        response = self.client.get('/hotel/clients', {'room': 102, 'start_date': '2024-01-04', 'end_date': '2024-02-01'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['clients'][0]['passport_number'], f'{102:010d}')
+        self.assertEqual(self.client.get('/hotel/clients', {'room': 102, 'start_date': '2024-01-06'}).status_code, 404)
+        self.assertEqual(self.client.get('/hotel/clients', {'room': 999}).status_code, 404)
+
+    def test_offset_past_the_end_keeps_total(self):
+        response = self.client.get('/hotel/clients', {'city': 'Казань', 'offset': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['clients'], [])
+
+    def test_following_next_reaches_clients_beyond_first_page(self):
+        # Так экран клиентов догружает список по кнопке «Загрузить ещё»
+        Client.objects.bulk_create([
+            Client(passport_number=f'T{i:09d}', first_name='Тимур', last_name=f'Ягудин{i:03d}', city_from='Казань')
+            for i in range(120)
+        ])
+        response = self.client.get('/hotel/clients', {'city': 'Казань', 'limit': 100})
+        pages, names = 1, [client['last_name'] for client in response.data['clients']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, 200)
+            names.extend(client['last_name'] for client in response.data['clients'])
+            pages += 1
+
+        self.assertEqual(pages, 2)
+        self.assertEqual(len(names), 125)
+        self.assertEqual(names[-1], 'Ягудин119')
+
+
+class ClientSearchTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        people = [
+            ('4510000001', 'Иван', 'Иванов', 'Москва'),
+            ('4510000002', 'Пётр', 'Сидоров', 'Ивантеевка'),
+            ('4620000003', 'Анна', 'Иванова', 'Казань'),
+            ('4620000004', 'Мария', 'Петрова', 'Москва'),
+        ]
+        self.clients = {
+            last_name: Client.objects.create(passport_number=passport, first_name=first_name, last_name=last_name,
+                                             city_from=city)
+            for passport, first_name, last_name, city in people
+        }
+
+    def search(self, query, **params):
+        return self.client.get('/hotel/clients/search', {'q': query, **params})
+
+    def surnames(self, query, **params):
+        return [client['last_name'] for client in self.search(query, **params).data['clients']]
+
+    def test_results_are_ranked_prefix_matches(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.search('иван')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        # Совпадения по фамилии выше совпадения по городу
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([client['last_name'] for client in response.data['clients']][-1], 'Сидоров')
+
+        self.assertEqual(self.surnames('Иван Каз'), ['Иванова'])
+        self.assertEqual(sorted(self.surnames('4620')), ['Иванова', 'Петрова'])
+        self.assertEqual(len(self.surnames('иван', limit=1)), 1)
+        self.assertEqual(self.search('Смирнов').status_code, 404)
+        self.assertEqual(self.search('  ,. ').status_code, 422)
+
+    def test_response_reports_incomplete_ranking(self):
+        self.assertTrue(self.search('иван').data['ranking_complete'])
+        with mock.patch('hotel_app.search.SQLITE_SQL', search.SQLITE_SQL.replace(f'LIMIT {search.SQLITE_CANDIDATES}', 'LIMIT 2')), \
+                mock.patch('hotel_app.search.SQLITE_CANDIDATES', 2):
+            self.assertFalse(self.search('иван').data['ranking_complete'])
+
+    def test_index_follows_changes(self):
+        client = self.clients['Петрова']
+        client.last_name = 'Смирнова'
+        client.save()
+        self.assertEqual(self.surnames('смирн'), ['Смирнова'])
+        self.assertEqual(self.search('Петрова').status_code, 404)
+
+        self.clients['Сидоров'].delete()
+        self.assertEqual(self.search('Ивантеевка').status_code, 404)
+
+        # Пакетная загрузка клиентов обходит сигналы, но не триггеры индекса
+        Client.objects.bulk_create([
+            Client(passport_number='4620000003', first_name='Анна', last_name='Кузнецова', city_from='Казань'),
+            Client(passport_number='4700000005', first_name='Олег', last_name='Кузнецов', city_from='Тверь'),
+        ], update_conflicts=True, unique_fields=['passport_number'], update_fields=['last_name'])
+        self.assertEqual(sorted(self.surnames('кузн')), ['Кузнецов', 'Кузнецова'])
+        self.assertEqual(self.surnames('Иванов'), ['Иванов'])
+
+
+class CleaningScheduleManagementTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rooms = self.create_rooms(2)
+        # Завершённый контракт сдвигает id активного контракта относительно id сотрудника
+        self.employee = Employee.objects.create(passport_number='E000000999', first_name='Олег', last_name='Котов')
+        EmploymentContract.objects.create(employee=self.employee, position=self.position, contract_type='PERMANENT',
+                                          start_date=date(2022, 1, 1), is_active=False)
+        self.contract = EmploymentContract.objects.create(employee=self.employee, position=self.position,
+                                                          contract_type='PERMANENT', start_date=date(2023, 1, 1))
+        self.assertNotEqual(self.contract.id, self.employee.id)
+
+    def update(self, **data):
+        return self.client.patch('/hotel/cleaning-schedules/manage', {
+            'cleaner_id': self.employee.id,
+            'room_ids': [room.number for room in self.rooms],
+            **data,
+        }, format='json')
+
+    def schedules(self):
+        return CleaningSchedule.objects.filter(cleaner=self.contract).order_by('room_id', 'cleaning_date')
+
+    def test_only_missing_rows_are_inserted(self):
+        response = self.update(cleaning_dates=['2024-03-01', '2024-03-02'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['deleted'], response.data['unchanged']), (4, 0, 0))
+        self.assertEqual(self.schedules().count(), 4)
+
+        completed = self.schedules().first()
+        completed.status = 'COMPLETED'
+        completed.save()
+        ids = set(self.schedules().values_list('id', flat=True))
+
+        response = self.update(cleaning_dates=['2024-03-01', '2024-03-02', '2024-03-03', '2024-03-01'])
+        self.assertEqual((response.data['created'], response.data['deleted'], response.data['unchanged']), (2, 0, 4))
+        self.assertTrue(ids <= set(self.schedules().values_list('id', flat=True)))
+        self.assertEqual(CleaningSchedule.objects.get(id=completed.id).status, 'COMPLETED')
+
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            CleaningSchedule.objects.create(cleaner=self.contract, room=self.rooms[0], cleaning_date=date(2024, 3, 1))
+
+    def test_month_template_replaces_month_schedule(self):
+        outside = CleaningSchedule.objects.create(cleaner=self.contract, room=self.rooms[0],
+                                                  cleaning_date=date(2024, 3, 1))
+        friday = CleaningSchedule.objects.create(cleaner=self.contract, room=self.rooms[0],
+                                                 cleaning_date=date(2024, 2, 2))
+        monday = CleaningSchedule.objects.create(cleaner=self.contract, room=self.rooms[0],
+                                                 cleaning_date=date(2024, 2, 5))
+        others = CleaningSchedule.objects.exclude(cleaner=self.contract).count()
+
+        response = self.update(template={'month': '2024-02', 'days_of_week': ['monday', 'THURSDAY']})
+        self.assertEqual(response.status_code, 200)
+        # Февраль 2024: понедельники 5, 12, 19, 26 и четверги 1, 8, 15, 22, 29
+        self.assertEqual((response.data['created'], response.data['deleted'], response.data['unchanged']), (17, 1, 1))
+        self.assertFalse(CleaningSchedule.objects.filter(id=friday.id).exists())
+        self.assertEqual(CleaningSchedule.objects.filter(id__in=[outside.id, monday.id]).count(), 2)
+        self.assertEqual(CleaningSchedule.objects.exclude(cleaner=self.contract).count(), others)
+        self.assertEqual(
+            sorted({schedule.cleaning_date.day for schedule in self.schedules() if schedule.cleaning_date.month == 2}),
+            [1, 5, 8, 12, 15, 19, 22, 26, 29],
+        )
+
+        response = self.update(template={'month': '2024-02', 'days_of_week': ['MONDAY', 'THURSDAY']})
+        self.assertEqual((response.data['created'], response.data['deleted'], response.data['unchanged']), (0, 0, 18))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.update().status_code, 422)
+        self.assertEqual(self.update(cleaning_dates=['2024-03-01'],
+                                     template={'month': '2024-03', 'days_of_week': ['MONDAY']}).status_code, 422)
+        self.assertEqual(self.update(template={'month': '2024-03', 'days_of_week': ['FUNDAY']}).status_code, 422)
+        self.assertEqual(self.update(template={'month': '2024-13', 'days_of_week': ['MONDAY']}).status_code, 422)
+        response = self.update(cleaning_dates=['2024-03-01'], room_ids=[999])
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('room_ids', response.data)
+        self.assertFalse(self.schedules().exists())
+
+
+class HousekeepingSchedulerTests(HotelTestCase):
+
+    def test_assignment_is_balanced_and_keeps_floors_together(self):
+        rooms = [(number, number) for floor in range(1, 21) for number in range(floor * 100 + 1, floor * 100 + 51)]
+        assignments, unassigned = assign_rooms(rooms, list(range(100)), capacity=20)
+        self.assertEqual(unassigned, [])
+        loads = [len(assigned) for assigned in assignments.values()]
+        self.assertEqual(sum(loads), 1000)
+        self.assertEqual((min(loads), max(loads)), (10, 10))
+        self.assertLessEqual(max(len({room_floor(number) for _, number in assigned})
+                                 for assigned in assignments.values()), 2)
+
+    def test_capacity_and_existing_load_are_respected(self):
+        rooms = [(number, number) for number in range(101, 131)]
+        assignments, unassigned = assign_rooms(rooms, ['a', 'b'], capacity=10)
+        self.assertEqual([len(assignments['a']), len(assignments['b'])], [10, 10])
+        self.assertEqual([number for _, number in unassigned], list(range(121, 131)))
+
+        assignments, unassigned = assign_rooms(rooms[:10], ['a', 'b'], capacity=10, loads={'a': 8})
+        self.assertEqual([len(assignments['a']), len(assignments['b'])], [1, 9])
+        self.assertEqual(unassigned, [])
+
+    def test_excluded_pairs_go_to_other_cleaners(self):
+        rooms = [(number, number) for number in range(101, 105)]
+        assignments, unassigned = assign_rooms(rooms, ['a', 'b'], capacity=2, excluded={('a', 101), ('b', 104)})
+        self.assertEqual(dict(assignments), {'a': [(102, 102), (104, 104)], 'b': [(103, 103), (101, 101)]})
+        self.assertEqual(unassigned, [])
+
+        assignments, unassigned = assign_rooms(rooms, ['a'], capacity=10, excluded={('a', 101)})
+        self.assertEqual(assignments['a'], rooms[1:])
+        self.assertEqual(unassigned, [(101, 101)])
+
+    def test_room_cleaned_today_is_not_reassigned_to_same_cleaner(self):
+        rooms = self.create_rooms(2)
+        Room.objects.filter(id__in=[room.id for room in rooms]).update(status='REQUIRES_CLEANING')
+        maids = EmployeePosition.objects.create(name='Горничная', salary=35000)
+        employee = Employee.objects.create(passport_number='M000000000', first_name='Мария', last_name='Котова')
+        contract = EmploymentContract.objects.create(employee=employee, position=maids, contract_type='PERMANENT',
+                                                     start_date=date(2023, 1, 1))
+        CleaningSchedule.objects.create(cleaner=contract, room=rooms[0], cleaning_date=date(2024, 3, 1),
+                                        status='COMPLETED')
+
+        response = self.client.post('/hotel/cleaning-schedules/auto-assign',
+                                    {'cleaning_date': '2024-03-01', 'position_id': maids.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['assigned'], 1)
+        self.assertEqual(response.data['assignments'], [{'employee_id': employee.id, 'room_numbers': [102]}])
+        self.assertEqual(response.data['unassigned_room_numbers'], [101])
+        self.assertEqual(CleaningSchedule.objects.filter(cleaner=contract, cleaning_date=date(2024, 3, 1)).count(), 2)
+
+    def test_endpoint_assigns_rooms_needing_cleaning(self):
+        rooms = self.create_rooms(3) + self.create_rooms(3, start_number=201)
+        Room.objects.filter(id__in=[room.id for room in rooms]).update(status='REQUIRES_CLEANING')
+        Room.objects.filter(number=103).update(status='AVAILABLE')
+        maids = EmployeePosition.objects.create(name='Горничная', salary=35000)
+        employees = []
+        for i in range(2):
+            employee = Employee.objects.create(passport_number=f'M{i:09d}', first_name='Мария', last_name='Котова')
+            EmploymentContract.objects.create(employee=employee, position=maids, contract_type='PERMANENT',
+                                              start_date=date(2023, 1, 1))
+            employees.append(employee)
+        # Уборка комнаты 201 на этот день уже запланирована
+        CleaningSchedule.objects.create(cleaner=EmploymentContract.objects.first(), room=rooms[3],
+                                        cleaning_date=date(2024, 3, 1))
+
+        url = '/hotel/cleaning-schedules/auto-assign'
+        response = self.client.post(url, {'cleaning_date': '2024-03-01', 'position_id': maids.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['rooms'], response.data['cleaners'], response.data['assigned']), (4, 2, 4))
+        self.assertEqual(response.data['assignments'], [
+            {'employee_id': employees[0].id, 'room_numbers': [101, 102]},
+            {'employee_id': employees[1].id, 'room_numbers': [202, 203]},
+        ])
+        self.assertEqual(CleaningSchedule.objects.filter(cleaner__position=maids, cleaning_date=date(2024, 3, 1),
+                                                         cleaner__employee__in=employees).count(), 4)
+
+        response = self.client.post(url, {'cleaning_date': '2024-03-01'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.post(url, {'position_id': 999}, format='json').status_code, 422)
+
+
+class MetricsTests(HotelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_rooms(3)
+        reset_metrics()
+
+    def metrics(self):
+        response = self.client.get('/hotel/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return dict(line.rsplit(' ', 1) for line in response.content.decode().splitlines() if not line.startswith('#'))
+
+    def test_requests_and_queries_are_counted_per_route(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/hotel/rooms?status=OCCUPIED')
+            self.client.get('/hotel/rooms?status=AVAILABLE')
+        rooms_queries = len(context.captured_queries)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/hotel/api/rooms/')
+        viewset_queries = len(context.captured_queries)
+        self.client.get('/hotel/rooms?status=UNKNOWN')
+        self.client.get('/hotel/no-such-page')
+
+        metrics = self.metrics()
+        self.assertEqual(metrics['hotel_http_requests_total{endpoint="available-rooms-count",method="GET",status="200"}'], '2')
+        self.assertEqual(metrics['hotel_http_requests_total{endpoint="available-rooms-count",method="GET",status="422"}'], '1')
+        self.assertEqual(metrics['hotel_http_requests_total{endpoint="room-list",method="GET",status="200"}'], '1')
+        self.assertEqual(metrics['hotel_http_requests_total{endpoint="unmatched",method="GET",status="404"}'], '1')
+        self.assertEqual(metrics['hotel_http_request_duration_seconds_count{endpoint="available-rooms-count"}'], '3')
+        self.assertEqual(metrics['hotel_http_request_duration_seconds_bucket{endpoint="available-rooms-count",le="+Inf"}'], '3')
+        self.assertEqual(metrics['hotel_sql_queries_total{endpoint="room-list"}'], str(viewset_queries))
+        self.assertGreater(float(metrics['hotel_sql_duration_seconds_total{endpoint="room-list"}']), 0)
+        self.assertGreaterEqual(int(metrics['hotel_sql_queries_total{endpoint="available-rooms-count"}']), rooms_queries)
+
+
+class SyntheticDataTests(APITestCase):
+
+    def setUp(self):
+        clear_caches()
+        reset_availability_index()
+
+    def test_generated_stays_do_not_overlap(self):
+        call_command('generate_hotel_data', rooms=12, clients=50, reservations=600, years=1, batch_size=100,
+                     stdout=io.StringIO())
+
+        self.assertEqual(Room.objects.count(), 12)
+        self.assertEqual(Client.objects.count(), 50)
+        self.assertEqual(Reservation.objects.count(), 600)
+        self.assertTrue(Reservation.objects.filter(status='CHECKED_OUT').exists())
+
+        for room in Room.objects.all():
+            stays = list(Reservation.objects.filter(room=room).exclude(status='CANCELLED')
+                         .order_by('arrival_date').values_list('arrival_date', 'departure_date'))
+            for (_, departure_date), (arrival_date, _) in zip(stays, stays[1:]):
+                self.assertLessEqual(departure_date, arrival_date)
+
+        # Уборка каждой комнаты - раз в день, сводка совпадает с бронированиями
+        self.assertFalse(CleaningSchedule.objects.values('room', 'cleaning_date').annotate(count=Count('id'))
+                         .filter(count__gt=1).exists())
+        self.assertEqual(CleaningSchedule.objects.values('cleaning_date').distinct().count(), 365 + 8)
+        nights = sum((departure_date - arrival_date).days for arrival_date, departure_date in
+                     Reservation.objects.filter(status__in=COUNTED_STATUSES).values_list('arrival_date', 'departure_date'))
+        self.assertEqual(RoomDailyRollup.objects.aggregate(total=Sum('nights'))['total'], nights)
+
+        with self.assertRaises(CommandError):
+            call_command('generate_hotel_data', rooms=1, clients=1, reservations=1, stdout=io.StringIO())
+
+
+def query_origin():
+    # Ближайший к запросу кадр кода приложения: метод сериализатора, представления или модуля, выполнивший SQL.
+    # Обёртки execute_wrapper (счётчик метрик, тесты) пропускаются
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and os.path.basename(filename) not in ('tests.py', 'metrics.py'):
+            owner = frame.f_locals.get('self')
+            name = frame.f_code.co_name if owner is None else f'{type(owner).__name__}.{frame.f_code.co_name}'
+            return f'{os.path.basename(filename)}:{name}'
+        frame = frame.f_back
+    return 'django'
+
+
+APP_DIR = os.path.dirname(os.path.abspath(hotel_urls.__file__))
+
+
+@override_settings(HOTEL_REPORT_JOBS_EAGER=True)
+class EndpointQueryBudgetTests(HotelTestCase):
+    # Число SQL-запросов каждого маршрута hotel_app/urls.py (вместе с маршрутами роутера) не должно зависеть
+    # от объёма данных: запросы выполняются на маленьком наборе и после его увеличения в несколько раз.
+    # Для маршрутов роутера проверяются список и карточка, для остальных - их методы.
+    # Перед каждым запросом кэши сбрасываются, чтобы ответ строился заново
+
+    def setUp(self):
+        super().setUp()
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2023, 1, 1), price=1000)
+        self.maids = EmployeePosition.objects.create(name='Горничная', salary=35000)
+
+    def seed(self, stage):
+        # stage 0 - маленький набор, stage 1 - добавка, после которой данных в несколько раз больше
+        rooms = self.create_rooms(2) if stage == 0 else self.create_rooms(10, start_number=201)
+        Room.objects.create(number=901 + stage, type=self.room_type, phone='901')
+        Room.objects.create(number=951 + stage, type=self.room_type, phone='951', status='REQUIRES_CLEANING')
+        for i in range(1 + 4 * stage):
+            employee = Employee.objects.create(passport_number=f'M{stage}{i:08d}', first_name='Мария', last_name='Котова')
+            EmploymentContract.objects.create(employee=employee, position=self.maids, contract_type='PERMANENT',
+                                              start_date=date(2023, 1, 1))
+        # У первого гостя растёт история проживаний
+        guest = Reservation.objects.order_by('id').first().client
+        for i in range(1 + 5 * stage):
+            Reservation.objects.create(
+                room=rooms[i % len(rooms)], client=guest, admin=self.user, status='CHECKED_OUT',
+                arrival_date=date(2023, 1, 1) + timedelta(days=10 * (i + 10 * stage)),
+                departure_date=date(2023, 1, 3) + timedelta(days=10 * (i + 10 * stage)),
+                price_at_booking=2000, final_price=2000,
+            )
+
+    def requests(self, stage):
+        # (маршрут, метод, адрес, данные, ожидаемый статус). Адрес-функция вызывается после сброса кэшей:
+        # задачи отчётов хранятся в кэше
+        reservation = Reservation.objects.filter(status='CHECKED_IN').order_by('id')[stage]
+        client_ids = ','.join(str(client_id) for client_id in Client.objects.values_list('id', flat=True))
+        room_numbers = list(Room.objects.order_by('number').values_list('number', flat=True))
+        employee = Employee.objects.get(passport_number=f'E{101 + stage:09d}')
+        stay = {'arrival_date': f'2024-0{6 + stage}-01', 'departure_date': f'2024-0{6 + stage}-04'}
+        # Поиск свободных номеров принимает только даты в окне индекса вокруг текущего дня
+        upcoming = date.today() + timedelta(days=10 + stage)
+        search = {'arrival_date': upcoming, 'departure_date': upcoming + timedelta(days=3)}
+        guest = {'first_name': 'Пётр', 'last_name': 'Сидоров', 'city_from': 'Омск'}
+        details = {
+            'client': Client.objects.order_by('id').first().id,
+            'room': reservation.room_id,
+            'reservation': reservation.id,
+            'employee': employee.id,
+            'employee-contracts': EmploymentContract.objects.order_by('id').first().id,
+            'employee-position': self.position.id,
+            'cleaning-schedule': CleaningSchedule.objects.order_by('id').first().id,
+        }
+        prefixes = {
+            'client': 'clients', 'room': 'rooms', 'reservation': 'reservations', 'employee': 'employees',
+            'employee-contracts': 'employment-contracts', 'employee-position': 'positions',
+            'cleaning-schedule': 'cleaning-schedules',
+        }
+
+        requests = [
+            ('hello-world', 'get', '/hotel/health', {}, 200),
+            ('api-root', 'get', '/hotel/', {}, 200),
+            ('clients-list', 'get', '/hotel/clients', {'start_date': '2023-01-01', 'city': 'Москва'}, 200),
+            ('client-search', 'get', '/hotel/clients/search', {'q': 'Иван'}, 200),
+            ('available-rooms-count', 'get', '/hotel/rooms', {'status': 'OCCUPIED,AVAILABLE'}, 200),
+            ('available-rooms', 'get', '/hotel/rooms/available', search, 200),
+            ('client-stay-overlap', 'get', '/hotel/clients/stay-overlap', {'client_id': reservation.client_id}, 200),
+            ('client-stay-overlap-batch', 'get', '/hotel/clients/stay-overlap/batch', {'client_ids': client_ids}, 200),
+            ('client-room-cleaning', 'get', '/hotel/clients/room-cleaner',
+             {'client_id': reservation.client_id, 'day_of_week': 'MONDAY'}, 200),
+            ('employee-management', 'post', '/hotel/employees/manage', {
+                'passport_number': f'H{stage:09d}', 'first_name': 'Олег', 'last_name': 'Котов',
+                'position_id': self.position.id, 'contract_type': 'PERMANENT', 'start_date': '2024-01-01',
+            }, 201),
+            # UpdateEmployeeSerializer.validate проверяет поля new_* вместо переданных и отклоняет любое изменение,
+            # поэтому для PATCH измеряется путь валидации
+            ('employee-management', 'patch', '/hotel/employees/manage',
+             {'employee_id': employee.id, 'first_name': 'Анна'}, 422),
+            ('employee-management', 'delete', '/hotel/employees/manage', {'employee_id': employee.id}, 200),
+            ('update-cleaning-schedule', 'patch', '/hotel/cleaning-schedules/manage', {
+                'cleaner_id': Employee.objects.get(passport_number='M000000000').id,
+                'room_ids': room_numbers, 'cleaning_dates': [f'2024-0{3 + stage}-01', f'2024-0{3 + stage}-02'],
+            }, 200),
+            ('auto-assign-cleaning', 'post', '/hotel/cleaning-schedules/auto-assign',
+             {'cleaning_date': f'2024-0{4 + stage}-01', 'position_id': self.maids.id}, 201),
+            ('create-reservation', 'post', '/hotel/reservation',
+             {'passport_number': f'R{stage:09d}', 'room_number': 901 + stage, **guest, **stay}, 201),
+            ('update-reservation', 'patch', f'/hotel/reservation/{reservation.id}', {'payment_status': 'PAID'}, 200),
+            ('bulk-reservations', 'post', '/hotel/reservations/bulk', {'items': [
+                {'passport_number': f'B{stage}{i:08d}', 'room_number': 901, **guest,
+                 'arrival_date': f'2024-{9 + stage}-{1 + 5 * i:02d}', 'departure_date': f'2024-{9 + stage}-{3 + 5 * i:02d}'}
+                for i in range(3)
+            ]}, 201),
+            ('pricing-quote', 'post', '/hotel/pricing/quote',
+             {'items': [{'room_number': number, **search} for number in room_numbers[:2]]}, 200),
+            ('quarterly-report', 'get', '/hotel/reports/quarterly', {'quarter': 1, 'year': 2024}, 200),
+            ('range-report', 'get', '/hotel/reports/range', {'start_date': '2023-01-01', 'end_date': '2024-03-31'}, 200),
+            ('occupancy-analytics', 'get', '/hotel/analytics/occupancy',
+             {'start_date': '2024-01-01', 'end_date': '2024-01-31', 'granularity': 'day'}, 200),
+            ('report-jobs', 'post', '/hotel/reports/jobs', {'report_type': 'QUARTERLY', 'quarter': 1, 'year': 2024}, 202),
+            ('report-job-detail', 'get', self.report_job_url, {}, 200),
+            ('export-reservations', 'get', '/hotel/export/reservations', {}, 200),
+            ('export-clients', 'get', '/hotel/export/clients', {}, 200),
+            ('response-cache-stats', 'get', '/hotel/cache/stats', {}, 200),
+            ('metrics', 'get', '/hotel/metrics', {}, 200),
+        ]
+        for basename, object_id in details.items():
+            requests.append((f'{basename}-list', 'get', f'/hotel/api/{prefixes[basename]}/', {}, 200))
+            requests.append((f'{basename}-detail', 'get', f'/hotel/api/{prefixes[basename]}/{object_id}/', {}, 200))
+        return requests
+
+    def report_job_url(self):
+        response = self.client.post('/hotel/reports/jobs', {'report_type': 'YEARLY', 'year': 2024}, format='json')
+        return f"/hotel/reports/jobs/{response.json()['id']}"
+
+    def measure(self, name, method, url, data, expected_status):
+        clear_caches()
+        reset_price_calendars()
+        reset_availability_index()
+        if callable(url):
+            url = url()
+        origins = Counter()
+
+        def record(execute, sql, params, many, context):
+            origins[query_origin()] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            if method == 'get':
+                response = self.client.get(url, data)
+            else:
+                response = getattr(self.client, method)(url, data, format='json')
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertEqual(response.status_code, expected_status, f'{method.upper()} {name}: {body[:300]}')
+        return origins
+
+    def test_every_route_is_measured(self):
+        self.seed(0)
+        routes = {pattern.name for pattern in hotel_urls.urlpatterns if pattern.name}
+        self.assertEqual(routes - {name for name, *_ in self.requests(0)}, set())
+
+    def test_query_count_does_not_depend_on_data_size(self):
+        budgets = {}
+        for stage in (0, 1):
+            self.seed(stage)
+            for name, method, url, data, expected_status in self.requests(stage):
+                budgets.setdefault((name, method.upper()), []).append(
+                    self.measure(name, method, url, data, expected_status)
+                )
+
+        # Таблица печатается всегда: при регрессии в последней колонке - методы, число запросов которых выросло
+        lines = [f"{'маршрут':<28} {'метод':<7} {'мало':>5} {'много':>6}  источник"]
+        regressions = []
+        for (name, method), (small, large) in budgets.items():
+            grown = [f'{origin} {small[origin]}->{large[origin]}' for origin in sorted(small.keys() | large.keys())
+                     if small[origin] != large[origin]]
+            if grown:
+                regressions.append(f'{method} {name}: ' + ', '.join(grown))
+            source = ', '.join(grown) or ', '.join(origin for origin, _ in large.most_common(2))
+            lines.append(f'{name:<28} {method:<7} {small.total():>5} {large.total():>6}  {source}')
+        sys.stdout.write('\n' + '\n'.join(lines) + '\n')
+
+        self.assertEqual(regressions, [])
+
+
+class TokenAuthenticationCacheTests(APITestCase):
+
+    def setUp(self):
+        clear_caches()
+        reset_token_cache()
+        self.user = User.objects.create_user(username='admin', password='admin')
+        self.authorize(Token.objects.create(user=self.user))
+
+    def authorize(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def get(self, expected_status=200):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/hotel/metrics')
+        self.assertEqual(response.status_code, expected_status)
+        return len(context.captured_queries)
+
+    def test_token_is_checked_in_database_once(self):
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 0)
+
+    def test_logout_and_deactivation_revoke_cached_token(self):
+        self.get()
+        self.assertEqual(self.client.post('/auth/token/logout/').status_code, 204)
+        self.get(expected_status=401)
+
+        self.authorize(Token.objects.create(user=self.user))
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        self.get(expected_status=401)
+
+    @override_settings(HOTEL_AUTH_TOKEN_SHARED_CACHE='default')
+    def test_shared_cache_is_used_by_other_processes(self):
+        self.assertEqual(self.get(), 1)
+        # Пустой LRU - как в другом процессе
+        reset_token_cache()
+        self.assertEqual(self.get(), 0)
+
+        Token.objects.filter(user=self.user).delete()
+        reset_token_cache()
+        self.get(expected_status=401)
+
+    def test_group_and_permission_changes_revoke_cached_token(self):
+        self.get()
+        group = Group.objects.create(name='managers')
+        self.user.groups.add(group)
+        self.assertEqual(self.get(), 1)
+        group.user_set.clear()
+        self.assertEqual(self.get(), 1)
+        self.user.user_permissions.add(Permission.objects.get(codename='view_room'))
+        self.assertEqual(self.get(), 1)
+
+    def test_each_request_gets_own_user_instance(self):
+        key = Token.objects.get(user=self.user).key
+        first, _ = CachedTokenAuthentication().authenticate_credentials(key)
+        first._perm_cache = {'hotel_app.view_room'}
+        second, token = CachedTokenAuthentication().authenticate_credentials(key)
+        self.assertIsNot(first, second)
+        self.assertIs(token.user, second)
+        self.assertFalse(hasattr(second, '_perm_cache'))
+
+    @override_settings(HOTEL_AUTH_TOKEN_SHARED_CACHE='default')
+    def test_token_revoked_during_check_is_not_cached(self):
+        key = Token.objects.get(user=self.user).key
+        check = TokenAuthentication.authenticate_credentials
+
+        def revoked_during_check(authentication, token_key):
+            result = check(authentication, token_key)
+            invalidate_tokens([token_key])
+            return result
+
+        with mock.patch.object(TokenAuthentication, 'authenticate_credentials', revoked_during_check):
+            self.get()
+        # Запись, сохранённая после сброса, не действует ни в этом процессе, ни в других
+        self.assertEqual(self.get(), 1)
+        reset_token_cache()
+        self.assertEqual(self.get(), 0)
+        reset_token_cache()
+        invalidate_tokens([key])
+        self.assertEqual(self.get(), 1)
+
+    @override_settings(HOTEL_AUTH_TOKEN_CACHE_SIZE=1)
+    def test_least_recently_used_token_is_evicted(self):
+        first = Token.objects.get(user=self.user)
+        second = Token.objects.create(user=User.objects.create_user(username='manager', password='manager'))
+        self.assertEqual(self.get(), 1)
+        self.authorize(second)
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 0)
+        self.authorize(first)
+        self.assertEqual(self.get(), 1)
+
+
+class ReplicaRoutingTests(APITransactionTestCase):
+    # Реплику изображает вторая локальная база: данные в неё не реплицируются, поэтому по числу запросов
+    # к каждой базе и по содержимому ответа видно, откуда читал запрос
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        clear_caches()
+        reset_replica_state()
+        with routing_scope():
+            self.user = User.objects.create_user(username='admin', password='admin')
+            room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+            Room.objects.create(number=101, type=room_type, phone='101')
+        self.client.force_authenticate(user=self.user)
+
+    def request(self, method, url, data=None):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, len(primary.captured_queries), len(replica.captured_queries)
+
+    def report(self):
+        return self.request('get', '/hotel/reports/range?start_date=2024-01-01&end_date=2024-12-31')
+
+    def test_safe_requests_read_from_replica(self):
+        response, primary, replica = self.report()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((primary, bool(replica)), (0, True))
+        self.assertEqual(response.data['rooms_per_floor'], [])
+
+    def test_occupancy_analytics_reads_from_replica(self):
+        response, primary, replica = self.request(
+            'get', '/hotel/analytics/occupancy?start_date=2024-01-01&end_date=2024-01-31&granularity=day'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((primary, bool(replica)), (0, True))
+
+    def test_writes_and_transactions_use_primary(self):
+        response, primary, replica = self.request('post', '/hotel/cleaning-schedules/auto-assign', {})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual((bool(primary), replica), (True, 0))
+
+        with routing_scope():
+            self.assertEqual(router.db_for_read(Room), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Room), 'default')
+            Room.objects.filter(number=101).update(status='MAINTENANCE')
+            self.assertEqual(router.db_for_read(Room), 'default')
+        with routing_scope():
+            self.assertEqual(router.db_for_read(Room), 'replica')
+
+    @override_settings(HOTEL_REPORT_JOBS_EAGER=True)
+    def test_report_jobs_read_from_replica(self):
+        response, primary, replica = self.request('post', '/hotel/reports/jobs', {'report_type': 'YEARLY', 'year': 2024})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((primary, bool(replica)), (0, True))
+
+    def test_indexes_are_built_from_primary(self):
+        reset_availability_index()
+        reset_price_calendars()
+        room = Room.objects.using('default').get(number=101)
+        with routing_scope():
+            RoomPriceHistory.objects.create(room_type_id=room.type_id, start_date=date(2024, 1, 1), price=1000)
+        today = date.today()
+        with routing_scope(), CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(find_available_rooms(today, today + timedelta(days=2)), [room.id])
+            self.assertEqual(quote_price(room.type_id, today, today + timedelta(days=2)), 2000)
+        self.assertEqual(len(replica.captured_queries), 0)
+
+    def test_lagging_or_failed_replica_is_skipped(self):
+        with mock.patch('hotel_app.routers.replica_lag', return_value=30.0):
+            response, primary, replica = self.report()
+        self.assertEqual((bool(primary), replica), (True, 0))
+        self.assertEqual(response.data['rooms_per_floor'], [{'floor': 1, 'room_count': 1}])
+
+        reset_replica_state()
+        with mock.patch('hotel_app.routers.replica_lag', side_effect=OperationalError):
+            _, primary, replica = self.report()
+        self.assertEqual((bool(primary), replica), (True, 0))
+
+    def test_cached_responses_wait_for_replica(self):
+        # Реплика отстаёт на 3 секунды: комната создана только что, поэтому ответ с ETag по текущим меткам
+        # читается из первичной БД, а отчёт без таких требований - из реплики
+        with mock.patch('hotel_app.routers.replica_lag', return_value=3.0):
+            response, primary, replica = self.request('get', '/hotel/api/rooms/')
+            self.assertEqual((bool(primary), replica), (True, 0))
+            self.assertEqual(len(response.data['results']), 1)
+
+            _, primary, replica = self.report()
+            self.assertEqual((primary, bool(replica)), (0, True))
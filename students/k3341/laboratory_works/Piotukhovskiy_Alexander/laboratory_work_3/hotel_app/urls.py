@@ -4,18 +4,35 @@ from rest_framework.routers import DefaultRouter
 from hotel_app.views import ClientsListView, RoomsByStatusView, ClientStayOverlapView, ClientRoomCleaningView, \
     EmployeeManagementView, CleaningScheduleManagementView, ReservationManagementView, QuarterlyReportView, \
     ClientViewSet, RoomViewSet, ReservationViewSet, EmployeeViewSet, CleaningScheduleViewSet, PublicEndpoint, \
-    EmployeePositionsViewSet, EmploymentContractViewSet
+    EmployeePositionsViewSet, EmploymentContractViewSet, ClientStayOverlapBatchView, \
+    PriceQuoteView, AvailableRoomsView, RangeReportView, ReportJobView, ReportJobDetailView, \
+    ReservationExportView, ClientExportView, ResponseCacheStatsView, OccupancyAnalyticsView, \
+    BulkReservationView, ClientSearchView, CleaningAutoAssignView, MetricsView
 
 urlpatterns = [
     path('clients', ClientsListView.as_view(), name='clients-list'),
+    path('clients/search', ClientSearchView.as_view(), name='client-search'),
     path('rooms', RoomsByStatusView.as_view(), name='available-rooms-count'),
+    path('rooms/available', AvailableRoomsView.as_view(), name='available-rooms'),
     path('clients/stay-overlap', ClientStayOverlapView.as_view(), name='client-stay-overlap'),
+    path('clients/stay-overlap/batch', ClientStayOverlapBatchView.as_view(), name='client-stay-overlap-batch'),
     path('clients/room-cleaner', ClientRoomCleaningView.as_view(), name='client-room-cleaning'),
     path('employees/manage', EmployeeManagementView.as_view(), name='employee-management'),
     path('cleaning-schedules/manage', CleaningScheduleManagementView.as_view(), name='update-cleaning-schedule'),
+    path('cleaning-schedules/auto-assign', CleaningAutoAssignView.as_view(), name='auto-assign-cleaning'),
     path('reservation', ReservationManagementView.as_view(), name='create-reservation'),
     path('reservation/<int:reservation_id>', ReservationManagementView.as_view(), name='update-reservation'),
+    path('reservations/bulk', BulkReservationView.as_view(), name='bulk-reservations'),
+    path('pricing/quote', PriceQuoteView.as_view(), name='pricing-quote'),
     path('reports/quarterly', QuarterlyReportView.as_view(), name='quarterly-report'),
+    path('reports/range', RangeReportView.as_view(), name='range-report'),
+    path('analytics/occupancy', OccupancyAnalyticsView.as_view(), name='occupancy-analytics'),
+    path('reports/jobs', ReportJobView.as_view(), name='report-jobs'),
+    path('reports/jobs/<str:job_id>', ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('export/reservations', ReservationExportView.as_view(), name='export-reservations'),
+    path('export/clients', ClientExportView.as_view(), name='export-clients'),
+    path('cache/stats', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path("health", PublicEndpoint.as_view(), name='hello-world')
 ]
 
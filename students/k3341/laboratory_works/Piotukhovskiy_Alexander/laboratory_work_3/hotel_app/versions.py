@@ -0,0 +1,83 @@
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+VERSION_CACHE_KEY = 'hotel:version:{}'
+
+
+def shared_cache_configured():
+    return bool(getattr(settings, 'HOTEL_SHARED_CACHE', None))
+
+
+def shared_cache():
+    # Общий для всех процессов кэш (HOTEL_SHARED_CACHE, по умолчанию файловый). Если настройку убрать,
+    # используется кэш по умолчанию: версии и метки в LocMemCache видны только своему процессу, поэтому
+    # кэш ответов, ETag и индексы в памяти процесса тогда выключены
+    return caches[getattr(settings, 'HOTEL_SHARED_CACHE', None) or DEFAULT_CACHE_ALIAS]
+
+
+def _initial_version():
+    # Пропавшая из кэша (вытеснение, очистка) версия начинается со случайного числа, а не с нуля:
+    # процесс, построивший индекс при старой версии, не примет новую за свою
+    return random.getrandbits(48)
+
+
+def get_version(name):
+    return get_versions([name])[0]
+
+
+def get_versions(names):
+    cache = shared_cache()
+    keys = [VERSION_CACHE_KEY.format(name) for name in names]
+    versions = cache.get_many(keys)
+    result = []
+    for key in keys:
+        version = versions.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), timeout=None)
+            version = cache.get(key, 0)
+        result.append(version)
+    return result
+
+
+def bump_version(name):
+    cache = shared_cache()
+    key = VERSION_CACHE_KEY.format(name)
+    cache.add(key, _initial_version(), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+STAMP_CACHE_KEY = 'hotel:stamp:{}'
+
+
+def _new_stamp():
+    return uuid.uuid4().hex, time.time()
+
+
+def get_stamps(names):
+    # Метка - случайный токен и время последнего изменения. В отличие от счётчика версий,
+    # после очистки кэша метка не повторит старое значение, поэтому годится для ETag
+    cache = shared_cache()
+    keys = [STAMP_CACHE_KEY.format(name) for name in names]
+    stamps = cache.get_many(keys)
+    result = []
+    for key in keys:
+        stamp = stamps.get(key)
+        if stamp is None:
+            stamp = _new_stamp()
+            cache.add(key, stamp, timeout=None)
+            stamp = cache.get(key) or stamp
+        result.append(stamp)
+    return result
+
+
+def touch_stamp(name):
+    shared_cache().set(STAMP_CACHE_KEY.format(name), _new_stamp(), timeout=None)
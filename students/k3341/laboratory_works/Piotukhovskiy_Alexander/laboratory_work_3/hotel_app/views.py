@@ -1,24 +1,40 @@
-import calendar
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from django.core.exceptions import ValidationError as DRFValidationError
-from django.db import transaction
-from django.db.models import Q, Sum, Count, F, ExpressionWrapper, IntegerField
-from django.db.models.functions import Cast, Substr
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.utils import timezone
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, viewsets
 from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from .models import Reservation, Client, Room, CleaningSchedule, Employee, EmployeePosition, EmploymentContract, \
-    RoomPriceHistory
+    StaleVersionError
 from .serializers import ClientSerializer, RoomSerializer, ClientStayOverlapSerializer, CleaningEmployeeSerializer, \
     ClientRoomCleaningSerializer, HireEmployeeSerializer, FireEmployeeSerializer, EmploymentContractDetailSerializer, \
     UpdateEmployeeSerializer, UpdateCleaningScheduleSerializer, CreateReservationSerializer, \
     UpdateReservationSerializer, QuarterlyReportSerializer, ReservationSerializer, EmployeeSerializer, \
-    CleaningScheduleSerializer, EmployeePositionSerializer
+    CleaningScheduleSerializer, CleaningScheduleRowSerializer, EmployeePositionSerializer, ClientStayOverlapBatchSerializer, PriceQuoteSerializer, AvailableRoomsSerializer, \
+    RangeReportSerializer, CreateReportJobSerializer, ExportSerializer, OccupancyAnalyticsSerializer, \
+    BulkReservationSerializer, ClientSearchSerializer, AutoAssignCleaningSerializer
+from .analytics import occupancy_analytics
+from .availability import find_available_rooms
+from .conditional import conditional_get, ROOM_COLLECTIONS, if_match_satisfied, version_etag
+from .exports import export_response, NDJSONRenderer, CSVRenderer
+from .housekeeping import schedule_housekeeping
+from .imports import import_reservations, BulkImportError
+from .jobs import enqueue_report, get_job
+from .metrics import PROMETHEUS_CONTENT_TYPE, PrometheusRenderer, render_metrics
+from .overlaps import find_stay_overlaps
+from .pagination import KeysetPagination, WindowCountPagination
+from .pricing import quote_price, quote_prices
+from .reports import REPORT_COUNTING, build_report, quarter_date_range, year_date_range
+from .response_cache import cached_response, cache_stats
+from .schedules import sync_cleaning_schedule
+from .search import SQLITE_CANDIDATES, search_clients, ranking_complete
 
 
 class PublicEndpoint(generics.GenericAPIView):
@@ -34,26 +50,62 @@ class PublicEndpoint(generics.GenericAPIView):
 class ClientViewSet(viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('last_name', 'id')
 
 
 class RoomViewSet(viewsets.ModelViewSet):
-    queryset = Room.objects.all()
+    queryset = Room.objects.select_related('type')
     serializer_class = RoomSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('number', 'id')
+
+    @conditional_get(*ROOM_COLLECTIONS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(*ROOM_COLLECTIONS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
 class ReservationViewSet(viewsets.ModelViewSet):
-    queryset = Reservation.objects.all()
+    queryset = Reservation.objects.select_related('client', 'room__type')
     serializer_class = ReservationSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-arrival_date', '-id')
+
+    @conditional_get(*ROOM_COLLECTIONS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(*ROOM_COLLECTIONS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
 class EmployeeViewSet(viewsets.ModelViewSet):
-    queryset = Employee.objects.all()
+    queryset = EmployeeSerializer.with_active_position(Employee.objects.all())
     serializer_class = EmployeeSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('last_name', 'id')
 
 
 class EmploymentContractViewSet(viewsets.ModelViewSet):
-    queryset = EmploymentContract.objects.all()
+    queryset = EmploymentContract.objects.select_related('employee', 'position')
     serializer_class = EmploymentContractDetailSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-start_date', '-id')
+
+    def get_queryset(self):
+        # ?employee_id=1,2,3 - контракты сотрудников загруженной страницы списка
+        queryset = super().get_queryset()
+        employee_ids = self.request.query_params.get('employee_id')
+        if employee_ids is not None:
+            queryset = queryset.filter(
+                employee_id__in=[int(employee_id) for employee_id in employee_ids.split(',') if employee_id.strip().isdigit()]
+            )
+        return queryset
 
 
 class EmployeePositionsViewSet(viewsets.ModelViewSet):
@@ -62,12 +114,35 @@ class EmployeePositionsViewSet(viewsets.ModelViewSet):
 
 
 class CleaningScheduleViewSet(viewsets.ModelViewSet):
-    queryset = CleaningSchedule.objects.all()
+    queryset = CleaningSchedule.objects.select_related('cleaner__employee', 'room__type')
     serializer_class = CleaningScheduleSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-cleaning_date', '-id')
+    read_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        if self.action in self.read_actions:
+            # Чтение - проекцией нужных столбцов одним запросом с JOIN, без создания моделей
+            return CleaningSchedule.objects.values(*CleaningScheduleRowSerializer.FIELDS)
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return CleaningScheduleRowSerializer
+        return super().get_serializer_class()
+
+    @conditional_get('cleaning_schedule', 'employee', 'room', 'room_type')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get('cleaning_schedule', 'employee', 'room', 'room_type')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
 class ClientsListView(generics.ListAPIView):
     serializer_class = ClientSerializer
+    pagination_class = WindowCountPagination
 
     def get_queryset(self):
         room_number = self.request.query_params.get('room', None)
@@ -75,17 +150,15 @@ class ClientsListView(generics.ListAPIView):
         end_date = self.request.query_params.get('end_date', None)
         city_name = self.request.query_params.get('city', None)
 
-        queryset = Client.objects.all()
+        # Фильтры по бронированиям - полусоединения client_id IN (SELECT ...), которые планировщик начинает
+        # с индексов бронирований (коррелированный EXISTS SQLite выполняет перебором всех клиентов);
+        # комната ищется по номеру внутри подзапроса, весь список вместе с общим числом - один запрос
+        queryset = Client.objects.order_by('last_name', 'id')
 
         if room_number:
-            try:
-                room_number = Room.objects.get(number=room_number)
-            except Room.DoesNotExist:
-                return Client.objects.none()
-
-            reservations = Reservation.objects.filter(room=room_number)
-            client_ids = reservations.values_list('client_id', flat=True)
-            queryset = queryset.filter(id__in=client_ids)
+            queryset = queryset.filter(
+                id__in=Reservation.objects.filter(room__number=room_number).values('client_id')
+            )
 
         if start_date or end_date:
             date_filter = Q()
@@ -96,9 +169,7 @@ class ClientsListView(generics.ListAPIView):
             if end_date:
                 date_filter &= Q(arrival_date__lte=end_date)
 
-            reservations = Reservation.objects.filter(date_filter)
-            client_ids = reservations.values_list('client_id', flat=True)
-            queryset = queryset.filter(id__in=client_ids)
+            queryset = queryset.filter(id__in=Reservation.objects.filter(date_filter).values('client_id'))
 
         if city_name:
             queryset = queryset.filter(city_from__icontains=city_name)
@@ -138,13 +209,32 @@ class ClientsListView(generics.ListAPIView):
                 type=openapi.TYPE_STRING,
                 required=False,
             ),
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Количество клиентов на странице (по умолчанию 100, не более 1000).",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'offset',
+                openapi.IN_QUERY,
+                description="Смещение от начала списка, отсортированного по фамилии.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
         ],
         responses={
             200: openapi.Response(
-                description="Список клиентов, соответствующих критериям фильтрации.",
+                description=(
+                    "Страница списка клиентов, соответствующих критериям фильтрации. count - общее число "
+                    "найденных клиентов, next и previous - ссылки на соседние страницы."
+                ),
                 examples={
                     "application/json": {
                         "count": 2,
+                        "next": None,
+                        "previous": None,
                         "clients": [
                             {
                                 "id": 1,
@@ -178,15 +268,17 @@ class ClientsListView(generics.ListAPIView):
             ),
         },
     )
+    @cached_response('clients-list', 'client', 'reservation', 'room')
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-
-        clients_count = queryset.count()
+        clients = self.paginate_queryset(self.get_queryset())
+        clients_count = self.paginator.count
 
         if clients_count > 0:
-            serializer = self.get_serializer(queryset, many=True)
+            serializer = self.get_serializer(clients, many=True)
             return Response({
                 "count": clients_count,
+                "next": self.paginator.get_next_link(),
+                "previous": self.paginator.get_previous_link(),
                 "clients": serializer.data
             })
         else:
@@ -197,6 +289,93 @@ class ClientsListView(generics.ListAPIView):
             }, status=404)
 
 
+class ClientSearchView(generics.GenericAPIView):
+    serializer_class = ClientSearchSerializer
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Поиск клиентов для стойки регистрации по началу фамилии, имени, отчества, номера паспорта или "
+            "названия города. Каждое слово запроса должно совпасть с началом одного из полей; результаты "
+            "упорядочены по релевантности (совпадения по фамилии и паспорту важнее совпадений по городу). "
+            f"На SQLite релевантность считается только для первых {SQLITE_CANDIDATES} совпадений: если их больше, "
+            "в ответе ranking_complete = false, и более релевантные клиенты могут не попасть в выдачу - уточните запрос."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'q',
+                openapi.IN_QUERY,
+                description="Строка поиска, например \"Иван Моск\" или \"4510\".",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Максимальное количество результатов (по умолчанию 20, не более 100).",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Найденные клиенты в порядке убывания релевантности.",
+                examples={
+                    "application/json": {
+                        "count": 1,
+                        "ranking_complete": True,
+                        "clients": [
+                            {
+                                "id": 1,
+                                "passport_number": "4510123456",
+                                "first_name": "Иван",
+                                "last_name": "Иванов",
+                                "middle_name": "Иванович",
+                                "city_from": "Москва"
+                            }
+                        ]
+                    }
+                },
+            ),
+            404: openapi.Response(
+                description="Клиенты по запросу не найдены.",
+                examples={
+                    "application/json": {
+                        "detail": "Не найдено ни одного клиента по запросу.",
+                        "count": 0,
+                        "clients": []
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, пустой запрос.",
+                examples={
+                    "application/json": {
+                        "q": ["Запрос должен содержать хотя бы одну букву или цифру."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        clients = search_clients(serializer.validated_data['q'], serializer.validated_data['limit'])
+        if not clients:
+            return Response({
+                "detail": "Не найдено ни одного клиента по запросу.",
+                "count": 0,
+                "clients": []
+            }, status=404)
+
+        return Response({
+            "count": len(clients),
+            "ranking_complete": ranking_complete(clients),
+            "clients": ClientSerializer(clients, many=True).data
+        })
+
+
 class RoomsByStatusView(generics.GenericAPIView):
 
     @swagger_auto_schema(
@@ -259,11 +438,16 @@ class RoomsByStatusView(generics.GenericAPIView):
                     }
                 },
             ),
+            304: openapi.Response(
+                description="Данные не изменились с момента ответа с ETag из заголовка If-None-Match.",
+            ),
         },
     )
+    @conditional_get(*ROOM_COLLECTIONS)
+    @cached_response('rooms-by-status', *ROOM_COLLECTIONS)
     def get(self, request, *args, **kwargs):
         statuses = request.query_params.get('status', None)
-        rooms_queryset = Room.objects.all()
+        rooms_queryset = Room.objects.select_related('type')
         if statuses:
             status_list = [status.strip().upper() for status in statuses.split(',') if status.strip()]
             valid_statuses = [choice[0] for choice in Room.STATUS_CHOICES]
@@ -283,6 +467,104 @@ class RoomsByStatusView(generics.GenericAPIView):
         })
 
 
+class AvailableRoomsView(generics.GenericAPIView):
+    serializer_class = AvailableRoomsSerializer
+
+    @swagger_auto_schema(
+        operation_description="Найти комнаты, свободные на весь указанный период, с учётом вместимости и удобств.",
+        manual_parameters=[
+            openapi.Parameter(
+                'arrival_date',
+                openapi.IN_QUERY,
+                description="Дата заселения (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'departure_date',
+                openapi.IN_QUERY,
+                description="Дата выезда (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'capacity',
+                openapi.IN_QUERY,
+                description="Минимальное количество мест в номере.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'amenities',
+                openapi.IN_QUERY,
+                description="Список обязательных удобств через запятую, например: wifi,balcony.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Список свободных комнат.",
+                examples={
+                    "application/json": {
+                        "count": 1,
+                        "rooms": [
+                            {
+                                "id": 1,
+                                "number": 101,
+                                "type_id": 1,
+                                "type_name": "Одноместный",
+                                "capacity": 1,
+                                "phone": "1234567890"
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, некорректные даты или неизвестные удобства.",
+                examples={
+                    "application/json": {
+                        "departure_date": ["Дата выезда должна быть позже даты заселения."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        room_ids = find_available_rooms(
+            validated_data['arrival_date'],
+            validated_data['departure_date'],
+            validated_data.get('capacity'),
+            validated_data.get('amenities', []),
+        )
+
+        rooms = Room.objects.filter(id__in=room_ids).select_related('type').order_by('number')
+        rooms_data = [
+            {
+                "id": room.id,
+                "number": room.number,
+                "type_id": room.type_id,
+                "type_name": room.type.name,
+                "capacity": room.type.capacity,
+                "phone": room.phone,
+            }
+            for room in rooms
+        ]
+
+        return Response({
+            "count": len(rooms_data),
+            "rooms": rooms_data
+        })
+
+
 class ClientStayOverlapView(generics.GenericAPIView):
     serializer_class = ClientStayOverlapSerializer
 
@@ -378,35 +660,125 @@ class ClientStayOverlapView(generics.GenericAPIView):
                 status=404
             )
 
-        client_reservations = Reservation.objects.filter(client=target_client)
+        overlaps = find_stay_overlaps([target_client.id], start_date, end_date)
+        overlapping_clients = Client.objects.filter(id__in=overlaps[target_client.id]).order_by('id')
+        clients_data = ClientSerializer(overlapping_clients, many=True).data
 
-        date_filter = Q()
-        if start_date:
-            date_filter &= Q(arrival_date__gte=start_date)
-        if end_date:
-            date_filter &= Q(departure_date__lte=end_date)
+        return Response({
+            "count": len(clients_data),
+            "clients": clients_data
+        })
 
-        if date_filter:
-            client_reservations = client_reservations.filter(date_filter)
 
-        overlapping_filter = Q()
-        for reservation in client_reservations:
-            overlapping_filter |= Q(arrival_date__lt=reservation.departure_date) & Q(
-                departure_date__gt=reservation.arrival_date)
+class ClientStayOverlapBatchView(generics.GenericAPIView):
+    serializer_class = ClientStayOverlapBatchSerializer
 
-        if overlapping_filter:
-            overlapping_reservations = Reservation.objects.filter(overlapping_filter).exclude(client=target_client)
-            overlapping_clients_ids = overlapping_reservations.values_list('client_id', flat=True).distinct()
-            overlapping_clients = Client.objects.filter(id__in=overlapping_clients_ids)
-        else:
-            overlapping_clients = Client.objects.none()
+    @swagger_auto_schema(
+        operation_description="Получить пересечения проживаний сразу для нескольких клиентов.",
+        manual_parameters=[
+            openapi.Parameter(
+                'client_ids',
+                openapi.IN_QUERY,
+                description="Список ID клиентов через запятую.",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Дата начала периода (формат YYYY-MM-DD). Указывается для фильтрации пересечений.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=False,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Дата окончания периода (формат YYYY-MM-DD). Указывается для фильтрации пересечений.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Пересечения проживаний для каждого из указанных клиентов.",
+                examples={
+                    "application/json": {
+                        "results": [
+                            {
+                                "client_id": 1,
+                                "count": 1,
+                                "clients": [
+                                    {
+                                        "id": 2,
+                                        "passport_number": "0987654321",
+                                        "first_name": "Анна",
+                                        "last_name": "Петрова",
+                                        "middle_name": "Александровна",
+                                        "city_from": "Санкт-Петербург"
+                                    }
+                                ]
+                            },
+                            {
+                                "client_id": 123,
+                                "detail": "Клиент с id 123 не найден.",
+                                "count": 0,
+                                "clients": []
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, указаны некорректные даты или ID клиентов.",
+                examples={
+                    "application/json": {
+                        "client_ids": ["Список ID клиентов должен состоять из целых чисел через запятую."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        overlap_serializer = self.get_serializer(data=request.query_params)
+        if not overlap_serializer.is_valid():
+            return Response(overlap_serializer.errors, status=422)
 
-        clients_data = ClientSerializer(overlapping_clients, many=True).data
+        validated_data = overlap_serializer.validated_data
+        client_ids = validated_data['client_ids']
+        start_date = validated_data.get('start_date', None)
+        end_date = validated_data.get('end_date', None)
 
-        return Response({
-            "count": overlapping_clients.count(),
-            "clients": clients_data
-        })
+        existing_ids = set(Client.objects.filter(id__in=client_ids).values_list('id', flat=True))
+        overlaps = find_stay_overlaps([client_id for client_id in client_ids if client_id in existing_ids],
+                                      start_date, end_date)
+
+        overlapping_ids = set().union(*overlaps.values())
+        clients_data = {
+            client['id']: client
+            for client in ClientSerializer(Client.objects.filter(id__in=overlapping_ids), many=True).data
+        }
+
+        results = []
+        for client_id in client_ids:
+            if client_id not in existing_ids:
+                results.append({
+                    "client_id": client_id,
+                    "detail": f"Клиент с id {client_id} не найден.",
+                    "count": 0,
+                    "clients": []
+                })
+                continue
+
+            clients = [clients_data[overlapping_id] for overlapping_id in sorted(overlaps[client_id])]
+            results.append({
+                "client_id": client_id,
+                "count": len(clients),
+                "clients": clients
+            })
+
+        return Response({"results": results})
 
 
 class ClientRoomCleaningView(generics.GenericAPIView):
@@ -492,25 +864,27 @@ class ClientRoomCleaningView(generics.GenericAPIView):
                 status=404
             )
 
-        try:
-            reservation = Reservation.objects.filter(client=target_client).latest('departure_date')
-            room = reservation.room
-        except Reservation.DoesNotExist:
+        room_id = Reservation.objects.filter(
+            client=target_client
+        ).order_by('-departure_date').values_list('room_id', flat=True).first()
+        if room_id is None:
             return Response(
                 {"detail": f"Нет активных или завершённых бронирований для клиента с id {client_id}."},
                 status=404
             )
 
-        cleaning_schedules = CleaningSchedule.objects.filter(
-            room=room,
-            cleaning_date__week_day=self.get_day_number(day_of_week)
-        )
-
-        employees = [schedule.cleaner.employee for schedule in cleaning_schedules]
-        employees_data = CleaningEmployeeSerializer(employees, many=True).data
+        # Данные сотрудников берём одним запросом с JOIN, без загрузки уборок и контрактов
+        fields = CleaningEmployeeSerializer.Meta.fields
+        employees_data = [
+            dict(zip(fields, row))
+            for row in CleaningSchedule.objects.filter(
+                room_id=room_id,
+                weekday=self.get_day_number(day_of_week)
+            ).order_by('id').values_list(*(f'cleaner__employee__{field}' for field in fields))
+        ]
 
         return Response({
-            "count": len(employees),
+            "count": len(employees_data),
             "employees": employees_data
         })
 
@@ -637,13 +1011,21 @@ class EmployeeManagementView(generics.GenericAPIView):
                     status=422
                 )
             position = EmployeePosition.objects.get(id=validated_data['position_id'])
-            contract = EmploymentContract.objects.create(
-                employee=employee,
-                position=position,
-                contract_type=validated_data['contract_type'],
-                start_date=validated_data['start_date'],
-                end_date=validated_data.get('end_date')
-            )
+            try:
+                with transaction.atomic():
+                    contract = EmploymentContract.objects.create(
+                        employee=employee,
+                        position=position,
+                        contract_type=validated_data['contract_type'],
+                        start_date=validated_data['start_date'],
+                        end_date=validated_data.get('end_date')
+                    )
+            except IntegrityError:
+                # Параллельный запрос успел создать активный контракт - его не пропустит частичный уникальный индекс
+                return Response(
+                    {"detail": "У сотрудника уже есть активный контракт."},
+                    status=422
+                )
 
             contract_serializer = EmploymentContractDetailSerializer(contract)
             return Response(contract_serializer.data, status=201)
@@ -844,7 +1226,11 @@ class CleaningScheduleManagementView(generics.GenericAPIView):
     serializer_class = UpdateCleaningScheduleSerializer
 
     @swagger_auto_schema(
-        operation_description="Обновить расписание уборок для сотрудника.",
+        operation_description=(
+            "Обновить расписание уборок для сотрудника. Даты задаются списком cleaning_dates либо шаблоном месяца "
+            "template (дни недели), тогда расписание сотрудника по указанным комнатам на весь месяц приводится к "
+            "шаблону. Совпадающие записи не пересоздаются: сохраняются их id и статус уборки."
+        ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -855,31 +1241,51 @@ class CleaningScheduleManagementView(generics.GenericAPIView):
                 'cleaning_dates': openapi.Schema(
                     type=openapi.TYPE_ARRAY,
                     items=openapi.Items(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
-                    description="Список дат уборки (формат YYYY-MM-DD).",
+                    description="Список дат уборки (формат YYYY-MM-DD). Не указывается вместе с template.",
+                ),
+                'template': openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    description="Шаблон месяца. Не указывается вместе с cleaning_dates.",
+                    properties={
+                        'month': openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="Месяц в формате YYYY-MM.",
+                        ),
+                        'days_of_week': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_STRING),
+                            description="Дни недели уборки: MONDAY, TUESDAY, ..., SUNDAY.",
+                        ),
+                    },
+                    required=['month', 'days_of_week'],
                 ),
                 'room_ids': openapi.Schema(
                     type=openapi.TYPE_ARRAY,
                     items=openapi.Items(type=openapi.TYPE_INTEGER),
-                    description="Список ID комнат, которые сотрудник будет убирать.",
+                    description="Список номеров комнат, которые сотрудник будет убирать.",
                 ),
             },
-            required=['cleaner_id', 'cleaning_dates', 'room_ids'],
+            required=['cleaner_id', 'room_ids'],
         ),
         responses={
             200: openapi.Response(
                 description="Расписание уборок успешно обновлено.",
                 examples={
                     "application/json": {
-                        "detail": "Расписание успешно обновлено."
+                        "detail": "Расписание успешно обновлено.",
+                        "created": 8,
+                        "deleted": 2,
+                        "unchanged": 18
                     }
                 },
             ),
             422: openapi.Response(
-                description="Ошибки валидации данных. Например, указаны недопустимые комнаты, отсутствующий сотрудник или некорректные даты.",
+                description="Ошибки валидации данных. Например, указаны недопустимые комнаты, отсутствующий сотрудник, "
+                            "некорректные даты или одновременно даты и шаблон.",
                 examples={
                     "application/json": {
-                        "detail": "Указанный служащий не найден или не имеет активного контракта.",
-                        "missing_rooms": "Следующие номера комнат не найдены: 101, 102."
+                        "cleaner_id": ["Указанный служащий не найден или не имеет активного контракта."],
+                        "room_ids": {"missing_rooms": "Следующие номера комнат не найдены: 101, 102."}
                     }
                 },
             ),
@@ -889,56 +1295,129 @@ class CleaningScheduleManagementView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             validated_data = serializer.validated_data
-
-            cleaner_id = validated_data['cleaner_id']
-            cleaning_dates = validated_data['cleaning_dates']
-            room_numbers = validated_data['room_ids']
-
-            with transaction.atomic():
-                rooms = Room.objects.filter(number__in=room_numbers)
-
-                CleaningSchedule.objects.filter(
-                    cleaner_id=cleaner_id,
-                    cleaning_date__in=cleaning_dates,
-                    room__in=rooms
-                ).delete()
-
-                schedules = [
-                    CleaningSchedule(
-                        cleaner_id=cleaner_id,
-                        room=room,
-                        cleaning_date=cleaning_date
-                    )
-                    for cleaning_date in cleaning_dates
-                    for room in rooms
-                ]
-                CleaningSchedule.objects.bulk_create(schedules)
-
-            return Response({"detail": "Расписание успешно обновлено."})
+            changes = sync_cleaning_schedule(
+                cleaner_id=validated_data['cleaner_id'],
+                room_ids=validated_data['room_ids'],
+                cleaning_dates=validated_data['cleaning_dates'],
+                period=validated_data['period'],
+            )
+            return Response({"detail": "Расписание успешно обновлено.", **changes})
 
         return Response(serializer.errors, status=422)
 
 
-class ReservationManagementView(generics.GenericAPIView):
-    serializer_classes = {
-        'post': CreateReservationSerializer,
-        'patch': UpdateReservationSerializer,
-    }
-
-    def get_serializer_class(self):
-        return self.serializer_classes.get(self.request.method.lower())
+class CleaningAutoAssignView(generics.GenericAPIView):
+    serializer_class = AutoAssignCleaningSerializer
 
     @swagger_auto_schema(
-        operation_description="Создать новое бронирование для клиента.",
+        operation_description=(
+            "Автоматически распределить на день уборку комнат со статусом «Требуется уборка» между сотрудниками "
+            "с активным контрактом. Нагрузка распределяется равномерно с учётом уже запланированных на день уборок "
+            "и не превышает capacity на сотрудника; комнаты одного этажа (этаж - номер комнаты // 100) по "
+            "возможности достаются одному сотруднику. Комнаты с незавершённой уборкой на этот день пропускаются, "
+            "а сотруднику, который уже убрал комнату в этот день, она повторно не назначается."
+        ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'passport_number': openapi.Schema(
+                'cleaning_date': openapi.Schema(
                     type=openapi.TYPE_STRING,
-                    description="Номер паспорта клиента (уникальный). Если клиента с таким паспортом не существует, он будет создан.",
+                    format=openapi.FORMAT_DATE,
+                    description="Дата уборки (формат YYYY-MM-DD), по умолчанию - сегодня.",
                 ),
-                'first_name': openapi.Schema(
-                    type=openapi.TYPE_STRING,
+                'capacity': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Максимальное количество уборок на сотрудника за день (по умолчанию 20).",
+                ),
+                'position_id': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="ID должности: распределять только между сотрудниками этой должности.",
+                ),
+            },
+        ),
+        responses={
+            201: openapi.Response(
+                description="Уборки назначены. Комнаты, на которые не хватило сотрудников, перечислены отдельно.",
+                examples={
+                    "application/json": {
+                        "cleaning_date": "2024-03-01",
+                        "rooms": 3,
+                        "cleaners": 2,
+                        "assigned": 3,
+                        "assignments": [
+                            {"employee_id": 1, "room_numbers": [101, 102]},
+                            {"employee_id": 2, "room_numbers": [201]}
+                        ],
+                        "unassigned_room_numbers": []
+                    }
+                },
+            ),
+            404: openapi.Response(
+                description="Нет комнат, требующих уборки, или нет сотрудников с активным контрактом.",
+                examples={
+                    "application/json": {
+                        "detail": "Нет комнат, требующих уборки."
+                    }
+                },
+            ),
+            409: openapi.Response(
+                description="Расписание уборок на этот день параллельно изменил другой запрос.",
+                examples={
+                    "application/json": {
+                        "detail": "Расписание уборок на этот день изменилось во время распределения. Повторите запрос."
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, некорректная дата или несуществующая должность.",
+                examples={
+                    "application/json": {
+                        "position_id": ["Должность с указанным id не найдена."]
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        try:
+            result = schedule_housekeeping(**serializer.validated_data)
+        except IntegrityError:
+            return Response(
+                {"detail": "Расписание уборок на этот день изменилось во время распределения. Повторите запрос."},
+                status=409
+            )
+        if not result['rooms']:
+            return Response({"detail": "Нет комнат, требующих уборки."}, status=404)
+        if not result['cleaners']:
+            return Response({"detail": "Нет сотрудников с активным контрактом."}, status=404)
+
+        return Response(result, status=201)
+
+
+class ReservationManagementView(generics.GenericAPIView):
+    serializer_classes = {
+        'post': CreateReservationSerializer,
+        'patch': UpdateReservationSerializer,
+    }
+
+    def get_serializer_class(self):
+        return self.serializer_classes.get(self.request.method.lower())
+
+    @swagger_auto_schema(
+        operation_description="Создать новое бронирование для клиента.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'passport_number': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    description="Номер паспорта клиента (уникальный). Если клиента с таким паспортом не существует, он будет создан.",
+                ),
+                'first_name': openapi.Schema(
+                    type=openapi.TYPE_STRING,
                     description="Имя клиента. Указывается при создании нового клиента.",
                 ),
                 'last_name': openapi.Schema(
@@ -995,7 +1474,18 @@ class ReservationManagementView(generics.GenericAPIView):
                         "arrival_date": "2024-12-10",
                         "departure_date": "2024-12-15",
                         "status": "BOOKED",
-                        "price_at_booking": 5000
+                        "price_at_booking": 5000,
+                        "version": 1
+                    }
+                },
+            ),
+            409: openapi.Response(
+                description="Комната изменена другим запросом во время бронирования.",
+                examples={
+                    "application/json": {
+                        "detail": "Комната 101 была изменена другим запросом. Обновите данные и повторите запрос.",
+                        "room_number": 101,
+                        "room_version": 3
                     }
                 },
             ),
@@ -1026,41 +1516,57 @@ class ReservationManagementView(generics.GenericAPIView):
             status = request.data.get('status', None)
             payment_status = request.data.get('payment_status', None)
 
-            with transaction.atomic():
-                client, created = Client.objects.get_or_create(
-                    passport_number=passport_number,
-                    defaults={
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "middle_name": middle_name,
-                        "city_from": city_from
-                    }
-                )
+            try:
+                with transaction.atomic():
+                    # Статус комнаты проверен сериализатором до транзакции - перечитываем её под блокировкой
+                    room = Room.objects.select_for_update().get(pk=room.pk)
+                    if room.status != 'AVAILABLE':
+                        return Response(
+                            {"room_number": f"Комната {room.number} недоступна для бронирования."},
+                            status=422
+                        )
+
+                    client, created = Client.objects.get_or_create(
+                        passport_number=passport_number,
+                        defaults={
+                            "first_name": first_name,
+                            "last_name": last_name,
+                            "middle_name": middle_name,
+                            "city_from": city_from
+                        }
+                    )
 
-                if not created:
-                    client.first_name = first_name
-                    client.last_name = last_name
-                    client.middle_name = middle_name
-                    client.city_from = city_from
-                    client.save()
-
-                total_price = self.calculate_total_price(room, arrival_date, departure_date)
-
-                reservation = Reservation.objects.create(
-                    client=client,
-                    room=room,
-                    admin=request.user,
-                    booking_date=datetime.now(),
-                    arrival_date=arrival_date,
-                    departure_date=departure_date,
-                    status=status or Reservation._meta.get_field('status').get_default(),
-                    payment_status=payment_status or Reservation._meta.get_field('payment_status').get_default(),
-                    price_at_booking=total_price,
-                    final_price=total_price,
-                )
+                    if not created:
+                        client.first_name = first_name
+                        client.last_name = last_name
+                        client.middle_name = middle_name
+                        client.city_from = city_from
+                        client.save()
+
+                    total_price = self.calculate_total_price(room, arrival_date, departure_date)
 
-                room.status = 'OCCUPIED'
-                room.save()
+                    reservation = Reservation.objects.create(
+                        client=client,
+                        room=room,
+                        admin=request.user,
+                        booking_date=datetime.now(),
+                        arrival_date=arrival_date,
+                        departure_date=departure_date,
+                        status=status or Reservation._meta.get_field('status').get_default(),
+                        payment_status=payment_status or Reservation._meta.get_field('payment_status').get_default(),
+                        price_at_booking=total_price,
+                        final_price=total_price,
+                    )
+
+                    room.status = 'OCCUPIED'
+                    room.save(update_fields=['status'])
+            except StaleVersionError as error:
+                return self.room_conflict(error.instance)
+            except IntegrityError:
+                return Response(
+                    {"room_number": "Комната уже забронирована на пересекающиеся даты."},
+                    status=422
+                )
 
             return Response(
                 {
@@ -1070,7 +1576,8 @@ class ReservationManagementView(generics.GenericAPIView):
                     "arrival_date": reservation.arrival_date,
                     "departure_date": reservation.departure_date,
                     "status": reservation.status,
-                    "price_at_booking": reservation.price_at_booking
+                    "price_at_booking": reservation.price_at_booking,
+                    "version": reservation.version
                 },
                 status=201
             )
@@ -1078,7 +1585,20 @@ class ReservationManagementView(generics.GenericAPIView):
         return Response(serializer.errors, status=422)
 
     @swagger_auto_schema(
-        operation_description="Обновить существующее бронирование.",
+        operation_description=(
+            "Обновить существующее бронирование. Для защиты от потерянных обновлений передайте в заголовке "
+            "If-Match версию бронирования из заголовка ETag предыдущего ответа: если бронирование успело "
+            "измениться, вернётся 412."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'If-Match',
+                openapi.IN_HEADER,
+                description='Ожидаемая версия бронирования в кавычках, например "3", или * (необязательно).',
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+        ],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -1126,7 +1646,8 @@ class ReservationManagementView(generics.GenericAPIView):
                         "departure_date": "2024-12-18",
                         "status": "CONFIRMED",
                         "payment_status": "PAID",
-                        "price_at_booking": 7000
+                        "price_at_booking": 7000,
+                        "version": 4
                     }
                 },
             ),
@@ -1138,8 +1659,30 @@ class ReservationManagementView(generics.GenericAPIView):
                     }
                 },
             ),
+            409: openapi.Response(
+                description="Комната изменена другим запросом во время обновления бронирования.",
+                examples={
+                    "application/json": {
+                        "detail": "Комната 101 была изменена другим запросом. Обновите данные и повторите запрос.",
+                        "room_number": 101,
+                        "room_version": 3
+                    }
+                },
+            ),
+            412: openapi.Response(
+                description="Бронирование изменено другим запросом после получения указанной версии.",
+                examples={
+                    "application/json": {
+                        "detail": "Бронирование было изменено другим пользователем. Обновите данные и повторите запрос.",
+                        "version": 4
+                    }
+                },
+            ),
             422: openapi.Response(
-                description="Ошибки валидации данных. Например, некорректные даты или комната недоступна.",
+                description=(
+                    "Ошибки валидации данных. Например, некорректные даты, комната недоступна "
+                    "или пересекается с другим бронированием."
+                ),
                 examples={
                     "application/json": {
                         "departure_date": "Дата выезда должна быть позже даты заселения.",
@@ -1153,18 +1696,26 @@ class ReservationManagementView(generics.GenericAPIView):
         reservation_id = kwargs.get('reservation_id')
 
         try:
-            reservation = Reservation.objects.select_for_update().get(id=reservation_id)
-        except Reservation.DoesNotExist:
-            return Response(
-                {"detail": "Бронирование с указанным ID не найдено."},
-                status=404
-            )
+            # Бронирование и его комната блокируются до конца транзакции, комнаты сохраняются один раз;
+            # UPDATE выполняется с проверкой версии, поэтому параллельная правка не теряется
+            with transaction.atomic():
+                try:
+                    reservation = Reservation.objects.select_for_update().select_related('room').get(id=reservation_id)
+                except Reservation.DoesNotExist:
+                    return Response(
+                        {"detail": "Бронирование с указанным ID не найдено."},
+                        status=404
+                    )
 
-        serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid():
-            validated_data = serializer.validated_data
+                serializer = self.get_serializer(data=request.data)
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=422)
+                validated_data = serializer.validated_data
 
-            with transaction.atomic():
+                if not if_match_satisfied(request, reservation):
+                    return self.version_conflict(reservation.version)
+
+                changed_rooms = {}
                 if 'arrival_date' in validated_data:
                     reservation.arrival_date = validated_data['arrival_date']
                 if 'departure_date' in validated_data:
@@ -1174,21 +1725,27 @@ class ReservationManagementView(generics.GenericAPIView):
                 if 'status' in validated_data:
                     reservation.status = validated_data['status']
 
-                    if validated_data['status'] in ['CANCELED', 'CHECKED_OUT']:
-                        if validated_data['status'] == 'CANCELED' and previous_status != 'CHECKED_IN':
-                            reservation.room.status = 'AVAILABLE'
-                        elif validated_data['status'] == 'CHECKED_OUT' and previous_status == 'CHECKED_IN':
-                            reservation.room.status = 'REQUIRES_CLEANING'
-                        reservation.room.save()
+                    if validated_data['status'] == 'CANCELLED' and previous_status != 'CHECKED_IN':
+                        reservation.room.status = 'AVAILABLE'
+                        changed_rooms[reservation.room.id] = reservation.room
+                    elif validated_data['status'] == 'CHECKED_OUT' and previous_status == 'CHECKED_IN':
+                        reservation.room.status = 'REQUIRES_CLEANING'
+                        changed_rooms[reservation.room.id] = reservation.room
 
                 if 'payment_status' in validated_data:
                     reservation.payment_status = validated_data['payment_status']
                 if 'room' in validated_data:
+                    new_room = Room.objects.select_for_update().get(pk=validated_data['room'].pk)
+                    if new_room.status != 'AVAILABLE':
+                        return Response(
+                            {"room_number": f"Комната с номером {new_room.number} недоступна для бронирования."},
+                            status=422
+                        )
                     reservation.room.status = 'AVAILABLE'
-                    reservation.room.save()
-                    reservation.room = validated_data['room']
+                    changed_rooms[reservation.room.id] = reservation.room
+                    reservation.room = new_room
                     reservation.room.status = 'OCCUPIED'
-                    reservation.room.save()
+                    changed_rooms[reservation.room.id] = reservation.room
 
                 if 'arrival_date' in validated_data or 'departure_date' in validated_data or 'room' in validated_data:
                     reservation.price_at_booking = self.calculate_total_price(
@@ -1197,49 +1754,297 @@ class ReservationManagementView(generics.GenericAPIView):
                         reservation.departure_date
                     )
 
+                for room in changed_rooms.values():
+                    room.save(update_fields=['status'])
+
                 reservation.updated_by = request.user
                 reservation.last_updated_date = timezone.now()
                 reservation.save()
-
+        except StaleVersionError as error:
+            # Устаревшей могла оказаться комната (новая или прежняя), а не само бронирование
+            if isinstance(error.instance, Room):
+                return self.room_conflict(error.instance)
+            current_version = Reservation.objects.filter(id=reservation_id).values_list('version', flat=True).first()
+            return self.version_conflict(current_version)
+        except IntegrityError:
             return Response(
-                {
-                    "reservation_id": reservation.id,
-                    "client_id": reservation.client.id,
-                    "room_number": reservation.room.number,
-                    "arrival_date": reservation.arrival_date,
-                    "departure_date": reservation.departure_date,
-                    "status": reservation.status,
-                    "payment_status": reservation.payment_status,
-                    "price_at_booking": reservation.price_at_booking,
-                },
-                status=200
+                {"room_number": "Комната уже забронирована на пересекающиеся даты."},
+                status=422
             )
 
-        return Response(serializer.errors, status=422)
+        response = Response(
+            {
+                "reservation_id": reservation.id,
+                "client_id": reservation.client_id,
+                "room_number": reservation.room.number,
+                "arrival_date": reservation.arrival_date,
+                "departure_date": reservation.departure_date,
+                "status": reservation.status,
+                "payment_status": reservation.payment_status,
+                "price_at_booking": reservation.price_at_booking,
+                "version": reservation.version,
+            },
+            status=200
+        )
+        response['ETag'] = version_etag(reservation)
+        return response
+
+    def version_conflict(self, version):
+        return Response(
+            {
+                "detail": "Бронирование было изменено другим пользователем. Обновите данные и повторите запрос.",
+                "version": version,
+            },
+            status=412
+        )
+
+    def room_conflict(self, room):
+        return Response(
+            {
+                "detail": f"Комната {room.number} была изменена другим запросом. Обновите данные и повторите запрос.",
+                "room_number": room.number,
+                "room_version": Room.objects.filter(pk=room.pk).values_list('version', flat=True).first(),
+            },
+            status=409
+        )
 
     def calculate_total_price(self, room, arrival_date, departure_date):
-        total_price = 0
-        current_date = arrival_date
+        return quote_price(room.type_id, arrival_date, departure_date)
 
-        price_history = RoomPriceHistory.objects.filter(
-            room_type=room.type
-        ).order_by('start_date')
 
-        while current_date < departure_date:
-            for price_period in price_history:
-                if price_period.start_date <= current_date and (
-                        price_period.end_date is None or price_period.end_date >= current_date):
-                    total_price += price_period.price
-                    break
+class BulkReservationView(generics.GenericAPIView):
+    serializer_class = BulkReservationSerializer
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Создать пакет бронирований (групповые заезды, синхронизация с каналами продаж). "
+            "Клиенты создаются или обновляются по номеру паспорта, стоимость рассчитывается по тарифам на даты "
+            "проживания. Пакет записывается целиком в одной транзакции: при ошибке хотя бы в одном элементе "
+            "не создаётся ни одно бронирование, а ошибки возвращаются списком по элементам."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'items': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'passport_number': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                description="Номер паспорта клиента. Если клиента с таким паспортом не существует, он будет создан.",
+                            ),
+                            'first_name': openapi.Schema(type=openapi.TYPE_STRING, description="Имя клиента."),
+                            'last_name': openapi.Schema(type=openapi.TYPE_STRING, description="Фамилия клиента."),
+                            'middle_name': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                description="Отчество клиента (необязательно).",
+                                nullable=True,
+                            ),
+                            'city_from': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                description="Город, из которого прибыл клиент.",
+                            ),
+                            'room_number': openapi.Schema(type=openapi.TYPE_INTEGER, description="Номер комнаты."),
+                            'arrival_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATE,
+                                description="Дата заселения (формат YYYY-MM-DD).",
+                            ),
+                            'departure_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATE,
+                                description="Дата выезда (формат YYYY-MM-DD).",
+                            ),
+                            'status': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                enum=['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT', 'CANCELLED'],
+                                description="Статус бронирования. По умолчанию BOOKED. При CHECKED_IN комната становится занятой.",
+                                nullable=True,
+                            ),
+                            'payment_status': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                enum=['PREPAID', 'PAID', 'UNPAID', 'REFUNDED'],
+                                description="Статус оплаты. По умолчанию UNPAID.",
+                                nullable=True,
+                            ),
+                        },
+                        required=['passport_number', 'first_name', 'last_name', 'city_from', 'room_number',
+                                  'arrival_date', 'departure_date'],
+                    ),
+                    description="Список бронирований (не более 5000).",
+                ),
+            },
+            required=['items'],
+        ),
+        responses={
+            201: openapi.Response(
+                description="Все бронирования пакета созданы.",
+                examples={
+                    "application/json": {
+                        "created": 1,
+                        "results": [
+                            {
+                                "reservation_id": 1,
+                                "client_id": 10,
+                                "room_number": 101,
+                                "arrival_date": "2024-12-10",
+                                "departure_date": "2024-12-15",
+                                "status": "BOOKED",
+                                "price_at_booking": 5000
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description=(
+                    "Ошибки валидации по элементам пакета (пустой объект - элемент корректен). Например, "
+                    "несуществующая комната, некорректные даты или пересечение с другим бронированием комнаты."
+                ),
+                examples={
+                    "application/json": {
+                        "items": [
+                            {},
+                            {"room_number": "Комната занята бронированием 7 на период с 2024-12-12 по 2024-12-14."},
+                            {"departure_date": ["Дата выезда должна быть позже даты заселения."]}
+                        ]
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        try:
+            reservations = import_reservations(serializer.validated_data['items'], request.user)
+        except BulkImportError as error:
+            return Response({"items": error.errors}, status=422)
+        except IntegrityError:
+            # Параллельный запрос успел занять одну из комнат пакета после проверки пересечений
+            return Response(
+                {"detail": "Одна из комнат пакета уже забронирована на пересекающиеся даты. Повторите запрос."},
+                status=422
+            )
+
+        return Response(
+            {
+                "created": len(reservations),
+                "results": [
+                    {
+                        "reservation_id": reservation.id,
+                        "client_id": reservation.client_id,
+                        "room_number": reservation.room.number,
+                        "arrival_date": reservation.arrival_date,
+                        "departure_date": reservation.departure_date,
+                        "status": reservation.status,
+                        "price_at_booking": reservation.price_at_booking
+                    }
+                    for reservation in reservations
+                ]
+            },
+            status=201
+        )
 
-            current_date += timedelta(days=1)
-        return total_price
+
+class PriceQuoteView(generics.GenericAPIView):
+    serializer_class = PriceQuoteSerializer
+
+    @swagger_auto_schema(
+        operation_description="Рассчитать стоимость проживания сразу для нескольких комнат и периодов.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'items': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'room_number': openapi.Schema(
+                                type=openapi.TYPE_INTEGER,
+                                description="Номер комнаты.",
+                            ),
+                            'arrival_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATE,
+                                description="Дата заселения (формат YYYY-MM-DD).",
+                            ),
+                            'departure_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATE,
+                                description="Дата выезда (формат YYYY-MM-DD).",
+                            ),
+                        },
+                        required=['room_number', 'arrival_date', 'departure_date'],
+                    ),
+                    description="Список комнат и периодов проживания для расчёта (не более 100 элементов; даты - "
+                                "не раньше чем за 365 дней и не позже чем через 730 дней от текущей).",
+                ),
+            },
+            required=['items'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Стоимость проживания для каждого элемента запроса.",
+                examples={
+                    "application/json": {
+                        "results": [
+                            {
+                                "room_number": 101,
+                                "arrival_date": "2024-12-10",
+                                "departure_date": "2024-12-15",
+                                "nights": 5,
+                                "total_price": 25000
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, некорректные даты, даты вне допустимого окна, "
+                            "слишком много элементов или несуществующие комнаты.",
+                examples={
+                    "application/json": {
+                        "items": {"missing_rooms": "Следующие номера комнат не найдены: 999."}
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        items = serializer.validated_data['items']
+        prices = quote_prices(
+            (item['room'].type_id, item['arrival_date'], item['departure_date']) for item in items
+        )
+
+        return Response({
+            "results": [
+                {
+                    "room_number": item['room_number'],
+                    "arrival_date": item['arrival_date'],
+                    "departure_date": item['departure_date'],
+                    "nights": (item['departure_date'] - item['arrival_date']).days,
+                    "total_price": price,
+                }
+                for item, price in zip(items, prices)
+            ]
+        })
 
 
 class QuarterlyReportView(generics.GenericAPIView):
+    read_from_replica = True
 
     @swagger_auto_schema(
-        operation_description="Сформировать отчет о работе гостиницы за указанный квартал текущего или прошлого года.",
+        operation_description=(
+            f"Сформировать отчет о работе гостиницы за указанный квартал текущего или прошлого года. {REPORT_COUNTING}"
+        ),
         manual_parameters=[
             openapi.Parameter(
                 'quarter',
@@ -1298,71 +2103,467 @@ class QuarterlyReportView(generics.GenericAPIView):
         year = serializer.validated_data['year']
 
         start_date, end_date = self.get_quarter_date_range(quarter, year)
+        report = build_report(start_date, end_date)
 
-        # Число клиентов за период в каждом номере
-        clients_per_room = (
-            Reservation.objects.filter(
-                arrival_date__gte=start_date,
-                departure_date__lte=end_date,
-                status__in=['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
-            )
-            .values('room__number')
-            .annotate(client_count=Count('id'))
-            .order_by('room__number')
-        )
+        return Response(report, status=200)
 
-        # Количество номеров на каждом этаже
-        rooms_per_floor = (
-            Room.objects.annotate(
-                floor=ExpressionWrapper(
-                    Substr(F('number'), 1, 1),
-                    output_field=IntegerField()
-                )
-            )
-            .values('floor')
-            .annotate(room_count=Count('id'))
-            .order_by('floor')
-        )
+    def get_quarter_date_range(self, quarter, year):
+        return quarter_date_range(quarter, year)
 
-        # Общая сумма дохода за каждый номер
-        income_per_room = (
-            Reservation.objects.filter(
-                arrival_date__gte=start_date,
-                departure_date__lte=end_date,
-                payment_status__in=['PREPAID', 'PAID'],
-            )
-            .values('room__number')
-            .annotate(total_income=Sum('price_at_booking'))
-            .order_by('room__number')
-        )
 
-        # Суммарный доход по всей гостинице
-        total_income = (
-                           Reservation.objects.filter(
-                               arrival_date__gte=start_date,
-                               departure_date__lte=end_date,
-                               payment_status__in=['PREPAID', 'PAID']
-                           )
-                           .aggregate(total_income=Sum('price_at_booking'))['total_income']
-                       ) or 0
-
-        report = {
-            "clients_per_room": list(clients_per_room),
-            "rooms_per_floor": list(rooms_per_floor),
-            "income_per_room": list(income_per_room),
-            "total_income": total_income,
-            "start_date": start_date,
-            "end_date": end_date
-        }
+class RangeReportView(generics.GenericAPIView):
+    read_from_replica = True
+    serializer_class = RangeReportSerializer
 
+    @swagger_auto_schema(
+        operation_description=f"Сформировать отчет о работе гостиницы за произвольный период. {REPORT_COUNTING}",
+        manual_parameters=[
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Дата начала периода (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Дата окончания периода включительно (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Успешно сформированный отчет за период.",
+                examples={
+                    "application/json": {
+                        "clients_per_room": [
+                            {"room__number": 101, "client_count": 5}
+                        ],
+                        "rooms_per_floor": [
+                            {"floor": 1, "room_count": 10}
+                        ],
+                        "income_per_room": [
+                            {"room__number": 101, "total_income": 15000}
+                        ],
+                        "total_income": 15000,
+                        "start_date": "2024-04-01",
+                        "end_date": "2024-04-30"
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, дата окончания раньше даты начала.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": ["Дата окончания не может быть раньше даты начала."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        report = build_report(serializer.validated_data['start_date'], serializer.validated_data['end_date'])
         return Response(report, status=200)
 
-    def get_quarter_date_range(self, quarter, year):
-        start_month = (quarter - 1) * 3 + 1
-        end_month = start_month + 2
 
-        start_date = datetime(year, start_month, 1)
-        last_day = calendar.monthrange(year, end_month)[1]
-        end_date = datetime(year, end_month, last_day)
+class OccupancyAnalyticsView(generics.GenericAPIView):
+    read_from_replica = True
+    serializer_class = OccupancyAnalyticsSerializer
+
+    @swagger_auto_schema(
+        operation_description=(
+                "Загрузка номеров (occupancy rate), средняя цена за занятую ночь (ADR) и выручка на доступный номер "
+                "(RevPAR) по дням, неделям или месяцам - в целом и по каждому типу номера. Выручка бронирования "
+                "распределяется по ночам проживания поровну, отменённые бронирования не учитываются."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Дата начала периода (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Дата окончания периода включительно (формат YYYY-MM-DD), не более 10 лет от начала.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'granularity',
+                openapi.IN_QUERY,
+                description="Шаг разбиения периода: day, week (с понедельника) или month. По умолчанию month.",
+                type=openapi.TYPE_STRING,
+                enum=['day', 'week', 'month'],
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Показатели загрузки по периодам.",
+                examples={
+                    "application/json": {
+                        "start_date": "2024-01-01",
+                        "end_date": "2024-01-31",
+                        "granularity": "month",
+                        "periods": [
+                            {
+                                "period_start": "2024-01-01",
+                                "period_end": "2024-01-31",
+                                "total": {
+                                    "available_room_nights": 310,
+                                    "occupied_room_nights": 155,
+                                    "revenue": 465000.0,
+                                    "occupancy_rate": 0.5,
+                                    "adr": 3000.0,
+                                    "revpar": 1500.0
+                                },
+                                "room_types": [
+                                    {
+                                        "room_type_id": 1,
+                                        "room_type_name": "Одноместный",
+                                        "available_room_nights": 310,
+                                        "occupied_room_nights": 155,
+                                        "revenue": 465000.0,
+                                        "occupancy_rate": 0.5,
+                                        "adr": 3000.0,
+                                        "revpar": 1500.0
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, дата окончания раньше даты начала.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": ["Дата окончания не может быть раньше даты начала."]
+                    }
+                },
+            ),
+        },
+    )
+    @conditional_get('reservation', 'room', 'room_type')
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        return Response(occupancy_analytics(
+            validated_data['start_date'],
+            validated_data['end_date'],
+            validated_data['granularity'],
+        ))
+
+
+class ReportJobView(generics.GenericAPIView):
+    read_from_replica = True
+    serializer_class = CreateReportJobSerializer
+
+    @swagger_auto_schema(
+        operation_description="Поставить в очередь построение отчёта (квартального, годового или за произвольный период).",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'report_type': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    enum=['QUARTERLY', 'YEARLY', 'CUSTOM'],
+                    description="Тип отчёта.",
+                ),
+                'quarter': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Номер квартала (для QUARTERLY).",
+                    nullable=True,
+                ),
+                'year': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Год (для QUARTERLY и YEARLY).",
+                    nullable=True,
+                ),
+                'start_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Дата начала периода (для CUSTOM).",
+                    nullable=True,
+                ),
+                'end_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Дата окончания периода (для CUSTOM).",
+                    nullable=True,
+                ),
+            },
+            required=['report_type'],
+        ),
+        responses={
+            202: openapi.Response(
+                description="Задача поставлена в очередь (или результат уже был в кэше).",
+                examples={
+                    "application/json": {
+                        "id": "3f1c2a9e6b8d4e0fa1b2c3d4e5f60718",
+                        "report_type": "QUARTERLY",
+                        "params": {"quarter": 2, "year": 2024},
+                        "status": "PENDING"
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, неизвестный тип отчёта или квартал в будущем.",
+                examples={
+                    "application/json": {
+                        "quarter": ["Обязательное поле."]
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        report_type = serializer.validated_data['report_type']
+        params = serializer.validated_data['params']
+
+        if report_type == 'QUARTERLY':
+            start_date, end_date = quarter_date_range(params['quarter'], params['year'])
+        elif report_type == 'YEARLY':
+            start_date, end_date = year_date_range(params['year'])
+        else:
+            start_date, end_date = params['start_date'], params['end_date']
+
+        job = enqueue_report(report_type, params, start_date, end_date)
+        return Response(self.job_data(job), status=202)
+
+    @staticmethod
+    def job_data(job):
+        data = {
+            "id": job['id'],
+            "report_type": job['report_type'],
+            "params": job['params'],
+            "status": job['status'],
+            "created_at": job['created_at'],
+        }
+        if job['status'] == 'DONE':
+            data['result'] = job['result']
+            data['cached'] = job.get('cached', False)
+        if job['status'] == 'FAILED':
+            data['error'] = job['error']
+        return data
+
+
+class ReportJobDetailView(generics.GenericAPIView):
 
-        return start_date, end_date
+    @swagger_auto_schema(
+        operation_description="Получить статус задачи построения отчёта и, если она завершена, результат.",
+        responses={
+            200: openapi.Response(
+                description="Статус задачи: PENDING, RUNNING, DONE или FAILED.",
+                examples={
+                    "application/json": {
+                        "id": "3f1c2a9e6b8d4e0fa1b2c3d4e5f60718",
+                        "report_type": "QUARTERLY",
+                        "params": {"quarter": 2, "year": 2024},
+                        "status": "DONE",
+                        "result": {
+                            "clients_per_room": [{"room__number": 101, "client_count": 5}],
+                            "rooms_per_floor": [{"floor": 1, "room_count": 10}],
+                            "income_per_room": [{"room__number": 101, "total_income": 15000}],
+                            "total_income": 15000,
+                            "start_date": "2024-04-01",
+                            "end_date": "2024-06-30"
+                        },
+                        "cached": False
+                    }
+                },
+            ),
+            404: openapi.Response(
+                description="Задача не найдена или срок её хранения истёк. Без общего кэша (HOTEL_SHARED_CACHE) "
+                            "задача видна только процессу сервера, который её поставил.",
+                examples={
+                    "application/json": {
+                        "detail": "Задача построения отчёта не найдена."
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        job = get_job(kwargs.get('job_id'))
+        if job is None:
+            return Response({"detail": "Задача построения отчёта не найдена."}, status=404)
+
+        return Response(ReportJobView.job_data(job))
+
+
+class ExportView(generics.GenericAPIView):
+    serializer_class = ExportSerializer
+    renderer_classes = [NDJSONRenderer, CSVRenderer, JSONRenderer]
+    export_name = None
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        return export_response(
+            self.export_name,
+            request.accepted_renderer.format,
+            serializer.validated_data.get('updated_since'),
+        )
+
+
+EXPORT_PARAMETERS = [
+    openapi.Parameter(
+        'updated_since',
+        openapi.IN_QUERY,
+        description="Выгрузить только записи, изменённые начиная с этого момента (формат ISO 8601).",
+        type=openapi.TYPE_STRING,
+        format=openapi.FORMAT_DATETIME,
+        required=False,
+    ),
+]
+
+
+class ReservationExportView(ExportView):
+    export_name = 'reservations'
+
+    @swagger_auto_schema(
+        operation_description=(
+                "Потоковая выгрузка всех бронирований. Формат выбирается заголовком Accept: "
+                "text/csv - CSV с заголовком, иначе - NDJSON (один JSON-объект на строку)."
+        ),
+        manual_parameters=EXPORT_PARAMETERS,
+        responses={
+            200: openapi.Response(
+                description="Поток строк бронирований, упорядоченных по id.",
+                examples={
+                    "application/x-ndjson": {
+                        "id": 1,
+                        "room_id": 1,
+                        "room_number": 101,
+                        "client_id": 1,
+                        "admin_id": 1,
+                        "booking_date": "2024-03-20",
+                        "arrival_date": "2024-04-01",
+                        "departure_date": "2024-04-05",
+                        "status": "CHECKED_OUT",
+                        "payment_status": "PAID",
+                        "price_at_booking": 12000,
+                        "final_price": 12000,
+                        "updated_by_id": None,
+                        "last_updated_date": "2024-04-05T12:00:00Z"
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Некорректное значение updated_since.",
+                examples={
+                    "application/json": {
+                        "updated_since": ["Неправильный формат datetime."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ClientExportView(ExportView):
+    export_name = 'clients'
+
+    @swagger_auto_schema(
+        operation_description=(
+                "Потоковая выгрузка всех клиентов. Формат выбирается заголовком Accept: "
+                "text/csv - CSV с заголовком, иначе - NDJSON (один JSON-объект на строку)."
+        ),
+        manual_parameters=EXPORT_PARAMETERS,
+        responses={
+            200: openapi.Response(
+                description="Поток строк клиентов, упорядоченных по id.",
+                examples={
+                    "application/x-ndjson": {
+                        "id": 1,
+                        "passport_number": "1234567890",
+                        "first_name": "Иван",
+                        "last_name": "Иванов",
+                        "middle_name": "Иванович",
+                        "city_from": "Москва",
+                        "last_updated_date": "2024-04-05T12:00:00Z"
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Некорректное значение updated_since.",
+                examples={
+                    "application/json": {
+                        "updated_since": ["Неправильный формат datetime."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ResponseCacheStatsView(generics.GenericAPIView):
+
+    @swagger_auto_schema(
+        operation_description="Счётчики попаданий и промахов кэша ответов по каждому кэшируемому эндпоинту.",
+        responses={
+            200: openapi.Response(
+                description="Статистика кэша ответов.",
+                examples={
+                    "application/json": {
+                        "rooms-by-status": {"hits": 120, "misses": 4, "hit_ratio": 0.9677},
+                        "clients-list": {"hits": 0, "misses": 0, "hit_ratio": None}
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(cache_stats())
+
+
+class MetricsView(generics.GenericAPIView):
+    renderer_classes = [PrometheusRenderer]
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Метрики эндпоинтов в текстовом формате Prometheus: количество запросов по методу и статусу, "
+            "гистограмма времени ответа, количество и суммарное время SQL-запросов. Эндпоинт определяется "
+            "по имени маршрута (clients-list, quarterly-report, room-list и т.д.)."
+        ),
+        responses={
+            200: openapi.Response(
+                description="Метрики с момента запуска процесса.",
+                examples={
+                    "text/plain": (
+                        'hotel_http_requests_total{endpoint="clients-list",method="GET",status="200"} 42\n'
+                        'hotel_http_request_duration_seconds_bucket{endpoint="clients-list",le="0.025"} 40\n'
+                        'hotel_sql_queries_total{endpoint="clients-list"} 84\n'
+                    )
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -44,7 +44,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'hotel_app.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication'
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -52,6 +52,39 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Фоновые задачи построения отчётов (hotel_app/jobs.py)
+HOTEL_REPORT_JOB_WORKERS = 2
+HOTEL_REPORT_JOBS_EAGER = False
+
+# Псевдоним общего для всех процессов кэша для меток ETag, версий индексов и календарей цен, кэшированных ответов
+# и состояния фоновых задач. По умолчанию - файловый кэш 'shared', общий для процессов одной машины; при нескольких
+# машинах укажите Redis или Memcached. Если задать None, эти данные видны только своему процессу, поэтому кэш
+# ответов, ETag и индексы в памяти процесса выключаются
+HOTEL_SHARED_CACHE = 'shared'
+
+# Кэш ответов для часто повторяющихся запросов (hotel_app/response_cache.py), работает только с HOTEL_SHARED_CACHE
+HOTEL_RESPONSE_CACHE_TIMEOUT = 5 * 60
+
+# Кэш проверенных токенов (hotel_app/authentication.py): LRU в памяти процесса и, если задан псевдоним кэша,
+# общий кэш для всех процессов. Отозванный токен в других процессах действует не дольше TTL
+HOTEL_AUTH_TOKEN_CACHE_TTL = 60
+HOTEL_AUTH_TOKEN_CACHE_SIZE = 10000
+HOTEL_AUTH_TOKEN_SHARED_CACHE = None
+HOTEL_AUTH_TOKEN_SHARED_CACHE_TIMEOUT = 5 * 60
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hotel',
+    },
+    # Общий кэш HOTEL_SHARED_CACHE: версии и метки в нём не должны вытесняться, поэтому лимит записей большой
+    'shared': {
+        'BACKEND': 'hotel_app.cache.FileCache',
+        'LOCATION': BASE_DIR / '.cache' / 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'username',
     'SERIALIZERS': {
@@ -60,6 +93,7 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'hotel_app.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +101,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'hotel_app.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'hotel_drf_app.urls'
@@ -97,9 +132,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Реплика только для чтения (hotel_app/routers.py). Локально это тот же файл, то есть реплика без отставания;
+    # в тестах - отдельная база, в которую данные сами не попадают
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['hotel_app.routers.PrimaryReplicaRouter']
+
+# Реплика не используется, если отстаёт больше чем на HOTEL_REPLICA_MAX_LAG секунд;
+# отставание проверяется не чаще раза в HOTEL_REPLICA_LAG_CHECK_INTERVAL секунд
+HOTEL_REPLICA_MAX_LAG = 5
+HOTEL_REPLICA_LAG_CHECK_INTERVAL = 1
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
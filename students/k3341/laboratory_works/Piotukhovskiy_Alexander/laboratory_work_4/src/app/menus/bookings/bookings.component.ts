@@ -4,6 +4,7 @@ import { Router } from '@angular/router';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
 import { environment } from '../../environment';
+import { CursorList } from '../../pagination';
 import { ActivatedRoute } from '@angular/router';
 
 
@@ -32,6 +33,8 @@ export class BookingsComponent implements OnInit {
     departureDate: null,
   };
 
+  reservations: CursorList;
+
   searchQuery: string = ''; // Для поиска
   roomTypes: string[] = [];
 
@@ -59,7 +62,9 @@ export class BookingsComponent implements OnInit {
 
 
 
-  constructor(private http: HttpClient, private router: Router, private route: ActivatedRoute) {}
+  constructor(private http: HttpClient, private router: Router, private route: ActivatedRoute) {
+    this.reservations = new CursorList(this.http, `${environment.apiUrl}/hotel/api/reservations`);
+  }
 
 
 
@@ -79,22 +84,27 @@ export class BookingsComponent implements OnInit {
   }
 
   loadBookings() {
-    this.http.get(`${environment.apiUrl}/hotel/api/reservations`).subscribe({
-      next: (data: any) => {
-        if (data) {
-          this.bookings = data;
-          this.filteredBookings = [...this.bookings];
-          const uniqueTypes = new Set(this.bookings.map((booking: any) => booking.room.type_name));
-          this.roomTypes = Array.from(uniqueTypes);
-        } else {
-          this.bookings = [];
-          this.filteredBookings = [];
-        }
-      },
+    this.reservations.reload().subscribe({
+      next: () => this.showBookings(),
+      error: (err) => console.error('Ошибка загрузки броней:', err),
+    });
+  }
+
+  loadMoreBookings() {
+    this.reservations.loadMore().subscribe({
+      next: () => this.showBookings(),
       error: (err) => console.error('Ошибка загрузки броней:', err),
     });
   }
 
+  // Поиск и фильтры применяются к уже загруженным бронированиям
+  showBookings() {
+    this.bookings = this.reservations.items;
+    const uniqueTypes = new Set(this.bookings.map((booking: any) => booking.room.type_name));
+    this.roomTypes = Array.from(uniqueTypes);
+    this.applyFiltersAndSearch();
+  }
+
   formatDate(dateString: string | null): string {
     if (!dateString) {
       return '—';
@@ -4,6 +4,7 @@ import {Router} from '@angular/router';
 import {CommonModule} from '@angular/common';
 import {FormsModule} from '@angular/forms';
 import {environment} from '../../environment';
+import {CursorList} from '../../pagination';
 
 @Component({
   selector: 'app-cleaning-schedule',
@@ -34,6 +35,8 @@ export class CleaningScheduleComponent implements OnInit {
 
 
   cleaners: any[] = [];
+  cleanerList: CursorList;
+  scheduleList: CursorList;
   rooms: any[] = [];
   statuses: { value: string; label: string }[] = [
     {value: 'PENDING', label: 'Ожидается'},
@@ -118,6 +121,8 @@ export class CleaningScheduleComponent implements OnInit {
 
 
   constructor(private http: HttpClient, private router: Router) {
+    this.cleanerList = new CursorList(this.http, `${environment.apiUrl}/hotel/api/employees`);
+    this.scheduleList = new CursorList(this.http, `${environment.apiUrl}/hotel/api/cleaning-schedules`);
   }
 
   ngOnInit() {
@@ -133,16 +138,25 @@ export class CleaningScheduleComponent implements OnInit {
   }
 
   loadCleaners() {
-    this.http
-      .get(`${environment.apiUrl}/hotel/api/employees`)
-      .subscribe({
-        next: (data: any) => {
-          this.cleaners = data;
-        },
-        error: (err) => {
-          console.error('Ошибка загрузки списка уборщиков:', err);
-        },
-      });
+    this.cleanerList.reload().subscribe({
+      next: () => {
+        this.cleaners = this.cleanerList.items;
+      },
+      error: (err) => {
+        console.error('Ошибка загрузки списка уборщиков:', err);
+      },
+    });
+  }
+
+  loadMoreCleaners() {
+    this.cleanerList.loadMore().subscribe({
+      next: () => {
+        this.cleaners = this.cleanerList.items;
+      },
+      error: (err) => {
+        console.error('Ошибка загрузки списка уборщиков:', err);
+      },
+    });
   }
 
 
@@ -166,19 +180,30 @@ export class CleaningScheduleComponent implements OnInit {
     if (this.filter.cleanerId) params = params.set('cleaner_id', this.filter.cleanerId.toString());
     if (this.filter.roomNumber) params = params.set('room_number', this.filter.roomNumber.toString());
 
-    this.http
-      .get(`${environment.apiUrl}/hotel/api/cleaning-schedules`, {
-        params: params,
-      })
-      .subscribe({
-        next: (data: any) => {
-          this.cleaningSchedules = data;
-          this.applyFilter();
-        },
-        error: (err) => {
-          console.error('Ошибка загрузки расписания уборок:', err);
-        },
-      });
+    this.scheduleList.reload(params).subscribe({
+      next: () => {
+        this.cleaningSchedules = this.scheduleList.items;
+        this.applyFilter();
+      },
+      error: (err) => {
+        console.error('Ошибка загрузки расписания уборок:', err);
+      },
+    });
+  }
+
+  // Следующая страница с сервера дописывается к загруженным записям, текущая страница таблицы сохраняется
+  loadMoreSchedules() {
+    const page = this.page;
+    this.scheduleList.loadMore().subscribe({
+      next: () => {
+        this.cleaningSchedules = this.scheduleList.items;
+        this.applyFilter();
+        this.page = page;
+      },
+      error: (err) => {
+        console.error('Ошибка загрузки расписания уборок:', err);
+      },
+    });
   }
 
   openDeleteModal(schedule: any) {
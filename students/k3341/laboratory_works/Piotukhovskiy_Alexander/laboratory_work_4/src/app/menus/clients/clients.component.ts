@@ -4,6 +4,7 @@ import {Router} from '@angular/router';
 import {CommonModule} from '@angular/common';
 import {FormsModule} from '@angular/forms';
 import {environment} from '../../environment';
+import {CursorList} from '../../pagination';
 
 @Component({
   selector: 'app-clients',
@@ -15,6 +16,7 @@ import {environment} from '../../environment';
 export class ClientsComponent implements OnInit {
   appName: string = environment.appName;
   username: string | null = null;
+  clientList: CursorList;
   clients: any[] = [];
   filteredClients: any[] = [];
   searchQuery: string = '';
@@ -68,6 +70,11 @@ export class ClientsComponent implements OnInit {
   };
 
   constructor(private http: HttpClient, private router: Router) {
+    // /hotel/clients отдаёт страницы по limit/offset, записи - в поле clients
+    this.clientList = new CursorList(this.http, `${environment.apiUrl}/hotel/clients`, 100, {
+      pageSizeParam: 'limit',
+      resultsKey: 'clients',
+    });
   }
 
   ngOnInit() {
@@ -87,26 +94,33 @@ export class ClientsComponent implements OnInit {
     if (this.endDate) params = params.append('end_date', this.endDate);
     if (this.city) params = params.append('city', this.city);
 
-    this.http
-      .get(`${environment.apiUrl}/hotel/clients`, {
-        params: params,
-      })
-      .subscribe({
-        next: (data: any) => {
-          this.clients = data.clients;
-          this.filteredClients = [...this.clients];
-          this.detailMessage = null;
-        },
-        error: (err) => {
-          if (err.status === 404 && err.error?.detail) {
-            this.clients = [];
-            this.filteredClients = [];
-            this.detailMessage = err.error.detail;
-          } else {
-            console.error('Ошибка загрузки клиентов:', err);
-          }
-        },
-      });
+    this.clientList.reload(params).subscribe({
+      next: () => {
+        this.showClients();
+        this.detailMessage = null;
+      },
+      error: (err) => {
+        if (err.status === 404 && err.error?.detail) {
+          this.clients = [];
+          this.filteredClients = [];
+          this.detailMessage = err.error.detail;
+        } else {
+          console.error('Ошибка загрузки клиентов:', err);
+        }
+      },
+    });
+  }
+
+  loadMoreClients() {
+    this.clientList.loadMore().subscribe({
+      next: () => this.showClients(),
+      error: (err) => console.error('Ошибка загрузки клиентов:', err),
+    });
+  }
+
+  showClients() {
+    this.clients = this.clientList.items;
+    this.searchClients();
   }
 
   searchClients() {
@@ -269,8 +283,8 @@ export class ClientsComponent implements OnInit {
         .delete(`${environment.apiUrl}/hotel/api/clients/${clientId}/`)
         .subscribe({
           next: () => {
-            this.clients = this.clients.filter((client) => client.id !== clientId);
-            this.filteredClients = this.filteredClients.filter((client) => client.id !== clientId);
+            this.clientList.items = this.clientList.items.filter((client) => client.id !== clientId);
+            this.showClients();
             this.closeDeleteModal();
           },
           error: (err) => {
@@ -1,5 +1,6 @@
 import {environment} from '../../environment';
-import {HttpClient} from '@angular/common/http';
+import {CursorList, getAllPages} from '../../pagination';
+import {HttpClient, HttpParams} from '@angular/common/http';
 import {Router} from '@angular/router';
 import {Component, OnInit} from '@angular/core';
 import {CommonModule} from '@angular/common';
@@ -20,6 +21,7 @@ export class EmployeesComponent implements OnInit {
   appName: string = environment.appName;
   username: string | null = null;
   employees: any[] = [];
+  employeeList: CursorList;
   positions: any[] = [];
   showEmployeeForm: boolean = false;
   isEditMode: boolean = false;
@@ -43,25 +45,36 @@ export class EmployeesComponent implements OnInit {
 
 
   constructor(private http: HttpClient, private router: Router) {
+    this.employeeList = new CursorList(this.http, `${environment.apiUrl}/hotel/api/employees`);
   }
 
   ngOnInit() {
     this.username = localStorage.getItem('username');
     this.loadEmployees();
     this.loadPositions();
-    this.loadContracts();
   }
 
   loadEmployees() {
-    this.http.get(`${environment.apiUrl}/hotel/api/employees`).subscribe({
-      next: (data: any) => {
-        console.log('Сотрудники:', data);
-        this.employees = data;
-      },
+    this.employmentContracts = [];
+    this.employeeList.reload().subscribe({
+      next: (data: any) => this.showEmployees(data),
+      error: (err) => console.error('Ошибка загрузки сотрудников:', err),
+    });
+  }
+
+  loadMoreEmployees() {
+    this.employeeList.loadMore().subscribe({
+      next: (data: any) => this.showEmployees(data),
       error: (err) => console.error('Ошибка загрузки сотрудников:', err),
     });
   }
 
+  showEmployees(loaded: any[]) {
+    console.log('Сотрудники:', loaded);
+    this.employees = this.employeeList.items;
+    this.loadContracts(loaded);
+  }
+
   loadPositions() {
     this.http.get(`${environment.apiUrl}/hotel/api/positions`).subscribe({
       next: (data: any) => {
@@ -72,11 +85,14 @@ export class EmployeesComponent implements OnInit {
     });
   }
 
-  loadContracts() {
-    this.http.get(`${environment.apiUrl}/hotel/api/employment-contracts`).subscribe({
+  // Контракты запрашиваются только для сотрудников только что загруженной страницы
+  loadContracts(employees: any[]) {
+    if (employees.length === 0) return;
+    const params = new HttpParams().set('employee_id', employees.map((employee) => employee.id).join(','));
+    getAllPages(this.http, `${environment.apiUrl}/hotel/api/employment-contracts`, params).subscribe({
       next: (data: any) => {
         console.log('Контракты:', data);
-        this.employmentContracts = data;
+        this.employmentContracts = this.employmentContracts.concat(data);
         this.mapContractsToEmployees();
       },
       error: (err) => console.error('Ошибка загрузки контрактов:', err),
@@ -192,7 +208,6 @@ export class EmployeesComponent implements OnInit {
       next: () => {
         this.loadEmployees();
         this.loadPositions();
-        this.loadContracts();
         this.closeEmployeeForm();
       },
       error: (err) => {
@@ -236,7 +251,6 @@ export class EmployeesComponent implements OnInit {
         next: () => {
           this.loadEmployees();
           this.loadPositions();
-          this.loadContracts();
           this.closeModal();
         },
         error: (err) => console.error('Ошибка увольнения сотрудника:', err),
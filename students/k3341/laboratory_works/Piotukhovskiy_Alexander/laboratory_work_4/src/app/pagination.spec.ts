@@ -0,0 +1,53 @@
+import { TestBed } from '@angular/core/testing';
+import { HttpClient, HttpParams, provideHttpClient } from '@angular/common/http';
+import { HttpTestingController, provideHttpClientTesting } from '@angular/common/http/testing';
+
+import { CursorList } from './pagination';
+
+describe('CursorList', () => {
+  let http: HttpClient;
+  let httpTesting: HttpTestingController;
+
+  beforeEach(() => {
+    TestBed.configureTestingModule({
+      providers: [provideHttpClient(), provideHttpClientTesting()],
+    });
+    http = TestBed.inject(HttpClient);
+    httpTesting = TestBed.inject(HttpTestingController);
+  });
+
+  afterEach(() => {
+    httpTesting.verify();
+  });
+
+  it('reaches clients beyond the first page by following next', () => {
+    const list = new CursorList(http, '/hotel/clients', 2, { pageSizeParam: 'limit', resultsKey: 'clients' });
+
+    list.reload(new HttpParams().set('city', 'Казань')).subscribe();
+    const first = httpTesting.expectOne((request) => request.url === '/hotel/clients');
+    expect(first.request.params.get('limit')).toBe('2');
+    expect(first.request.params.get('city')).toBe('Казань');
+    first.flush({ count: 3, next: '/hotel/clients?city=Казань&limit=2&offset=2', previous: null, clients: [{ id: 1 }, { id: 2 }] });
+    expect(list.hasMore).toBeTrue();
+
+    list.loadMore().subscribe();
+    httpTesting.expectOne('/hotel/clients?city=Казань&limit=2&offset=2').flush({
+      count: 3, next: null, previous: '/hotel/clients?city=Казань&limit=2', clients: [{ id: 3 }],
+    });
+
+    expect(list.items.map((client: any) => client.id)).toEqual([1, 2, 3]);
+    expect(list.hasMore).toBeFalse();
+  });
+
+  it('reads results and page_size by default', () => {
+    const list = new CursorList(http, '/hotel/api/employees');
+
+    list.reload().subscribe();
+    const request = httpTesting.expectOne((pending) => pending.url === '/hotel/api/employees');
+    expect(request.request.params.get('page_size')).toBe('50');
+    request.flush({ next: null, previous: null, results: [{ id: 7 }] });
+
+    expect(list.items).toEqual([{ id: 7 }]);
+    expect(list.hasMore).toBeFalse();
+  });
+});
@@ -0,0 +1,74 @@
+import { HttpClient, HttpParams } from '@angular/common/http';
+import { EMPTY, Observable, of } from 'rxjs';
+import { expand, finalize, map, reduce } from 'rxjs/operators';
+
+interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+// Размер страницы и поле со списком записей различаются у эндпоинтов: /hotel/api/* - page_size и results,
+// /hotel/clients - limit и clients
+export interface PageFormat {
+  pageSizeParam: string;
+  resultsKey: string;
+}
+
+export const CURSOR_PAGE: PageFormat = { pageSizeParam: 'page_size', resultsKey: 'results' };
+
+export const PAGE_SIZE = 50;
+
+// Списки отдаются постранично (ссылка на следующую страницу в поле next): экран загружает первую страницу,
+// а следующие - по кнопке "Загрузить ещё", продолжая со ссылки последней загруженной
+export class CursorList<T = any> {
+  items: T[] = [];
+  loading: boolean = false;
+  private next: string | null = null;
+
+  constructor(
+    private http: HttpClient,
+    private url: string,
+    private pageSize: number = PAGE_SIZE,
+    private format: PageFormat = CURSOR_PAGE
+  ) {}
+
+  get hasMore(): boolean {
+    return this.next !== null;
+  }
+
+  // Первая страница заново - при открытии экрана, после изменений и при смене фильтров
+  reload(params: HttpParams = new HttpParams()): Observable<T[]> {
+    this.items = [];
+    this.next = null;
+    return this.fetch(this.url, params.set(this.format.pageSizeParam, this.pageSize));
+  }
+
+  // Возвращает только что загруженную страницу; все загруженные записи - в items
+  loadMore(): Observable<T[]> {
+    return this.next ? this.fetch(this.next) : of([]);
+  }
+
+  private fetch(url: string, params?: HttpParams): Observable<T[]> {
+    this.loading = true;
+    return this.http.get<any>(url, { params }).pipe(
+      map((page) => {
+        const results: T[] = page[this.format.resultsKey] ?? [];
+        this.items = this.items.concat(results);
+        this.next = page.next ?? null;
+        return results;
+      }),
+      finalize(() => (this.loading = false))
+    );
+  }
+}
+
+// Все страницы подряд - только для выборок заранее ограниченного размера
+// (например, контракты сотрудников одной загруженной страницы)
+export function getAllPages<T = any>(http: HttpClient, url: string, params?: HttpParams): Observable<T[]> {
+  return http.get<Page<T>>(url, { params }).pipe(
+    expand((page) => (page.next ? http.get<Page<T>>(page.next) : EMPTY)),
+    map((page) => page.results),
+    reduce((items: T[], results: T[]) => items.concat(results), [])
+  );
+}